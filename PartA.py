@@ -10,7 +10,7 @@ def tokenize(content):
     token = ''
             
     for char in content:
-        if ('a'<= char <= 'z' and char.isascii) or char.isdigit():
+        if ('a'<= char <= 'z' and char.isascii()) or char.isdigit():
             token += char 
         else:
             if token:
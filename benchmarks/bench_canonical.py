@@ -0,0 +1,101 @@
+# Url canonicalization (utils/canonical.py): on the links of a synthetic site
+# where a share of them spell a page another way (fragments, host case,
+# default ports, index pages, tracking and session parameters, query order),
+# how many distinct urls the frontier keeps and urls/s with [CANONICAL]
+# ENABLED off and on; then a crawl of that site with each, counting the
+# requests made; then the rehash of the save file the crawl without
+# canonicalization left, as a resumed crawl with it would run.
+#
+#   python -m benchmarks.bench_canonical [--pages 300] [--aliases 0.3]
+import os
+import random
+import re
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import get_context
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.run_crawl import crawl
+from benchmarks.site import Site
+from crawler.store import FrontierStore
+from utils import get_urlhash
+from utils.canonical import UrlCanonicalizer
+
+_HREF = re.compile(rb'href="([^"]+)"')
+
+
+def url_set(site):
+    # Every link of every page, as the scraper would pass them to add_url.
+    links = []
+    for number in range(site.pages):
+        for host in site.hosts:
+            status, content, content_type = site(f"https://{host}/{number}")
+            if status == 200 and content_type == "text/html":
+                links.extend(link.decode("utf-8") for link in _HREF.findall(content))
+    random.Random(0).shuffle(links)
+    return links
+
+
+def old_normalize(url):
+    return url.rstrip("/") if url.endswith("/") else url
+
+
+def distinct(site):
+    links = url_set(site)
+    canonicalizer = UrlCanonicalizer()
+    print(f"url set, {len(links)} links")
+    print(f"{'CANONICAL':<12}{'distinct':>10}{'urls/s':>12}")
+    for name, normalize in (("False", old_normalize), ("True", canonicalizer.canonicalize)):
+        start = time.perf_counter()
+        keys = {get_urlhash(normalize(link)) for link in links}
+        elapsed = time.perf_counter() - start
+        print(f"{name:<12}{len(keys):>10}{len(links) / elapsed:12.0f}")
+
+
+def site_crawl(site, directory):
+    server = CacheServer(site, latency=0.002).start()
+    context = get_context("spawn")
+    print(f"crawl, {len(site.hosts)} hosts x {site.pages} pages")
+    print(f"{'CANONICAL':<12}{'requests':>9}{'pages/s':>9}{'unique pages':>14}{'near dups':>11}")
+    for enabled in ("False", "True"):
+        server.requests.clear()
+        options = {"LOGGING": {"LEVEL": "WARNING"}, "ROBOTS": {"OBEY": "False"},
+                   "CANONICAL": {"ENABLED": enabled}}
+        results = context.Queue()
+        # The save file of the crawl without canonicalization is kept.
+        target = os.path.join(directory, enabled)
+        os.makedirs(target)
+        process = context.Process(target=crawl, args=(
+            target, server.address, site.seeds(), 0.0, options, "threads", results))
+        process.start()
+        result = results.get()
+        process.join()
+        print(f"{enabled:<12}{len(server.requests):>9}"
+              f"{result['pages'] / result['elapsed_s']:9.1f}{result['unique_pages']:>14}"
+              f"{result['counters'].get('skipped_near_duplicate', 0):>11}")
+    server.stop()
+
+
+def rehash(directory):
+    store = FrontierStore(os.path.join(directory, "False", "frontier.db"))
+    start = time.perf_counter()
+    before, after = store.rehash(UrlCanonicalizer().canonicalize, get_urlhash)
+    elapsed = time.perf_counter() - start
+    store.close()
+    print(f"rehash of the save file without canonicalization: {before} urls into "
+          f"{after}, {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--aliases", type=float, default=0.3)
+    args = parser.parse_args()
+    site = Site(args.hosts, args.pages, fanout=6, size=2, duplicates=0, traps=0,
+                aliases=args.aliases)
+    distinct(site)
+    with tempfile.TemporaryDirectory() as directory:
+        site_crawl(site, directory)
+        rehash(directory)
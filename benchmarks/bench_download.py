@@ -0,0 +1,59 @@
+# Requests/sec through a local stand-in cache server: the thread-per-request
+# model of utils.download against the pooled AsyncCacheClient.
+#
+#   python -m benchmarks.bench_download [--requests 2000] [--latency 0.01]
+import asyncio
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from utils.download import download
+from utils.async_download import AsyncCacheClient
+from benchmarks.cache_server import CacheServer
+
+
+def run_threads(config, urls, concurrency):
+    with ThreadPoolExecutor(concurrency) as executor:
+        responses = list(executor.map(lambda url: download(url, config), urls))
+    return responses
+
+
+def run_async(config, urls, concurrency):
+    async def crawl():
+        client = AsyncCacheClient(config, concurrency)
+        responses = await asyncio.gather(*(client.download(url) for url in urls))
+        await client.close()
+        return responses, client.opened
+    return asyncio.run(crawl())
+
+
+def main(count, latency, concurrency_levels):
+    server = CacheServer(latency=latency).start()
+    config = SimpleNamespace(
+        cache_server=server.address, user_agent="IR F19 benchmark")
+    urls = [f"https://www.ics.uci.edu/{i}" for i in range(count)]
+    print(f"{count} requests, {latency * 1000:.0f} ms server latency")
+    for concurrency in concurrency_levels:
+        start = time.perf_counter()
+        responses = run_threads(config, urls, concurrency)
+        threaded = count / (time.perf_counter() - start)
+        assert all(resp.status == 200 for resp in responses)
+
+        start = time.perf_counter()
+        responses, opened = run_async(config, urls, concurrency)
+        pooled = count / (time.perf_counter() - start)
+        assert all(resp.status == 200 for resp in responses)
+        print(f"concurrency {concurrency:3}: threads {threaded:8.0f} req/s   "
+              f"async {pooled:8.0f} req/s ({opened} connections)")
+    server.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--concurrency", type=str, default="1,8,32")
+    args = parser.parse_args()
+    main(args.requests, args.latency,
+         [int(level) for level in args.concurrency.split(",")])
@@ -0,0 +1,76 @@
+# Links/sec through scraper.is_valid: the rules as they were written inline
+# (minus their prints) against the compiled UrlFilter.
+#
+#   python -m benchmarks.bench_filter [--urls 500000]
+import random
+import re
+import time
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+from utils.url_filter import UrlFilter
+
+
+def legacy_is_valid(url):
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    if "www" not in parsed.netloc:
+        return False
+    valid_domains = (".ics.uci.edu", ".cs.uci.edu", ".informatics.uci.edu", ".stat.uci.edu", "today.uci.edu")
+    if not any(parsed.netloc.endswith(domain) for domain in valid_domains):
+        if not(parsed.netloc == "today.uci.edu" and parsed.path.startswith("/department/information_computer_sciences")):
+            return False
+    if re.match(
+        r".*\.(css|js|bmp|gif|jpe?g|ico"
+        r"|png|tiff?|mid|mp2|mp3|mp4"
+        r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+        r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        r"|epub|dll|cnf|tgz|sha1"
+        r"|thmx|mso|arff|rtf|jar|csv"
+        r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
+        return False
+    trap_patterns = [r'/sort=', r'/search']
+    for pattern in trap_patterns:
+        if re.search(pattern, parsed.path):
+            return False
+    return True
+
+
+def make_urls(count):
+    rng = random.Random(0)
+    hosts = ["www.ics.uci.edu", "www.cs.uci.edu", "www.informatics.uci.edu",
+             "www.stat.uci.edu", "vision.ics.uci.edu", "www.google.com",
+             "www.today.uci.edu", "wiki.ics.uci.edu"]
+    endings = ["", ".html", ".pdf", ".php?id=3", "/", ".jpg", "?sort=asc&page=2"]
+    urls = []
+    for i in range(count):
+        depth = rng.randint(1, 6)
+        path = "/".join(rng.choice(["people", "research", "courses", "events",
+                                     "2024", "news", "search", "a", "b"])
+                        for _ in range(depth))
+        urls.append(f"https://{rng.choice(hosts)}/{path}/{i}{rng.choice(endings)}")
+    return urls
+
+
+def measure(name, is_valid, urls):
+    start = time.perf_counter()
+    accepted = sum(1 for url in urls if is_valid(url))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10}{len(urls) / elapsed:12,.0f} links/s  ({accepted} accepted)")
+
+
+def main(count):
+    urls = make_urls(count)
+    measure("inline", legacy_is_valid, urls)
+    url_filter = UrlFilter()
+    measure("compiled", url_filter.is_valid, urls)
+    print("rejections:", dict(url_filter.rejections))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=500000)
+    args = parser.parse_args()
+    main(args.urls)
@@ -0,0 +1,83 @@
+# Memory and throughput of the HostScheduler with millions of pending urls,
+# unbounded against a HOTWINDOW spilling to disk, and how well the bounded
+# one still serves the best scored urls first. One process per run, so peak
+# RSS is the scheduler's own.
+#
+#   python -m benchmarks.bench_frontier [--urls 2000000] [--window 200000]
+import os
+import random
+import resource
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import get_context
+
+
+def run(urls, hosts, window, served, results):
+    from crawler.scheduler import HostScheduler
+    with tempfile.TemporaryDirectory() as directory:
+        scheduler = HostScheduler(0.0, None, window, os.path.join(directory, "spill"))
+        rng = random.Random(0)
+        start = time.perf_counter()
+        for number in range(urls):
+            scheduler.add(f"https://www{rng.randrange(hosts)}.ics.uci.edu/page/{number}",
+                          rng.random())
+        added = time.perf_counter() - start
+        # ru_maxrss is in KiB on Linux.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        start = time.perf_counter()
+        for _ in range(served):
+            url = scheduler.get()
+            scheduler.done(url)
+        got = time.perf_counter() - start
+        scheduler.close()
+    results.put((added, peak, got))
+
+
+def precision(urls, hosts, window, served):
+    # Share of the first `served` urls that are among the best scored
+    # `served` ones.
+    from crawler.scheduler import HostScheduler
+    with tempfile.TemporaryDirectory() as directory:
+        scheduler = HostScheduler(0.0, None, window, os.path.join(directory, "spill"))
+        rng = random.Random(1)
+        scores = dict()
+        for number in range(urls):
+            url = f"https://www{rng.randrange(hosts)}.ics.uci.edu/page/{number}"
+            scores[url] = rng.random()
+            scheduler.add(url, scores[url])
+        cutoff = sorted(scores.values())[served - 1]
+        hits = 0
+        for _ in range(served):
+            url = scheduler.get()
+            hits += scores[url] <= cutoff
+            scheduler.done(url)
+        scheduler.close()
+    return hits / served
+
+
+def main(urls, hosts, window, served):
+    context = get_context("spawn")
+    print(f"{urls} urls over {hosts} hosts, {served} served")
+    print(f"{'window':<12}{'adds/s':>10}{'gets/s':>10}{'peak RSS MB':>13}")
+    for size in (0, window):
+        results = context.Queue()
+        process = context.Process(target=run, args=(urls, hosts, size, served, results))
+        process.start()
+        added, peak, got = results.get()
+        process.join()
+        print(f"{size or 'unbounded':<12}{urls / added:10.0f}{served / got:10.0f}{peak:13.0f}")
+    sample = min(urls, 200000)
+    print(f"best first, {sample} urls, window {sample // 20}: "
+          f"{precision(sample, hosts, sample // 20, sample // 10):.1%} of the first "
+          f"tenth served are in the best tenth")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=2000000)
+    parser.add_argument("--hosts", type=int, default=500)
+    parser.add_argument("--window", type=int, default=200000)
+    parser.add_argument("--served", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.urls, args.hosts, args.window, args.served)
@@ -0,0 +1,57 @@
+# Adds, gets and a full scan of a PageStore: responses/s, bytes on disk per
+# response, and the time to rebuild the index after a crash.
+#
+#   python -m benchmarks.bench_page_store [--pages 20000] [--size 40]
+import os
+import random
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.bench_processes import make_corpus
+from crawler.page_store import PageStore, StoredResponse
+
+
+def main(count, size):
+    corpus = make_corpus(min(count, 200), size)
+    pages = [(f"{url}/{number}", StoredResponse(url, 200, "text/html", content))
+             for number in range(count)
+             for url, content in [corpus[number % len(corpus)]]]
+    with tempfile.TemporaryDirectory() as path:
+        store = PageStore(path, 64 * 1024 * 1024)
+        start = time.perf_counter()
+        for url, resp in pages:
+            store.add(url, resp)
+        added = time.perf_counter() - start
+        urls = [url for url, _ in random.Random(0).sample(pages, min(count, 5000))]
+        start = time.perf_counter()
+        for url in urls:
+            store.get(url)
+        got = (time.perf_counter() - start) / len(urls)
+        start = time.perf_counter()
+        scanned = sum(1 for _ in store)
+        scan = time.perf_counter() - start
+        store.flush()
+        on_disk = sum(os.path.getsize(os.path.join(path, name))
+                      for name in os.listdir(path) if name.endswith(".seg"))
+        raw = sum(resp.content_length for _, resp in pages)
+        # Left unclean, as after a crash.
+        store.index.close()
+        start = time.perf_counter()
+        store = PageStore(path, 64 * 1024 * 1024)
+        rebuild = time.perf_counter() - start
+        store.close()
+    print(f"{count} responses of {raw / count / 1024:.0f} KiB")
+    print(f"add      {count / added:10.0f} responses/s")
+    print(f"get      {got * 1e6:10.1f} us")
+    print(f"scan     {scanned / scan:10.0f} responses/s")
+    print(f"on disk  {on_disk / count / 1024:10.1f} KiB per response ({raw / on_disk:.1f}x)")
+    print(f"rebuild  {rebuild:10.2f} s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=40)
+    args = parser.parse_args()
+    main(args.pages, args.size)
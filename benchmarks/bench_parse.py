@@ -0,0 +1,63 @@
+# Per-page parse time of the old scraper path (three BeautifulSoup parses per
+# page) against a single ParsedPage for each parser backend.
+#
+#   python -m benchmarks.bench_parse path/to/saved/pages [--repeat 3]
+import os
+import time
+from argparse import ArgumentParser
+
+from benchmarks.site import old_pipeline
+from utils.page import ParsedPage, PARSERS
+
+
+def load_corpus(path):
+    pages = []
+    for name in sorted(os.listdir(path)):
+        full_path = os.path.join(path, name)
+        if os.path.isfile(full_path):
+            with open(full_path, "rb") as page_file:
+                pages.append((f"https://www.ics.uci.edu/{name}", page_file.read()))
+    return pages
+
+
+def new_pipeline(url, content, parser):
+    page = ParsedPage(url, content, parser)
+    return page.text_ratio, page.links, page.word_counts
+
+
+def measure(pages, function, repeat, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for url, content in pages:
+            function(url, content, *args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(pages)
+
+
+def main(path, repeat):
+    pages = load_corpus(path)
+    if not pages:
+        print(f"No pages found in {path}.")
+        return
+    total_bytes = sum(len(content) for _, content in pages)
+    print(f"{len(pages)} pages, {total_bytes / len(pages) / 1024:.1f} KiB average")
+    baseline = measure(pages, old_pipeline, repeat)
+    print(f"{'before (3x html.parser)':<28}{baseline * 1000:9.2f} ms/page")
+    for parser in PARSERS:
+        try:
+            per_page = measure(pages, new_pipeline, repeat, parser)
+        except Exception as e: # lxml may not be installed
+            print(f"{'ParsedPage ' + parser:<28}   skipped ({e})")
+            continue
+        print(f"{'ParsedPage ' + parser:<28}{per_page * 1000:9.2f} ms/page"
+              f"  ({baseline / per_page:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("corpus", type=str)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.corpus, args.repeat)
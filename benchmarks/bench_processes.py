@@ -0,0 +1,104 @@
+# Pages/sec through scraper.scraper in the worker threads against a ParsePool
+# of 1, 2, 4, ... processes, on a CPU bound corpus (saved pages, or generated
+# ones of about --size KiB each).
+#
+#   python -m benchmarks.bench_processes [corpus] [--pages 400] [--size 40]
+import os
+import random
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+
+import cbor
+
+import scraper
+from benchmarks.bench_parse import load_corpus
+from benchmarks.cache_server import encode_response
+from crawler.process_pool import ParsePool
+from utils.response import Response
+from utils.simhash import SimHashIndex
+
+WORDS = ("crawler", "frontier", "politeness", "informatics", "computer",
+         "science", "research", "faculty", "student", "course", "lecture",
+         "seminar", "project", "software", "systems", "network", "data",
+         "learning", "machine", "theory", "algorithm", "graduate", "award")
+
+
+def make_corpus(count, size):
+    pages = []
+    for number in range(count):
+        rng = random.Random(number)
+        paragraphs = []
+        length = 0
+        while length < size * 1024:
+            words = " ".join(rng.choice(WORDS) for _ in range(60))
+            links = "".join(
+                f'<a href="/p{rng.randrange(100000)}">link</a> ' for _ in range(3))
+            paragraphs.append(f"<p>{words} {rng.random()}</p>{links}")
+            length += len(paragraphs[-1])
+        content = f"<html><body>{''.join(paragraphs)}</body></html>".encode("utf-8")
+        pages.append((f"https://www.ics.uci.edu/p{number}", content))
+    return pages
+
+
+def responses(pages):
+    return [(url, Response(cbor.loads(encode_response(url, 200, content))))
+            for url, content in pages]
+
+
+def run_threads(pages, threads):
+    scraper.near_duplicates = SimHashIndex()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda page: scraper.scraper(*page), pages))
+    return time.perf_counter() - start
+
+
+def run_pool(pages, processes):
+    scraper.near_duplicates = SimHashIndex()
+    pool = ParsePool(processes)
+    # Warm up, so process start up is not counted.
+    warm = Event()
+    pool.submit(*pages[0], lambda url, links: warm.set())
+    warm.wait()
+    lock = Lock()
+    remaining = [len(pages)]
+    finished = Event()
+
+    def done(url, links):
+        with lock:
+            remaining[0] -= 1
+            if not remaining[0]:
+                finished.set()
+
+    start = time.perf_counter()
+    for url, resp in pages:
+        pool.submit(url, resp, done)
+    finished.wait()
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return elapsed
+
+
+def main(path, count, size, threads):
+    pages = responses(load_corpus(path) if path else make_corpus(count, size))
+    print(f"{len(pages)} pages, {os.cpu_count()} cores")
+    baseline = run_threads(pages, threads)
+    print(f"{f'{threads} threads':<16}{len(pages) / baseline:9.1f} pages/s")
+    processes = 1
+    while processes <= (os.cpu_count() or 1):
+        elapsed = run_pool(pages, processes)
+        print(f"{f'{processes} processes':<16}{len(pages) / elapsed:9.1f} pages/s"
+              f"  ({baseline / elapsed:.1f}x)")
+        processes *= 2
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("corpus", type=str, nargs="?")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--size", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    main(args.corpus, args.pages, args.size, args.threads)
@@ -0,0 +1,112 @@
+# Simulated crawl with the fixed POLITENESS delay against HostRateController.
+# Worker threads take urls from a HostScheduler and "download" them from
+# simulated hosts: fast ones, slow ones, fragile ones that slow down and fail
+# when fetched too often, and dead ones that fail after a long wait. Reports
+# successful pages/s, per kind of host, failures and politeness violations
+# (two requests to one host less than POLITENESS apart).
+#
+#   python -m benchmarks.bench_rate_control [--seconds 10] [--threads 6]
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from threading import Lock, Thread
+
+from crawler.rate_control import HostRateController, is_failure
+from crawler.scheduler import HostScheduler, get_host
+
+# kind -> number of hosts
+HOSTS = {"fast": 10, "slow": 3, "fragile": 4, "dead": 3}
+FRAGILE_CAPACITY = 5 # requests/s a fragile host serves before it fails
+
+
+class SimulatedHost(object):
+    def __init__(self, kind):
+        self.kind = kind
+        self.requests = list() # time.monotonic() of every request
+        self.lock = Lock()
+
+    def fetch(self):
+        # Sleeps for the download and returns its status.
+        now = time.monotonic()
+        with self.lock:
+            self.requests.append(now)
+            recent = sum(1 for when in self.requests[-4 * FRAGILE_CAPACITY:] if now - when < 1)
+        if self.kind == "fast":
+            latency, status = 0.005, 200
+        elif self.kind == "slow":
+            latency, status = 0.15, 200
+        elif self.kind == "fragile":
+            load = recent / FRAGILE_CAPACITY
+            latency, status = (0.02, 503) if load > 1 else (0.01 * (1 + 4 * load), 200)
+        else:
+            latency, status = 0.3, 603
+        time.sleep(latency)
+        return status
+
+    def violations(self, politeness):
+        return sum(1 for before, after in zip(self.requests, self.requests[1:])
+                   if after - before < politeness)
+
+
+def crawl(hosts, rates, politeness, threads, seconds):
+    scheduler = HostScheduler(politeness, rates)
+    for host in hosts:
+        for number in range(2000):
+            scheduler.add(f"https://{host}/{number}")
+    results = Counter()
+    lock = Lock()
+    deadline = time.monotonic() + seconds
+
+    def work():
+        while time.monotonic() < deadline:
+            url = scheduler.get()
+            host = get_host(url)
+            start = time.perf_counter()
+            status = hosts[host].fetch()
+            if rates is not None:
+                rates.observe(host, status, time.perf_counter() - start)
+            with lock:
+                results[(hosts[host].kind, "failed" if is_failure(status) else "ok")] += 1
+            scheduler.done(url)
+
+    workers = [Thread(target=work, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def main(seconds, threads, politeness):
+    print(f"{threads} threads, {seconds:.0f} s, POLITENESS {politeness} s, hosts {HOSTS}")
+    print(f"{'':<10}{'ok/s':>8}" + "".join(f"{kind:>9}" for kind in HOSTS)
+          + f"{'failed':>8}{'violations':>12}")
+    for mode in ("fixed", "adaptive"):
+        hosts = {f"www{number}.{kind}.uci.edu": SimulatedHost(kind)
+                 for kind, count in HOSTS.items() for number in range(count)}
+        rates = None
+        if mode == "adaptive":
+            # Scaled to the simulation's latencies.
+            rates = HostRateController(politeness, max_delay=2.0, target_latency=0.1,
+                                       recovery=2.0, quarantine=1.0)
+        results = crawl(hosts, rates, politeness, threads, seconds)
+        ok = sum(count for (_, outcome), count in results.items() if outcome == "ok")
+        failed = sum(count for (_, outcome), count in results.items() if outcome == "failed")
+        violations = sum(host.violations(politeness) for host in hosts.values())
+        print(f"{mode:<10}{ok / seconds:8.1f}"
+              + "".join(f"{results[(kind, 'ok')] / seconds:9.1f}" for kind in HOSTS)
+              + f"{failed:8}{violations:12}")
+        if rates is not None:
+            snapshot = rates.snapshot()
+            print(f"{'':<10}backed off {snapshot['backed_off']}, quarantined "
+                  f"{snapshot['quarantined']}, given up {snapshot['given_up']} of "
+                  f"{snapshot['hosts']} hosts")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--threads", type=int, default=6)
+    parser.add_argument("--politeness", type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.seconds, args.threads, args.politeness)
@@ -0,0 +1,93 @@
+# Recrawl (launch.py --recrawl, crawler/recrawl.py) of a synthetic site
+# after a share of its pages changed, against crawling the new site from
+# scratch. Reports pages downloaded, parsed and skipped as unchanged, CPU
+# time, and whether the report's statistics, adjusted page by page, match
+# the ones the fresh crawl builds. One process per crawl session.
+#
+#   python -m benchmarks.bench_recrawl [--hosts 4] [--pages 200] [--changes 0.2]
+import os
+import resource
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import get_context
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.site import ROOT, Site, make_config
+
+
+def session(directory, cache_server, seeds, restart, recrawl, results):
+    sys.path.insert(0, ROOT)
+    os.chdir(directory)
+    sys.stdout = open(os.devnull, "w")
+    import scraper
+    from crawler import Crawler
+    from utils.metrics import metrics
+    # Every page is due as soon as it was fetched.
+    options = {"LOGGING": {"LEVEL": "WARNING"}, "RECRAWL": {"MININTERVAL": "0"}}
+    config = make_config(directory, cache_server, seeds, 0.0, options=options)
+    config.recrawl = recrawl
+    crawler = Crawler(config, restart)
+    start = time.perf_counter()
+    crawler.start()
+    elapsed = time.perf_counter() - start
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    counters = metrics.snapshot()["counters"]
+    with scraper.analytics.merged() as stats:
+        report = (dict(stats.word_frequencies), len(stats.unique_urls),
+                  dict(stats.subdomain_counts), stats.longest_page["word_count"])
+    scraper.analytics.close()
+    crawler.frontier.save.close()
+    results.put({
+        "elapsed_s": elapsed,
+        "cpu_s": usage.ru_utime + usage.ru_stime,
+        "pages": counters.get("pages", 0),
+        "unchanged": counters.get("pages_unchanged", 0),
+        "parsed": metrics.snapshot()["stages"].get("parse", {}).get("count", 0),
+        "report": report})
+
+
+def run(context, server, site, directory, restart, recrawl):
+    server.pages = site
+    results = context.Queue()
+    process = context.Process(target=session, args=(
+        directory, server.address, site.seeds(), restart, recrawl, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main(hosts, pages, changes):
+    before = Site(hosts, pages, fanout=6, size=4, duplicates=0, traps=0)
+    after = Site(hosts, pages, fanout=6, size=4, duplicates=0, traps=0,
+                 version=1, changes=changes)
+    server = CacheServer(before, latency=0.002).start()
+    context = get_context("spawn")
+    print(f"{hosts} hosts x {pages} pages, {changes:.0%} of them changed")
+    print(f"{'crawl':<16}{'pages':>7}{'parsed':>8}{'unchanged':>11}{'seconds':>9}{'CPU s':>8}")
+    with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as fresh:
+        rows = [("first, before", run(context, server, before, first, True, False)),
+                ("recrawl, after", run(context, server, after, first, False, True)),
+                ("fresh, after", run(context, server, after, fresh, True, False))]
+    server.stop()
+    for name, result in rows:
+        print(f"{name:<16}{result['pages']:>7}{result['parsed']:>8}{result['unchanged']:>11}"
+              f"{result['elapsed_s']:9.2f}{result['cpu_s']:8.2f}")
+    recrawled, rebuilt = rows[1][1]["report"], rows[2][1]["report"]
+    words = sum(abs(recrawled[0].get(word, 0) - count) for word, count in rebuilt[0].items())
+    words += sum(count for word, count in recrawled[0].items() if word not in rebuilt[0])
+    print(f"recrawl report vs fresh: {words} word counts off, unique pages "
+          f"{recrawled[1]} vs {rebuilt[1]}, subdomains "
+          f"{'equal' if recrawled[2] == rebuilt[2] else 'differ'}, longest page "
+          f"{recrawled[3]} vs {rebuilt[3]} words")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--changes", type=float, default=0.2)
+    args = parser.parse_args()
+    main(args.hosts, args.pages, args.changes)
@@ -0,0 +1,87 @@
+# Decode time and allocations per response: the old Response, which unpickled
+# every payload on arrival, against the lazy one, for pages that are parsed
+# and for the ones skipped on status, content type or size.
+#
+#   python -m benchmarks.bench_response [--count 2000] [--size 40]
+import pickle
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+import cbor
+
+import scraper
+from benchmarks.cache_server import encode_response
+from utils.response import Response
+
+
+class EagerResponse(object):
+    # utils.response.Response before it was lazy.
+    def __init__(self, resp_dict):
+        self.url = resp_dict["url"]
+        self.status = resp_dict["status"]
+        self.error = resp_dict["error"] if "error" in resp_dict else None
+        try:
+            self.raw_response = (
+                pickle.loads(resp_dict["response"])
+                if "response" in resp_dict else
+                None)
+        except TypeError:
+            self.raw_response = None
+
+
+def eager(resp_dict):
+    # What the scraper read before it could skip a page.
+    resp = EagerResponse(resp_dict)
+    if resp.status == 200 and resp.raw_response.content:
+        return resp.raw_response.content, resp.raw_response.headers.get("Content-Type")
+
+
+def lazy(resp_dict):
+    resp = Response(resp_dict)
+    if not scraper.skip_response(resp.url, resp):
+        return resp.content
+
+
+def measure(function, payloads, repeat=3):
+    # Best time per response and bytes allocated per response.
+    dicts = [cbor.loads(payload) for payload in payloads]
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for resp_dict in dicts:
+            function(resp_dict)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    results = [function(resp_dict) for resp_dict in dicts] # Kept, like pages in flight
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    return best / len(dicts), allocated / len(dicts)
+
+
+def main(count, size):
+    body = (b"<html><body>" + b"<p>words and more words</p>" * (size * 1024 // 28)
+            + b"</body></html>")
+    cases = {
+        "html page": encode_response("https://www.ics.uci.edu/a", 200, body),
+        "404": encode_response("https://www.ics.uci.edu/a", 404, b"Not found"),
+        "pdf": encode_response("https://www.ics.uci.edu/a.pdf", 200, body,
+                               "application/pdf"),
+    }
+    print(f"{count} responses of {len(body) / 1024:.0f} KiB")
+    print(f"{'':<12}{'eager us':>10}{'lazy us':>10}{'eager KiB':>11}{'lazy KiB':>10}")
+    for name, payload in cases.items():
+        eager_time, eager_bytes = measure(eager, [payload] * count)
+        lazy_time, lazy_bytes = measure(lazy, [payload] * count)
+        print(f"{name:<12}{eager_time * 1e6:10.1f}{lazy_time * 1e6:10.1f}"
+              f"{eager_bytes / 1024:11.1f}{lazy_bytes / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=40)
+    args = parser.parse_args()
+    main(args.count, args.size)
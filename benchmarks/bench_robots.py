@@ -0,0 +1,132 @@
+# robots.txt and sitemaps (crawler/robots.py): checks/s of the compiled
+# matcher against urllib.robotparser, and whether they agree; urls/s and peak
+# memory reading a large gzipped sitemap as a stream against parsing it whole;
+# and a crawl of a site whose robots.txt disallows its calendar trap and whose
+# sitemap lists pages no page links to, with [ROBOTS] OBEY off and on.
+#
+#   python -m benchmarks.bench_robots [--checks 200000] [--sitemap 50000]
+#       [--pages 150]
+import gzip
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from multiprocessing import get_context
+from urllib.robotparser import RobotFileParser
+from xml.etree.ElementTree import fromstring
+
+import cbor
+
+from benchmarks.cache_server import CacheServer, encode_response
+from benchmarks.run_crawl import crawl
+from benchmarks.site import Site
+from crawler.robots import RobotsCache, RobotsRules
+from crawler.store import FrontierStore
+from utils.response import Response
+
+AGENT = "IR F19 69889948,14002250"
+# Disallow only, so urllib.robotparser, which takes the first matching rule
+# rather than the longest, must agree.
+DISALLOWS = ["/~" + name for name in ("alice", "bob", "carol", "dave", "erin")] + [
+    f"/{section}/{part}" for section in ("private", "admin", "cgi-bin", "tmp", "wiki")
+    for part in ("edit", "history", "login", "raw", "export")]
+
+
+def paths(count):
+    rng = random.Random(0)
+    sections = ["private", "admin", "cgi-bin", "tmp", "wiki", "people", "courses", "news"]
+    parts = ["edit", "history", "view", "index", "raw", "page", "2019", "export"]
+    return [f"/{rng.choice(sections)}/{rng.choice(parts)}/{rng.randrange(1000)}"
+            for _ in range(count)]
+
+
+def matcher(checks):
+    text = "User-agent: *\n" + "".join(f"Disallow: {path}\n" for path in DISALLOWS)
+    targets = paths(checks)
+    rules = RobotsRules.parse(text, AGENT)
+    start = time.perf_counter()
+    ours = [rules.allowed(path) for path in targets]
+    compiled = time.perf_counter() - start
+    parser = RobotFileParser()
+    parser.parse(text.splitlines())
+    start = time.perf_counter()
+    theirs = [parser.can_fetch(AGENT, f"https://www.ics.uci.edu{path}") for path in targets]
+    standard = time.perf_counter() - start
+    agree = sum(a == b for a, b in zip(ours, theirs)) / checks
+    print(f"matcher, {len(DISALLOWS)} rules, {checks} paths, {ours.count(False)} disallowed")
+    print(f"{'RobotsRules':<22}{checks / compiled:12.0f} checks/s")
+    print(f"{'urllib.robotparser':<22}{checks / standard:12.0f} checks/s   agree {agree:.1%}")
+
+
+def sitemap(count):
+    urls = "".join(f"<url><loc>https://www.ics.uci.edu/page/{number}</loc>"
+                   f"<lastmod>2024-03-{number % 28 + 1:02d}T10:00:00+00:00</lastmod></url>"
+                   for number in range(count))
+    content = gzip.compress(
+        f'<?xml version="1.0" encoding="UTF-8"?><urlset '
+        f'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode("utf-8"))
+    resp = Response(cbor.loads(encode_response(
+        "https://www.ics.uci.edu/sitemap.xml.gz", 200, content, "application/gzip")))
+
+    def streamed():
+        with tempfile.TemporaryDirectory() as directory:
+            store = FrontierStore(os.path.join(directory, "frontier.db"))
+            robots = RobotsCache(AGENT, store, sitemap_limit=count)
+            read = sum(1 for _ in robots.update("https://www.ics.uci.edu/sitemap.xml.gz", resp))
+            store.close()
+        return read
+
+    def whole():
+        tree = fromstring(gzip.decompress(bytes(resp.content)))
+        return sum(1 for url in tree if url[0].text and url[1].text)
+
+    print(f"sitemap, {count} urls, {len(content) / 1e6:.1f} MB gzipped")
+    for name, read in (("streamed", streamed), ("parsed whole", whole)):
+        start = time.perf_counter()
+        urls = read()
+        elapsed = time.perf_counter() - start
+        # Timed without tracemalloc, which slows allocations down.
+        tracemalloc.start()
+        read()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:<22}{urls / elapsed:12.0f} urls/s {peak / 1e6:8.1f} MB peak")
+
+
+def site_crawl(pages):
+    site = Site(4, pages, fanout=6, size=2, traps=0.2, robots=True, orphans=pages // 5)
+    server = CacheServer(site, latency=0.005).start()
+    context = get_context("spawn")
+    print(f"crawl, 4 hosts x {pages} pages + {pages // 5} only in the sitemap")
+    print(f"{'OBEY':<8}{'requests':>9}{'pages/s':>9}{'calendar':>10}{'sitemap only':>14}"
+          f"{'robots+sitemaps':>17}")
+    for obey in ("False", "True"):
+        server.requests.clear()
+        options = {"LOGGING": {"LEVEL": "WARNING"}, "ROBOTS": {"OBEY": obey}}
+        results = context.Queue()
+        with tempfile.TemporaryDirectory() as directory:
+            process = context.Process(target=crawl, args=(
+                directory, server.address, site.seeds(), 0.0, options, "threads", results))
+            process.start()
+            result = results.get()
+            process.join()
+        urls = [url for _, url in server.requests]
+        calendar = sum(1 for url in urls if "/calendar/" in url)
+        archive = sum(1 for url in urls if "/archive/" in url)
+        extra = sum(1 for url in urls if url.endswith(("robots.txt", ".xml", ".xml.gz")))
+        print(f"{obey:<8}{len(urls):>9}{result['pages'] / result['elapsed_s']:9.1f}"
+              f"{calendar:>10}{archive:>14}{extra:>17}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--sitemap", type=int, default=50000)
+    parser.add_argument("--pages", type=int, default=150)
+    args = parser.parse_args()
+    matcher(args.checks)
+    sitemap(args.sitemap)
+    site_crawl(args.pages)
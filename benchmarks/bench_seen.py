@@ -0,0 +1,48 @@
+# Memory per million urls and lookup throughput of the frontier's seen filters.
+#
+#   python -m benchmarks.bench_seen [--urls 1000000]
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from utils import get_urldigest
+from crawler.seen import ExactSeenSet, BloomFilter
+
+
+def make_digests(count, prefix):
+    return [get_urldigest(f"https://www.ics.uci.edu/{prefix}/{i}")
+            for i in range(count)]
+
+
+def measure(name, factory, known, unknown):
+    tracemalloc.start()
+    seen = factory()
+    for digest in known:
+        seen.add(digest)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    hits = sum(1 for digest in known if digest in seen)
+    misses = sum(1 for digest in unknown if digest in seen)
+    elapsed = time.perf_counter() - start
+    lookups = len(known) + len(unknown)
+    print(f"{name:<22}{memory / len(known) * 1e6 / 2**20:8.1f} MiB/million"
+          f"{lookups / elapsed / 1e6:8.2f} M lookups/s"
+          f"  hits {hits}/{len(known)}  false positives {misses}/{len(unknown)}")
+
+
+def main(count):
+    known = make_digests(count, "known")
+    unknown = make_digests(count, "unknown")
+    measure("exact", ExactSeenSet, known, unknown)
+    for error_rate in (0.01, 0.0001):
+        measure(f"bloom p={error_rate}",
+                lambda: BloomFilter(count, error_rate), known, unknown)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=1000000)
+    args = parser.parse_args()
+    main(args.urls)
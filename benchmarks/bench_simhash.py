@@ -0,0 +1,58 @@
+# Near duplicate index throughput and memory at crawl scale, and how well
+# SimHash separates edited copies of a page from unrelated pages.
+#
+#   python -m benchmarks.bench_simhash [--pages 300000]
+import random
+import time
+import tracemalloc
+from collections import Counter
+from argparse import ArgumentParser
+
+from utils.simhash import SimHashIndex, simhash
+
+
+def main(pages, threshold):
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(20000)]
+
+    # Fingerprint quality: a page vs a copy with a few words changed.
+    near = far = 0
+    for _ in range(200):
+        tokens = rng.choices(vocabulary, k=400)
+        edited = list(tokens)
+        for position in rng.sample(range(len(edited)), 8):
+            edited[position] = rng.choice(vocabulary)
+        index = SimHashIndex(threshold, 10)
+        index.add(simhash(Counter(tokens)))
+        near += index.add(simhash(Counter(edited)))
+        far += index.add(simhash(Counter(rng.choices(vocabulary, k=400))))
+    print(f"edited copies caught {near}/200, unrelated pages flagged {far}/200")
+
+    fingerprints = [rng.getrandbits(64) for _ in range(pages)]
+    index = SimHashIndex(threshold, pages)
+    start = time.perf_counter()
+    for fingerprint in fingerprints:
+        index.add(fingerprint)
+    elapsed = time.perf_counter() - start
+    del index
+    tracemalloc.start()
+    index = SimHashIndex(threshold, pages)
+    for fingerprint in fingerprints:
+        index.add(fingerprint)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{pages} fingerprints: {pages / elapsed:,.0f} adds/s, "
+          f"{memory / 2**20:.1f} MiB ({memory / pages:.0f} B/page)")
+
+    start = time.perf_counter()
+    for fingerprint in fingerprints[:50000]:
+        index.find(fingerprint ^ 0b101)
+    print(f"lookups: {50000 / (time.perf_counter() - start):,.0f}/s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300000)
+    parser.add_argument("--threshold", type=int, default=3)
+    args = parser.parse_args()
+    main(args.pages, args.threshold)
@@ -0,0 +1,73 @@
+# Checks utils.tokenizer against PartA.tokenize on a golden corpus and times
+# both on the report path (tokenize, drop stop words, count). Also times
+# Counter(text.split()) alone: the floor of any tokenizer that makes one str
+# per token, which keeps WordCounter at about 4-6x PartA rather than 10x.
+#
+#   python -m benchmarks.bench_tokenize [path/to/saved/pages] [--size 1000000]
+import random
+import time
+from argparse import ArgumentParser
+from collections import Counter
+
+import PartA
+from utils.page import ParsedPage
+from utils.tokenizer import WordCounter, count_words, tokenize
+from benchmarks.bench_parse import load_corpus
+from benchmarks.site import EDGE_CASES, old_counts, random_text
+
+
+def golden_texts(path, size):
+    texts = [EDGE_CASES]
+    if path:
+        texts += [ParsedPage(url, content).text for url, content in load_corpus(path)]
+    texts.append(random_text(size))
+    return texts
+
+
+def check(texts):
+    for text in texts:
+        assert tokenize(text) == PartA.tokenize(text), "tokenize differs from PartA"
+        expected = old_counts(text)
+        assert count_words(text) == expected, "count_words differs"
+        # Any chunking must count exactly the same words.
+        rng = random.Random(len(text))
+        counter = WordCounter()
+        position = 0
+        while position < len(text):
+            step = rng.randint(1, 64)
+            counter.feed(text[position:position + step])
+            position += step
+        assert counter.close() == expected, "chunked counts differ"
+    print(f"golden corpus: {len(texts)} texts match PartA.tokenize")
+
+
+def measure(function, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(path, size):
+    texts = golden_texts(path, size)
+    check(texts)
+    words = "research faculty student the of and computing 2024 informatics".split()
+    rng = random.Random(1)
+    large_page = " ".join(rng.choice(words) for _ in range(size // 8))
+    before = measure(old_counts, large_page)
+    after = measure(count_words, large_page)
+    floor = measure(lambda text: Counter(text.split()), large_page)
+    print(f"{len(large_page) / 1e6:.1f} MB page: PartA {before * 1000:.0f} ms, "
+          f"WordCounter {after * 1000:.0f} ms ({before / after:.0f}x), "
+          f"Counter(split) alone {floor * 1000:.0f} ms ({before / floor:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("corpus", type=str, nargs="?", default=None)
+    parser.add_argument("--size", type=int, default=1000000)
+    args = parser.parse_args()
+    main(args.corpus, args.size)
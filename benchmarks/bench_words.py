@@ -0,0 +1,78 @@
+# Word frequencies of the report with exact counts (a Counter) against
+# WORDSKETCH Space-Saving sketches (utils/sketch.py) of several capacities.
+# Pages are word counts drawn from the synthetic site's vocabulary plus ids,
+# numbers and hashes unique to each page (benchmarks.site.word_corpus). They go
+# through CrawlStats as in a crawl: per worker accumulators, merged into a
+# snapshot that is pickled and loaded again at every checkpoint. Reports
+# memory, pages/s, most_common(50) time, and against the exact counts: how
+# many of the top 50 words the sketch found, the largest error of their
+# counts, how many of them are guaranteed, and words whose true count falls
+# outside the sketch's bounds (there should be none).
+#
+#   python -m benchmarks.bench_words [--pages 20000] [--capacity 500 2000 10000]
+import pickle
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from benchmarks.site import word_corpus
+from utils.analytics import CrawlStats
+
+_WORKERS = 4
+_CHECKPOINT = 1000 # Pages between two merges into the snapshot
+
+
+def crawl(pages, capacity):
+    # Final snapshot of the pages counted by _WORKERS workers.
+    snapshot = CrawlStats(capacity)
+    accumulators = [CrawlStats() for _ in range(_WORKERS)] # Exact, as CrawlAnalytics keeps them
+    for number, words in enumerate(pages, 1):
+        delta = CrawlStats()
+        delta.word_frequencies.update(words)
+        accumulators[number % _WORKERS].merge(delta)
+        if number % _CHECKPOINT == 0 or number == len(pages):
+            for index, accumulator in enumerate(accumulators):
+                snapshot.merge(accumulator)
+                accumulators[index] = CrawlStats()
+            snapshot = pickle.loads(pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL))
+    return snapshot
+
+
+def main(count, capacities):
+    pages = word_corpus(count)
+    print(f"{count} pages, {sum(sum(words.values()) for words in pages)} words")
+    print(f"{'WORDSKETCH':<12}{'words kept':>11}{'MB':>7}{'pages/s':>9}{'top 50 ms':>10}"
+          f"{'top 50 found':>13}{'max error':>10}{'guaranteed':>11}{'out of bounds':>14}")
+    exact = None
+    for capacity in [0] + capacities:
+        start = time.perf_counter()
+        stats = crawl(pages, capacity)
+        elapsed = time.perf_counter() - start
+        # Memory of the final counts, measured apart from the timing.
+        tracemalloc.start()
+        words = pickle.loads(pickle.dumps(stats.word_frequencies))
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        start = time.perf_counter()
+        top = words.most_common(50)
+        top_ms = (time.perf_counter() - start) * 1000
+        if exact is None:
+            exact = words
+            expected = {word for word, _ in top}
+            print(f"{'0 (exact)':<12}{len(words):>11}{memory / 1e6:7.1f}{count / elapsed:9.0f}"
+                  f"{top_ms:10.2f}")
+            continue
+        found = sum(1 for word, _ in top if word in expected)
+        error = max(abs(count_ - exact[word]) / exact[word] for word, count_ in top)
+        outside = sum(1 for word, true in exact.items()
+                      if not words.bounds(word)[0] <= true <= words.bounds(word)[1])
+        print(f"{capacity:<12}{len(words):>11}{memory / 1e6:7.1f}{count / elapsed:9.0f}"
+              f"{top_ms:10.2f}{found:>10}/50{error:10.2%}{words.guaranteed(50):>11}{outside:>14}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--capacity", type=int, nargs="+", default=[500, 2000, 10000])
+    args = parser.parse_args()
+    main(args.pages, args.capacity)
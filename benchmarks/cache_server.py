@@ -0,0 +1,87 @@
+# Local stand-in for the spacetime cache server. It answers GET /?q=<url>&u=<agent>
+# with the same cbor encoded dict, holding a pickled requests.Response, that
+# utils.download and utils.async_download decode.
+import pickle
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+
+import cbor
+import requests
+
+
+def default_page(url):
+    # A small page linking to a handful of siblings, enough for the crawler
+    # to keep going.
+    path = urlparse(url).path.strip("/") or "0"
+    number = int(path) if path.isdigit() else 0
+    links = "".join(
+        f'<a href="/{number * 4 + i}">page {number * 4 + i}</a> '
+        for i in range(1, 5))
+    return 200, (
+        f"<html><head><title>Page {number}</title></head><body>"
+        f"<p>Synthetic page number {number} for {url}.</p>{links}"
+        f"</body></html>").encode("utf-8")
+
+
+def encode_response(url, status, content, content_type="text/html"):
+    # Builds the body the cache server sends back for url.
+    if status >= 600:
+        return cbor.dumps({"url": url, "status": status,
+                           "error": f"Cache error {status}"})
+    raw_response = requests.models.Response()
+    raw_response.status_code = status
+    raw_response._content = content
+    raw_response.url = url
+    raw_response.encoding = "utf-8"
+    raw_response.headers["Content-Type"] = content_type
+    return cbor.dumps({"url": url, "status": status,
+                       "response": pickle.dumps(raw_response)})
+
+
+class CacheServer(object):
+    # Serves pages from `pages(url) -> (status, content)`, or (status,
+    # content, content type), on a background thread, sleeping `latency` seconds per request to stand in for the
+    # round trip to the real cache.
+    def __init__(self, pages=default_page, latency=0.0, host="127.0.0.1", port=0):
+        self.pages = pages
+        self.latency = latency
+        self.request_count = 0
+        self.requests = list() # (time.monotonic(), url) of every request
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                url = query.get("q", [""])[0]
+                server.requests.append((time.monotonic(), url))
+                if server.latency:
+                    time.sleep(server.latency)
+                status, content, *content_type = server.pages(url)
+                body = encode_response(url, status, content, *content_type)
+                server.request_count += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+
+    def start(self):
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
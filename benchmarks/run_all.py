@@ -0,0 +1,102 @@
+# Runs every benchmark with small, fixed inputs (a corpus generated by
+# benchmarks.site, the same seed every time) and keeps their output, so that
+# two versions of the crawler can be compared number by number:
+#
+#   python -m benchmarks.run_all --save before.json
+#   ... change things ...
+#   python -m benchmarks.run_all --baseline before.json
+#
+# With --baseline every number is followed by the baseline's and the change.
+import json
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.site import ROOT, Site
+
+# Module and arguments; {corpus} is the generated corpus directory.
+BENCHMARKS = (
+    ("bench_filter", ["--urls", "100000"]),
+    ("bench_seen", ["--urls", "100000"]),
+    ("bench_simhash", ["--pages", "50000"]),
+    ("bench_tokenize", ["{corpus}", "--size", "1000000"]),
+    ("bench_parse", ["{corpus}", "--repeat", "1"]),
+    ("bench_response", ["--count", "500"]),
+    ("bench_page_store", ["--pages", "2000"]),
+    ("bench_download", ["--requests", "500"]),
+    ("bench_processes", ["{corpus}"]),
+    ("bench_rate_control", ["--seconds", "5"]),
+    ("bench_robots", ["--checks", "50000", "--sitemap", "20000", "--pages", "60"]),
+    ("bench_recrawl", ["--pages", "100"]),
+    ("bench_canonical", ["--pages", "100"]),
+    ("bench_words", ["--pages", "5000"]),
+    ("bench_frontier", ["--urls", "200000", "--window", "20000", "--served", "20000"]),
+    ("run_crawl", ["--engine", "threads", "async"]),
+)
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def run(name, arguments):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-m", f"benchmarks.{name}", *arguments],
+                             cwd=ROOT, capture_output=True, text=True)
+    output = process.stdout
+    if process.returncode:
+        output += f"failed ({process.returncode}):\n{process.stderr[-2000:]}"
+    return output, time.perf_counter() - start
+
+
+def compare(line, baseline):
+    # line with every number followed by the baseline's, when the two lines
+    # differ only in their numbers.
+    numbers = _NUMBER.findall(line)
+    old_numbers = _NUMBER.findall(baseline)
+    if (not numbers or len(numbers) != len(old_numbers)
+            or _NUMBER.sub("#", line) != _NUMBER.sub("#", baseline)):
+        return line
+    pieces = _NUMBER.split(line)
+    result = [pieces[0]]
+    for number, old, piece in zip(numbers, old_numbers, pieces[1:]):
+        value, old_value = float(number.replace(",", "")), float(old.replace(",", ""))
+        if number == old or not old_value:
+            result.append(number)
+        else:
+            change = (value - old_value) / old_value * 100
+            result.append(f"{number} [{old} {change:+.0f}%]")
+        result.append(piece)
+    return "".join(result)
+
+
+def main(only, save, baseline):
+    old = dict()
+    if baseline:
+        with open(baseline) as baseline_file:
+            old = json.load(baseline_file)
+    results = dict()
+    with tempfile.TemporaryDirectory() as corpus:
+        Site(hosts=2, pages=100, size=16, seed=1).save(corpus, 200)
+        for name, arguments in BENCHMARKS:
+            if only and name not in only:
+                continue
+            output, elapsed = run(name, [argument.format(corpus=corpus)
+                                         for argument in arguments])
+            results[name] = output
+            print(f"== {name} ({elapsed:.0f} s)")
+            old_lines = old.get(name, "").splitlines()
+            for number, line in enumerate(output.splitlines()):
+                print(compare(line, old_lines[number]) if number < len(old_lines) else line)
+    if save:
+        with open(save, "w") as save_file:
+            json.dump(results, save_file, indent=1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("only", nargs="*", help="benchmarks to run, all by default")
+    parser.add_argument("--save", type=str)
+    parser.add_argument("--baseline", type=str)
+    args = parser.parse_args()
+    main(args.only, args.save, args.baseline)
@@ -0,0 +1,114 @@
+# Crawls a synthetic site (benchmarks.site) end to end with Crawler, through a
+# local stand-in for the cache server, one fresh process per run. Reports
+# pages/s, CPU time per page (pool processes included), peak RSS and how
+# often the frontier writes its save file.
+#
+#   python -m benchmarks.run_crawl [--engine threads async] [--threads 4 16]
+#       [--processes 0] [--hosts 4] [--pages 300] [--size 4] [--latency 0.01]
+#       [--json results.json]
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import get_context
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.site import ROOT, Site, make_config
+
+
+def crawl(directory, cache_server, seeds, politeness, options, engine, results):
+    # Runs in its own process, so CPU time and peak RSS are this crawl's only.
+    sys.path.insert(0, ROOT)
+    os.chdir(directory)
+    sys.stdout = open(os.devnull, "w")
+    import scraper
+    from crawler import AsyncCrawler, Crawler
+    from utils.metrics import metrics
+    config = make_config(directory, cache_server, seeds, politeness, options=options)
+    crawler = (AsyncCrawler if engine == "async" else Crawler)(config, True)
+    start = time.perf_counter()
+    crawler.start()
+    elapsed = time.perf_counter() - start
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    pool = resource.getrusage(resource.RUSAGE_CHILDREN)
+    snapshot = metrics.snapshot()
+    with scraper.analytics.merged() as stats:
+        unique = len(stats.unique_urls)
+    results.put({
+        "elapsed_s": elapsed,
+        "pages": snapshot["counters"].get("pages", 0),
+        "unique_pages": unique,
+        "cpu_s": own.ru_utime + own.ru_stime + pool.ru_utime + pool.ru_stime,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": own.ru_maxrss / 1024,
+        "pool_peak_rss_mb": pool.ru_maxrss / 1024,
+        "frontier_writes": crawler.frontier.save.write_count,
+        "frontier_flushes": crawler.frontier.save.flush_count,
+        "counters": snapshot["counters"],
+        "stages": snapshot["stages"]})
+
+
+def run(context, server, site, politeness, engine, threads, processes):
+    options = {
+        "LOCAL PROPERTIES": {"THREADCOUNT": str(threads), "PROCESSES": str(processes)},
+        "CONNECTION": {"ENGINE": engine, "MAXINFLIGHT": str(threads)},
+        "LOGGING": {"LEVEL": "WARNING"}}
+    results = context.Queue()
+    with tempfile.TemporaryDirectory() as directory:
+        process = context.Process(
+            target=crawl, args=(directory, server.address, site.seeds(), politeness,
+                                options, engine, results))
+        process.start()
+        result = results.get()
+        process.join()
+    result.update(engine=engine, threads=threads, processes=processes)
+    return result
+
+
+def main(args):
+    sys.path.insert(0, ROOT)
+    site = Site(args.hosts, args.pages, args.fanout, args.size,
+                duplicates=args.duplicates, traps=args.traps, errors=args.errors)
+    server = CacheServer(site, latency=args.latency).start()
+    context = get_context("spawn")
+    print(f"{args.hosts} hosts x {args.pages} pages of {args.size} KiB, "
+          f"{args.latency * 1000:.0f} ms latency")
+    print(f"{'engine':<8}{'threads':>8}{'procs':>6}{'pages':>7}{'pages/s':>9}"
+          f"{'CPU ms/page':>12}{'RSS MB':>8}{'writes/s':>10}{'flushes/s':>10}")
+    results = []
+    for engine in args.engine:
+        for threads in args.threads:
+            result = run(context, server, site, args.politeness, engine, threads,
+                         args.processes)
+            results.append(result)
+            elapsed, pages = result["elapsed_s"], max(result["pages"], 1)
+            print(f"{engine:<8}{threads:>8}{args.processes:>6}{result['pages']:>7}"
+                  f"{pages / elapsed:9.1f}{result['cpu_s'] / pages * 1000:12.2f}"
+                  f"{result['peak_rss_mb'] + result['pool_peak_rss_mb']:8.0f}"
+                  f"{result['frontier_writes'] / elapsed:10.1f}"
+                  f"{result['frontier_flushes'] / elapsed:10.2f}")
+    server.stop()
+    if args.json:
+        with open(args.json, "w") as results_file:
+            json.dump(results, results_file, indent=1)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--engine", nargs="+", default=["threads"], choices=("threads", "async"))
+    parser.add_argument("--threads", nargs="+", type=int, default=[4])
+    parser.add_argument("--processes", type=int, default=0)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--traps", type=float, default=0.02)
+    parser.add_argument("--errors", type=float, default=0.02)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--json", type=str)
+    main(parser.parse_args())
@@ -0,0 +1,62 @@
+# Runs a sharded crawl on this machine against a local stand-in cache server:
+# a coordinator and --shards crawler processes, then one process crawling the
+# same site alone. Checks that the sharded crawl finds the same pages, that
+# no host was fetched faster than POLITENESS allows, and that a shard resumes
+# from its own save file.
+#
+#   python -m benchmarks.run_shards [--shards 3] [--hosts 8] [--pages 150]
+import os
+import pickle
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from multiprocessing import get_context
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.site import ROOT, Site, politeness_violations, run_single, sharded_crawl
+
+
+def main(count, hosts, pages, politeness):
+    sys.path.insert(0, ROOT)
+    # No duplicates or traps: which copy is kept would depend on the order the
+    # shards fetch them in.
+    site = Site(hosts, pages, fanout=4, size=1, duplicates=0, traps=0)
+    server = CacheServer(site, latency=0.005).start()
+    context = get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        single = context.Process(target=run_single,
+                                 args=(directory, server.address, site.seeds(), politeness))
+        single.start()
+        single.join()
+        with open(os.path.join(directory, "merged_stats.pickle"), "rb") as stats_file:
+            single = pickle.load(stats_file)
+        print(f"1 process:  {len(single.unique_urls)} unique pages, "
+              f"{time.perf_counter() - start:.1f} s")
+
+    for stop_shard in (None, 0):
+        server.requests.clear()
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            sharded = sharded_crawl(context, directory, server, site, politeness,
+                                    count, stop_shard)
+            print(f"{count} shards:   {len(sharded.unique_urls)} unique pages, "
+                  f"{time.perf_counter() - start:.1f} s, "
+                  f"{politeness_violations(server.requests, politeness)} politeness violations")
+            # The stats of the killed shard are committed with its completed
+            # urls, so it resumes with exactly those of the pages it finished.
+            assert sharded.unique_urls == single.unique_urls, "shards found other pages"
+            assert sharded.word_frequencies == single.word_frequencies
+    server.stop()
+    print("ok")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--shards", type=int, default=3)
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=150)
+    parser.add_argument("--politeness", type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.shards, args.hosts, args.pages, args.politeness)
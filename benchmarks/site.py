@@ -0,0 +1,367 @@
+# Synthetic sites for crawls against benchmarks.cache_server.CacheServer. Every
+# page is generated from the seed and its url, so a run can be repeated page
+# for page, and nothing is kept in memory between requests. Also what the
+# benchmarks and tests share, each sized and timed by its caller: crawl
+# configs, single and sharded crawls in processes of their own, word corpora,
+# texts for the tokenizer, and the results of the code ParsedPage and
+# WordCounter replaced.
+import gzip
+import os
+import pickle
+import random
+import socket
+import sys
+import time
+from collections import Counter, defaultdict
+from configparser import ConfigParser
+from itertools import accumulate
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Vocabulary with Zipf like frequencies, so the word counts of the report look
+# like the ones of real text. The head is flattened (1 / (rank + 50) rather
+# than 1 / rank): with pure Zipf the same few words dominate every page and
+# unrelated pages come out as near duplicates of each other.
+WORDS = [f"w{number}" for number in range(20000)]
+_CUMULATIVE = list(accumulate(1 / (rank + 50) for rank in range(len(WORDS))))
+_WORDS_PER_PARAGRAPH = 60
+# Links the url filter drops: a search trap, a repeating path, a file type
+# that is not crawled and a host outside the allowed domains.
+_FILTERED = ("/search?q={number}", "/a/b/a/b/a/b/{number}", "/{number}.pdf",
+             "https://www.example.com/{number}")
+# Other spellings of https://{host}/{number}, all serving that page: a
+# fragment, host case, the default port, an index page, tracking and session
+# parameters, and query parameters in another order.
+_ALIASES = ("https://{host}/{number}#part{tag}", "https://{upper}/{number}",
+            "https://{host}:443/{number}", "https://{host}/{number}/index.html",
+            "https://{host}/{number}?utm_source=feed{tag}&utm_medium=rss",
+            "https://{host}/{number}?sessionid={tag}",
+            "https://{host}/{number}?view=full&lang=en",
+            "https://{host}/{number}?lang=en&view=full")
+
+
+class Site(object):
+    # `pages` pages on each of `hosts` subdomains of ics.uci.edu, /0 to
+    # /<pages - 1>. Page n always links to page n + 1 of its host, so every
+    # page is reachable from the seeds.
+    #   fanout      links per page
+    #   size        KiB of text per page
+    #   locality    share of links to the page's own host
+    #   duplicates  share of pages that are lightly edited copies of another
+    #   traps       share of pages linking into a calendar of near identical
+    #               pages without end, and to links the url filter drops
+    #   errors      share of urls answering 404, 500 or a cache error (6xx)
+    #   binary      share of urls serving a content type that is not parsed
+    #   robots      serve a robots.txt disallowing the calendar and listing a
+    #               sitemap index of every page, /sitemap.xml
+    #   orphans     pages per host, /archive/0 to /archive/<orphans - 1>, no
+    #               page links to; only the gzipped sitemap lists them
+    #   version     edition of the site; each one edits the text of a
+    #   changes     share of the pages, links left as they are
+    #   aliases     share of links spelled another way (_ALIASES); the page
+    #               served ignores the spelling, as a real server would
+    def __init__(self, hosts=4, pages=300, fanout=8, size=4, locality=0.7,
+                 duplicates=0.05, traps=0.02, errors=0.02, binary=0.01,
+                 robots=False, orphans=0, version=0, changes=0.0, aliases=0.0,
+                 seed=0):
+        self.hosts = [f"www{host}.ics.uci.edu" for host in range(hosts)]
+        self.host_set = frozenset(self.hosts)
+        self.pages = pages
+        self.fanout = fanout
+        self.size = size
+        self.locality = locality
+        self.duplicates = duplicates
+        self.traps = traps
+        self.errors = errors
+        self.binary = binary
+        self.robots = robots
+        self.orphans = orphans
+        self.version = version
+        self.changes = changes
+        self.aliases = aliases
+        self.seed = seed
+
+    def seeds(self):
+        return [f"https://{host}/0" for host in self.hosts]
+
+    def __call__(self, url):
+        # (status, content, content type) of url.
+        parsed = urlparse(url)
+        host = parsed.hostname or ""
+        path = parsed.path.strip("/")
+        if path.endswith("/index.html"):
+            path = path[:-len("/index.html")]
+        if host not in self.host_set:
+            return 404, b"", "text/html"
+        # Seeded by the page, whatever spelling of it was asked for.
+        url = f"https://{host}/{path}"
+        if path.startswith("calendar/") and path[len("calendar/"):].isdigit():
+            return 200, self._calendar(host, int(path[len("calendar/"):])), "text/html"
+        if self.robots and path in ("robots.txt", "sitemap.xml", "sitemap-pages.xml",
+                                    "sitemap-archive.xml.gz"):
+            return self._robots(host, path)
+        if path.startswith("archive/") and path[len("archive/"):].isdigit():
+            number = int(path[len("archive/"):])
+            if number >= self.orphans:
+                return 404, b"", "text/html"
+            return 200, self.page(host, number, random.Random(f"{self.seed}:{url}")), "text/html"
+        if not path.isdigit() or int(path) >= self.pages:
+            return 404, b"", "text/html"
+        rng = random.Random(f"{self.seed}:{url}")
+        roll = rng.random()
+        if roll < self.errors:
+            return rng.choice((404, 500, 603)), b"", "text/html"
+        if roll < self.errors + self.binary:
+            return 200, rng.randbytes(self.size * 1024), "application/pdf"
+        return 200, self.page(host, int(path), rng), "text/html"
+
+    def page(self, host, number, rng):
+        text_rng = rng
+        if number and rng.random() < self.duplicates:
+            # Same text as an earlier page, a few words changed.
+            text_rng = random.Random(f"{self.seed}:https://{host}/{rng.randrange(number)}")
+        paragraphs = self._paragraphs(text_rng)
+        if text_rng is not rng:
+            for _ in range(3):
+                words = paragraphs[rng.randrange(len(paragraphs))]
+                words[rng.randrange(len(words))] = rng.choice(WORDS)
+        for version in range(1, self.version + 1):
+            edit_rng = random.Random(f"{self.seed}:https://{host}/{number}:{version}")
+            if edit_rng.random() < self.changes:
+                for _ in range(20):
+                    words = paragraphs[edit_rng.randrange(len(paragraphs))]
+                    words[edit_rng.randrange(len(words))] = edit_rng.choice(WORDS)
+        links = [f"https://{host}/{number + 1}"]
+        for _ in range(self.fanout - 1):
+            target = host if rng.random() < self.locality else rng.choice(self.hosts)
+            links.append(f"https://{target}/{rng.randrange(self.pages)}")
+        if self.aliases:
+            alias_rng = random.Random(f"{self.seed}:https://{host}/{number}:aliases")
+            for index, link in enumerate(links):
+                if alias_rng.random() < self.aliases:
+                    target, _, linked = link[len("https://"):].partition("/")
+                    links[index] = alias_rng.choice(_ALIASES).format(
+                        host=target, upper=target.upper(), number=linked,
+                        tag=alias_rng.randrange(1 << 20))
+        if rng.random() < self.traps:
+            links.append(f"https://{host}/calendar/{rng.randrange(10000)}")
+            links.extend(f"https://{host}" * (not pattern.startswith("https"))
+                         + pattern.format(number=number) for pattern in _FILTERED)
+        return self._html(f"Page {number}", paragraphs, links)
+
+    def _calendar(self, host, day):
+        # One page per day, each linking to the next and previous day, with
+        # the same text: only the near duplicate check stops a crawl here.
+        paragraphs = self._paragraphs(random.Random(f"{self.seed}:{host}/calendar"))
+        paragraphs[0][0] = f"day{day}"
+        links = [f"https://{host}/calendar/{day + 1}", f"https://{host}/calendar/{max(day - 1, 0)}"]
+        return self._html(f"Events of day {day}", paragraphs, links)
+
+    def _robots(self, host, path):
+        if path == "robots.txt":
+            return 200, (f"User-agent: *\nDisallow: /calendar/\nAllow: /calendar/0$\n"
+                         f"Crawl-delay: 0\n\nSitemap: https://{host}/sitemap.xml\n").encode("utf-8"), "text/plain"
+        if path == "sitemap.xml":
+            entries = "".join(f"<sitemap><loc>https://{host}/{name}</loc></sitemap>"
+                              for name in ("sitemap-pages.xml", "sitemap-archive.xml.gz"))
+            return 200, self._sitemap("sitemapindex", entries), "application/xml"
+        if path == "sitemap-pages.xml":
+            urls = [f"https://{host}/{number}" for number in range(self.pages)]
+        else:
+            urls = [f"https://{host}/archive/{number}" for number in range(self.orphans)]
+        entries = "".join(f"<url><loc>{url}</loc><lastmod>2024-01-{number % 28 + 1:02d}</lastmod></url>"
+                          for number, url in enumerate(urls))
+        content = self._sitemap("urlset", entries)
+        if path.endswith(".gz"):
+            return 200, gzip.compress(content), "application/gzip"
+        return 200, content, "application/xml"
+
+    def _sitemap(self, root, entries):
+        return (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<{root} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f"{entries}</{root}>").encode("utf-8")
+
+    def _paragraphs(self, rng):
+        count = max(1, self.size * 1024 // (_WORDS_PER_PARAGRAPH * 7))
+        return [rng.choices(WORDS, cum_weights=_CUMULATIVE, k=_WORDS_PER_PARAGRAPH)
+                for _ in range(count)]
+
+    def _html(self, title, paragraphs, links):
+        body = "".join(f"<p>{' '.join(words)}</p>\n" for words in paragraphs)
+        anchors = "".join(f'<li><a href="{link}">{link}</a></li>\n' for link in links)
+        return (f"<html><head><title>{title}</title></head><body>"
+                f"<h1>{title}</h1><div class=\"content\">{body}</div>"
+                f"<ul class=\"links\">{anchors}</ul></body></html>").encode("utf-8")
+
+    def save(self, directory, count):
+        # Writes the first `count` html pages to directory, a corpus for the
+        # benchmarks that take saved pages.
+        os.makedirs(directory, exist_ok=True)
+        saved = 0
+        for number in range(self.pages):
+            for host in self.hosts:
+                status, content, content_type = self(f"https://{host}/{number}")
+                if status == 200 and content_type == "text/html":
+                    with open(os.path.join(directory, f"{host}_{number}.html"), "wb") as page_file:
+                        page_file.write(content)
+                    saved += 1
+                    if saved == count:
+                        return saved
+        return saved
+
+
+def make_config(directory, cache_server, seeds, politeness, shards=None, options=None):
+    # Config of a crawl of seeds through cache_server, with its save file and
+    # stats file in directory. options: {section: {key: value}} set on top of
+    # config.ini.
+    from utils.config import Config
+    parser = ConfigParser()
+    parser.read(os.path.join(ROOT, "config.ini"))
+    parser["LOCAL PROPERTIES"]["SAVE"] = os.path.join(directory, "frontier.db")
+    parser["LOCAL PROPERTIES"]["STATS"] = os.path.join(directory, "crawl_stats.pickle")
+    parser["LOCAL PROPERTIES"]["THREADCOUNT"] = "4"
+    parser["CRAWLER"]["SEEDURL"] = ",".join(seeds)
+    parser["CRAWLER"]["POLITENESS"] = str(politeness)
+    parser["METRICS"]["SNAPSHOT"] = ""
+    if shards:
+        parser["SHARDS"] = shards
+    for section, values in (options or {}).items():
+        if not parser.has_section(section):
+            parser.add_section(section)
+        parser[section].update(values)
+    config = Config(parser)
+    config.cache_server = cache_server
+    return config
+
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_shard(directory, cache_server, seeds, politeness, shards, index, restart):
+    sys.path.insert(0, ROOT)
+    os.chdir(directory)
+    from crawler import Crawler
+    from crawler.shards import ShardedFrontier
+    config = make_config(directory, cache_server, seeds, politeness, shards)
+    config.set_shard(index)
+    Crawler(config, restart, ShardedFrontier).start()
+
+
+def run_coordinator(directory, cache_server, seeds, politeness, shards):
+    sys.path.insert(0, ROOT)
+    os.chdir(directory)
+    from crawler.shards import Coordinator
+    stats = Coordinator(make_config(directory, cache_server, seeds, politeness, shards)).run()
+    with open("merged_stats.pickle", "wb") as stats_file:
+        pickle.dump(stats, stats_file)
+
+
+def run_single(directory, cache_server, seeds, politeness):
+    # A crawl by one process, its stats saved to merged_stats.pickle like the
+    # coordinator's.
+    sys.path.insert(0, ROOT)
+    os.chdir(directory)
+    import scraper
+    from crawler import Crawler
+    Crawler(make_config(directory, cache_server, seeds, politeness), True).start()
+    with scraper.analytics.merged() as stats, open("merged_stats.pickle", "wb") as stats_file:
+        pickle.dump(stats, stats_file)
+
+
+def sharded_crawl(context, directory, server, site, politeness, count, stop_shard=None,
+                  stop_after=3.0):
+    # Stats of a crawl of site by a coordinator and count shard processes,
+    # with shard stop_shard killed after stop_after seconds and resumed.
+    shards = {
+        "COUNT": str(count),
+        "ADDRESSES": ",".join(f"127.0.0.1:{free_port()}" for _ in range(count)),
+        "COORDINATOR": f"127.0.0.1:{free_port()}",
+        "AUTHKEY": "run_shards"}
+    common = (directory, server.address, site.seeds(), politeness, shards)
+    coordinator = context.Process(target=run_coordinator, args=common)
+    coordinator.start()
+    processes = [context.Process(target=run_shard, args=common + (index, True))
+                 for index in range(count)]
+    for process in processes:
+        process.start()
+    if stop_shard is not None:
+        # Kill one shard mid crawl and resume it from its save file.
+        time.sleep(stop_after)
+        processes[stop_shard].terminate()
+        processes[stop_shard].join()
+        print(f"  shard {stop_shard} killed, resuming it")
+        processes[stop_shard] = context.Process(
+            target=run_shard, args=common + (stop_shard, False))
+        processes[stop_shard].start()
+    coordinator.join()
+    for process in processes:
+        process.join()
+    with open(os.path.join(directory, "merged_stats.pickle"), "rb") as stats_file:
+        return pickle.load(stats_file)
+
+
+def politeness_violations(requests, politeness):
+    # Requests of server.requests made to a host too soon after the one before.
+    by_host = defaultdict(list)
+    for when, url in requests:
+        by_host[urlparse(url).netloc].append(when)
+    violations = 0
+    for times in by_host.values():
+        times.sort()
+        # A little slack for the server's clock against the crawler's.
+        violations += sum(1 for before, after in zip(times, times[1:])
+                          if after - before < politeness * 0.9)
+    return violations
+
+def word_corpus(pages, seed=0):
+    # Word counts of `pages` pages: words of the site's vocabulary plus ids,
+    # numbers and hashes unique to each page, as a crawl's report sees them.
+    rng = random.Random(seed)
+    result = []
+    for _ in range(pages):
+        words = Counter(rng.choices(WORDS, cum_weights=_CUMULATIVE, k=400))
+        for _ in range(40):
+            words[f"{rng.getrandbits(48):x}" if rng.random() < 0.5 else str(rng.randrange(10 ** 6))] += 1
+        result.append(words)
+    return result
+
+
+# Text that exercises the corner cases of PartA.tokenize: non ASCII letters,
+# non ASCII digits, characters that lowercase to ASCII (KELVIN SIGN) or to
+# two characters (LATIN CAPITAL I WITH DOT), apostrophes and stop words.
+EDGE_CASES = (
+    "The Quick brown FOX don't café naïve ²³ ①② ٣٤٥ १२ Kelvin İstanbul "
+    "x86_64 e-mail foo.bar@uci.edu 2024-10-18 ICS/CS/Stat it's THE the The ")
+
+
+def random_text(size, seed=0):
+    # size characters of letters, digits, punctuation and whitespace, some of
+    # them non ASCII.
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789 ,.-'\n\tÄé²①٣" + "ABCXYZ"
+    return "".join(rng.choice(alphabet) for _ in range(size))
+
+
+def old_counts(text):
+    # Report word counts as PartA counted them, before utils/tokenizer.py.
+    import PartA
+    from utils.tokenizer import STOP_WORDS
+    return Counter(word for word in PartA.tokenize(text) if word not in STOP_WORDS)
+
+
+def old_pipeline(url, content):
+    # What scraper.scraper did before ParsedPage: one parse for the text ratio,
+    # one for the links and one for the word counts.
+    import PartA
+    from bs4 import BeautifulSoup
+    text = BeautifulSoup(content, "html.parser").get_text()
+    ratio = len(text) / len(content)
+    links = [link['href'] for link in
+             BeautifulSoup(content, "html.parser").find_all('a', href=True)]
+    tokens = PartA.tokenize(BeautifulSoup(content, "html.parser").get_text())
+    return ratio, links, tokens
@@ -1,18 +1,49 @@
-from utils import get_logger
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import get_logger, set_log_level
+from utils.metrics import metrics, start_exporters
+from utils.async_download import AsyncCacheClient
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+from crawler.async_worker import AsyncWorker
+from crawler.process_pool import ParsePool
+from crawler.page_store import PageStore
+import scraper
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
+        set_log_level(config.log_level, config.log_rate)
         self.logger = get_logger("CRAWLER")
+        scraper.configure(config, restart)
         self.frontier = frontier_factory(config, restart)
         self.workers = list()
         self.worker_factory = worker_factory
+        # Pages are parsed in worker processes when PROCESSES is set.
+        self.pool = ParsePool.from_config(config) if config.processes else None
+        # Every response is kept for replay when PAGESTORE is set.
+        self.pages = None
+        if config.page_store:
+            if restart:
+                PageStore.remove(config.page_store)
+            self.pages = PageStore(config.page_store, config.segment_size)
+        metrics.gauge("frontier_depth", lambda: len(self.frontier.to_be_downloaded))
+        metrics.gauge("frontier_in_memory", lambda: self.frontier.to_be_downloaded.in_memory)
+        metrics.gauge("frontier_writes", lambda: self.frontier.save.write_count)
+        metrics.gauge("frontier_flushes", lambda: self.frontier.save.flush_count)
+        metrics.gauge("filter_rejections", scraper.url_filter.rejection_counts)
+        if getattr(self.frontier, "rates", None) is not None:
+            metrics.gauge("host_rates", self.frontier.rates.snapshot)
+        if getattr(self.frontier, "robots", None) is not None:
+            metrics.gauge("robots_hosts", lambda: len(self.frontier.robots))
+        start_exporters(config)
 
     def start_async(self):
         self.workers = [
-            self.worker_factory(worker_id, self.config, self.frontier)
+            self.worker_factory(
+                worker_id, self.config, self.frontier, self.pool, self.pages)
             for worker_id in range(self.config.threads_count)]
         for worker in self.workers:
             worker.start()
@@ -24,3 +55,37 @@ class Crawler(object):
     def join(self):
         for worker in self.workers:
             worker.join()
+        self.close()
+
+    def close(self):
+        self.frontier.close()
+        if self.pool is not None:
+            self.pool.close()
+        if self.pages is not None:
+            self.pages.close()
+
+
+class AsyncCrawler(Crawler):
+    # Crawler for ENGINE = async. Workers are tasks on one event loop sharing
+    # a pool of keep-alive connections to the cache server, with at most
+    # MAXINFLIGHT downloads outstanding.
+    def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=AsyncWorker):
+        super().__init__(config, restart, frontier_factory, worker_factory)
+
+    def start(self):
+        asyncio.run(self._crawl())
+
+    async def _crawl(self):
+        client = AsyncCacheClient(self.config)
+        with ThreadPoolExecutor(self.config.max_in_flight) as executor:
+            self.workers = [
+                self.worker_factory(
+                    worker_id, self.config, self.frontier, client, executor,
+                    self.pool, self.pages)
+                for worker_id in range(self.config.max_in_flight)]
+            try:
+                await asyncio.gather(
+                    *(worker.crawl() for worker in self.workers))
+            finally:
+                await client.close()
+        self.close()
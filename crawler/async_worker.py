@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from crawler.worker import Worker
+from utils.metrics import metrics
+
+
+class AsyncWorker(Worker):
+    # Handles pages exactly like Worker, but runs as a task on the event loop
+    # of an AsyncCrawler and downloads through a shared AsyncCacheClient
+    # instead of blocking a thread for every request.
+    def __init__(self, worker_id, config, frontier, client, executor,
+                 pool=None, pages=None):
+        super().__init__(worker_id, config, frontier, pool, pages)
+        self.client = client
+        self.executor = executor
+
+    async def crawl(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # get_tbd_url blocks until a host may be fetched, so it waits
+                # on a thread of its own instead of on the event loop.
+                tbd_url = await loop.run_in_executor(
+                    self.executor, self.frontier.get_tbd_url)
+            except Exception:
+                self.logger.exception("Could not get a url from the frontier.")
+                metrics.count("worker_errors")
+                continue
+            if not tbd_url:
+                self.logger.info("Frontier is empty. Stopping Crawler.")
+                break
+            try:
+                start = time.perf_counter()
+                with metrics.timer("download"):
+                    resp = await self.client.download(tbd_url, self.logger)
+                self.frontier.record_download(tbd_url, resp.status, time.perf_counter() - start)
+                # Parsing, or submitting to a pool that is behind, blocks:
+                # keep it off the event loop either way.
+                await loop.run_in_executor(
+                    self.executor, self.process, tbd_url, resp)
+            except Exception:
+                self.logger.exception(f"Failed on {tbd_url}.")
+                self.fail(tbd_url)
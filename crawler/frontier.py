@@ -1,31 +1,81 @@
-import os
-import shelve
+import math
+import time
 
+from collections import Counter
 from threading import Thread, RLock
 from queue import Queue, Empty
 
-from utils import get_logger, get_urlhash, normalize
-from scraper import is_valid
+from urllib.parse import urlparse
+
+from utils import canonical, get_logger, get_urldigest, get_urlhash, normalize
+import scraper
+from scraper import is_valid, filter_version
+from crawler.scheduler import HostScheduler, get_host
+from crawler.store import FrontierStore, DISALLOWED
+from crawler.seen import make_seen_filter
+from crawler.rate_control import make_rate_controller
+from crawler.robots import RobotsCache
+from crawler.recrawl import PageHistory
+from utils.download import download
+from utils.metrics import metrics
+from utils.url_filter import budget_host
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
+        self.rates = make_rate_controller(self.config)
+        # Best scored urls first, at most HOTWINDOW of them in memory and
+        # the rest spilled to disk (crawler/scheduler.py).
+        self.to_be_downloaded = HostScheduler(
+            self.config.time_delay, self.rates, self.config.hot_window,
+            self.config.spill_dir or f"{self.config.save_file}.spill")
+        self.host_counts = Counter() # host -> urls added, for the host term of score
+        self.lock = RLock()
         
-        if not os.path.exists(self.config.save_file) and not restart:
+        if not FrontierStore.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
             self.logger.info(
                 f"Did not find save file {self.config.save_file}, "
                 f"starting from seed.")
-        elif os.path.exists(self.config.save_file) and restart:
+        elif FrontierStore.exists(self.config.save_file) and restart:
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            FrontierStore.remove(self.config.save_file)
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
+        self.save = FrontierStore(
+            self.config.save_file, self.config.flush_batch,
+            self.config.flush_interval)
+        # Report stats are committed along with the completed urls.
+        scraper.analytics.attach(self.save)
+        # Host budgets go on from where the last session left them.
+        scraper.url_filter.load_admitted(self.save.admitted())
+        if not restart and self.save.get_meta("canonical_version") != canonical.version():
+            self._rehash_save_file()
+        # In memory filter of the urls known to the save file, so known urls
+        # rarely reach it. It starts empty and learns the urls of earlier
+        # sessions as they are found again (_known), so starting takes the
+        # same time however large the save file is.
+        self.seen = make_seen_filter(self.config)
+        self.resumed = not restart
+        # robots.txt rules and sitemaps of every host, kept in the save file.
+        self.robots = None
+        if self.config.robots:
+            self.robots = RobotsCache(
+                self.config.user_agent, self.save, self.config.robots_ttl,
+                self.config.sitemap_limit)
+            for host in self.robots.hosts:
+                self._apply_crawl_delay(host)
+        # Content hash, validators and word counts of every downloaded page.
+        self.history = None
+        if self.config.recrawl_track:
+            self.history = scraper.page_history = PageHistory(
+                self.save, self.config.recrawl_min_interval,
+                self.config.recrawl_max_interval)
         if restart:
+            self.save.set_meta("filter_version", filter_version())
+            self.save.set_meta("canonical_version", canonical.version())
             for url in self.config.seed_urls:
                 self.add_url(url)
         else:
@@ -34,39 +84,196 @@ class Frontier(object):
             if not self.save:
                 for url in self.config.seed_urls:
                     self.add_url(url)
+            elif self.config.recrawl:
+                self._queue_recrawl()
 
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
         total_count = len(self.save)
+        version = filter_version()
+        if self.save.get_meta("filter_version") != version:
+            # The is_valid rules changed since the pending urls were checked.
+            self.logger.info("Filter rules changed, validating pending urls.")
+            self.save.revalidate(is_valid)
+            self.save.set_meta("filter_version", version)
         tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
+        for url in self.save.pending_urls():
+            self.seen.add(get_urldigest(url))
+            self.host_counts[get_host(url)] += 1
+            self.to_be_downloaded.add(url, *self._priority(url, None))
+            tbd_count += 1
         self.logger.info(
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
+    def _rehash_save_file(self):
+        # The save file was written with another canonical form of urls (or
+        # none, before utils/canonical.py): every url is rewritten in the
+        # current one and keyed by its new hash, duplicates folded into one,
+        # and the report's unique urls are rewritten the same way.
+        with metrics.timer("rehash"):
+            before, after = self.save.rehash(normalize, get_urlhash)
+            scraper.analytics.canonicalize(normalize)
+        self.save.set_meta("canonical_version", canonical.version())
+        if before:
+            self.logger.info(
+                f"Canonical form of urls changed, rehashed {before} urls "
+                f"into {after}.")
+
+    def _queue_recrawl(self):
+        # Completed urls whose page is due for another download are pending
+        # again, the likeliest to have changed first.
+        if self.history is None:
+            self.logger.warning("Recrawl needs [RECRAWL] TRACK, nothing was queued.")
+            return
+        due_count = 0
+        for url, score in self.history.due(time.time()):
+            with self.lock:
+                self.save[get_urlhash(url)] = (url, False)
+            self.host_counts[get_host(url)] += 1
+            self.to_be_downloaded.add(url, score, self._priority(url, None)[1])
+            due_count += 1
+        self.logger.info(f"Queued {due_count} completed urls due for a recrawl.")
+
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        # Blocks until a host is allowed to be fetched again. With [ROBOTS]
+        # OBEY, a host's robots.txt, and then its sitemaps, are fetched first,
+        # each in the politeness slot of one of its urls, which is queued
+        # again. Urls robots.txt disallows are never returned.
+        while True:
+            url = self.to_be_downloaded.get()
+            if url is None or self.robots is None:
+                return url
+            first = self.robots.next_fetch(url)
+            if first is not None:
+                try:
+                    self._fetch_first(first)
+                finally:
+                    self.to_be_downloaded.put_back(url)
+            elif self.robots.allowed(url):
+                return url
+            else:
+                metrics.count("robots_disallowed")
+                with self.lock:
+                    self.save[get_urlhash(url)] = (url, DISALLOWED)
+                self.to_be_downloaded.done(url, fetched=False)
 
-    def add_url(self, url):
+    def add_url(self, url, parent=None, lastmod=None):
+        # parent: the url of the page url was found on, None for seeds.
+        # lastmod: time.time() a sitemap says url last changed, if it does.
         url = normalize(url)
-        urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
+        urldigest = get_urldigest(url)
+        if urldigest in self.seen:
+            return
+        if self.robots is not None and not self.robots.allowed(url):
+            metrics.count("robots_disallowed")
+            return
+        with self.lock:
+            # Checked again, another thread may have added it meanwhile.
+            if self._known(urldigest):
+                return
+            # Seen either way: a url over its host's budget is not charged
+            # again each time it is found.
+            self.seen.add(urldigest)
+            if not scraper.url_filter.admit(url):
+                return
+            if scraper.url_filter.host_budget:
+                host = budget_host(url)
+                self.save.set_admitted(host, scraper.url_filter.admitted[host])
+            self.save[urldigest.hex()] = (url, False)
+            self.host_counts[get_host(url)] += 1
+            self.to_be_downloaded.add(url, *self._priority(url, parent, lastmod))
+
+    def _known(self, urldigest):
+        # Whether url is in the save file, called under self.lock. Urls of an
+        # earlier session are looked up once, then kept in the filter.
+        if urldigest in self.seen:
+            return True
+        if self.resumed and urldigest.hex() in self.save:
+            self.seen.add(urldigest)
+            return True
+        return False
+
+    def score(self, url, depth, quality, lastmod=None):
+        ''' Lower scores are downloaded first. This function can be overridden for other priorities. '''
+        # depth: links followed from a seed. quality: (text ratio, word count)
+        # of the page the url was found on, None if not known. lastmod: when
+        # a sitemap says url last changed, None if not known.
+        weights = self.config.priority
+        score = (weights["depth"] * depth
+                 + weights["host"] * math.log2(1 + self.host_counts[get_host(url)]))
+        if quality is not None:
+            text_ratio, word_count = quality
+            score -= weights["quality"] * text_ratio * math.log10(1 + word_count)
+        if lastmod is not None:
+            # Halved for every 30 days since the change.
+            age_days = max(0.0, time.time() - lastmod) / 86400
+            score -= weights["lastmod"] * 2 ** (-age_days / 30)
+        return score
+
+    def _fetch_first(self, url):
+        # Downloads a robots.txt or sitemap through the cache server, and
+        # adds the urls a sitemap lists as they are read.
+        start = time.perf_counter()
+        with metrics.timer("download"):
+            resp = download(url, self.config, self.logger)
+        self.record_download(url, resp.status, time.perf_counter() - start)
+        for listed, lastmod in self.robots.update(url, resp):
+            if is_valid(listed):
+                self.add_url(listed, lastmod=lastmod)
+        self._apply_crawl_delay(get_host(url))
+
+    def _apply_crawl_delay(self, host):
+        # A robots.txt Crawl-delay above POLITENESS, up to [RATECONTROL]
+        # MAXDELAY, becomes the host's least delay.
+        delay = self.robots.crawl_delay(host)
+        if delay is not None and delay > self.config.time_delay:
+            self.to_be_downloaded.set_delay(host, min(delay, self.config.rate_max_delay))
+
+    def _priority(self, url, parent, lastmod=None):
+        # (score, depth) of url. Without a parent being downloaded (seeds,
+        # urls reloaded from the save file or sent by another shard) the
+        # depth is guessed from the path.
+        depth = self.to_be_downloaded.depth(parent) if parent else None
+        if depth is None:
+            depth = sum(1 for segment in urlparse(url).path.split("/") if segment)
+        else:
+            depth += 1
+        quality = scraper.page_quality.get(parent) if parent else None
+        return self.score(url, depth, quality, lastmod), depth
     
+    def unchanged(self, url, resp):
+        # True when url's page is the same as when it was last downloaded, so
+        # it is not parsed and counted again (crawler/recrawl.py).
+        if self.history is None:
+            return False
+        with metrics.timer("page_history"):
+            return not self.history.observe(url, resp)
+
+    def record_download(self, url, status, latency):
+        # Called as soon as the download of url is over, so the host's next
+        # delay follows its latency and errors (crawler/rate_control.py).
+        if self.rates is not None:
+            self.rates.observe(get_host(url), status, latency)
+
     def mark_url_complete(self, url):
-        urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
-
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+        # Keyed by its canonical form, like add_url, however url is spelled.
+        canonical_url = normalize(url)
+        urlhash = get_urlhash(canonical_url)
+        with self.lock, self.save.atomic():
+            if urlhash not in self.save:
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
+
+            self.save[urlhash] = (canonical_url, True)
+            # Its page record and report stats are committed with it.
+            if self.history is not None:
+                self.history.done(url)
+            scraper.analytics.complete(url)
+        scraper.page_quality.pop(url, None)
+        self.to_be_downloaded.done(url)
+
+    def close(self):
+        # Removes the urls spilled to disk, they are pending in the save file.
+        self.to_be_downloaded.close()
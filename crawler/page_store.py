@@ -0,0 +1,291 @@
+import mmap
+import os
+import re
+import struct
+import zlib
+
+from threading import Lock
+from types import SimpleNamespace
+
+from utils import get_urldigest
+
+# Record: magic and crc32 of everything after them, then status, url length,
+# content type length and compressed body length, the url, the content type
+# and the zlib compressed body. Status 0 stands for no status: a request to
+# the cache server that failed (utils/async_download.py), or one that does
+# not fit the field.
+_HEADER = struct.Struct("<4sI")
+_FIELDS = struct.Struct("<HHHI")
+_RECORD_MAGIC = b"PGRC"
+_RECORD_SIZE = _HEADER.size + _FIELDS.size
+# Index: magic, capacity, count, clean flag, then capacity slots of (key,
+# location). key is the first 8 bytes of the url digest (0 marks an empty
+# slot), location the segment number << 40 | offset of the record.
+_INDEX = struct.Struct("<4sQQI4x")
+_INDEX_MAGIC = b"PGIX"
+_SLOT = struct.Struct("<QQ")
+_OFFSET_BITS = 40
+# Names of the files a store writes in its directory.
+_SEGMENT_NAME = re.compile(r"(\d{5,})\.seg")
+_STORE_NAMES = ("index", "index.tmp")
+
+
+class StoredResponse(object):
+    # A response read back from a PageStore, with the fields of
+    # utils.response.Response that the scraper uses.
+    def __init__(self, url, status, content_type, content):
+        self.url = url
+        self.status = status
+        self.error = None
+        self.content_type = content_type or None
+        self.content = memoryview(content)
+        self.content_length = len(content)
+
+    @property
+    def raw_response(self):
+        headers = {"Content-Type": self.content_type} if self.content_type else {}
+        return SimpleNamespace(url=self.url, content=self.content.tobytes(),
+                               headers=headers)
+
+
+class PageStore(object):
+    # Every downloaded response, compressed, in append-only segment files of
+    # about `segment_size` bytes (WARC-like, one record per response). An
+    # open addressing hash table in an mmap'd file maps url hashes to records,
+    # so get(url) costs one probe and one read. The index is marked clean on
+    # close and rebuilt from the segments when it was not, dropping a torn
+    # record left at the end by a crash. A url stored twice keeps its latest
+    # response.
+    def __init__(self, path, segment_size=256 * 1024 * 1024):
+        self.path = path
+        self.segment_size = segment_size
+        self.lock = Lock()
+        self.readers = dict() # segment number -> file descriptor
+        os.makedirs(path, exist_ok=True)
+        self.segments = sorted(
+            int(match.group(1)) for match in map(_SEGMENT_NAME.fullmatch, os.listdir(path))
+            if match)
+        if not self.segments:
+            self.segments.append(0)
+        self.segment = self.segments[-1]
+        self.writer = open(self._segment_path(self.segment), "ab")
+
+        index_path = os.path.join(path, "index")
+        if not os.path.exists(index_path) or not self._open_index(index_path):
+            self._rebuild_index()
+        self._set_clean(False)
+
+    @staticmethod
+    def remove(path):
+        # Deletes the files of the store at path, then the directory if
+        # nothing else is left in it: PAGESTORE may name a directory that
+        # holds other files too.
+        if not os.path.isdir(path):
+            return
+        for name in os.listdir(path):
+            if name in _STORE_NAMES or _SEGMENT_NAME.fullmatch(name):
+                os.remove(os.path.join(path, name))
+        try:
+            os.rmdir(path)
+        except OSError: # Not empty
+            pass
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, url):
+        return self.get(url) is not None
+
+    def add(self, url, resp):
+        # Appends resp, any object with status, content_type and content.
+        content_type = (resp.content_type or "").encode("utf-8")
+        # Level 1: about 4x faster than the default for a quarter more disk.
+        body = zlib.compress(resp.content, 1) if resp.content_length else b""
+        url_bytes = url.encode("utf-8")
+        status = resp.status if resp.status is not None and 0 < resp.status <= 0xFFFF else 0
+        rest = (_FIELDS.pack(status, len(url_bytes), len(content_type), len(body))
+                + url_bytes + content_type + body)
+        record = _HEADER.pack(_RECORD_MAGIC, zlib.crc32(rest)) + rest
+        with self.lock:
+            offset = self.writer.tell()
+            if offset and offset + len(record) > self.segment_size:
+                self._next_segment()
+                offset = 0
+            self.writer.write(record)
+            # Flushed, so get can read it back right away.
+            self.writer.flush()
+            self._insert(self._key(url), self.segment << _OFFSET_BITS | offset)
+
+    def get(self, url):
+        # The latest response stored for url, or None.
+        with self.lock:
+            location = self._lookup(self._key(url))
+        if location is None:
+            return None
+        record = self._read(location >> _OFFSET_BITS,
+                            location & ((1 << _OFFSET_BITS) - 1))
+        if record is None or record.url != url:
+            return None
+        return record
+
+    def __iter__(self):
+        # Latest response of every url, in the order they were stored.
+        with self.lock:
+            self.writer.flush()
+            segments = list(self.segments)
+        for segment in segments:
+            for offset, status, url_length, type_length, rest in self._scan(segment):
+                with self.lock:
+                    location = self._lookup(self._key(rest[:url_length].decode("utf-8")))
+                if location == segment << _OFFSET_BITS | offset:
+                    yield self._record(status, url_length, type_length, rest)
+
+    def flush(self):
+        with self.lock:
+            self.writer.flush()
+            self.index.flush()
+
+    def close(self):
+        with self.lock:
+            self.writer.close()
+            for descriptor in self.readers.values():
+                os.close(descriptor)
+            self.readers.clear()
+        self._set_clean(True)
+        self.index.flush()
+        self.index.close()
+        self.index_file.close()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f"{segment:05d}.seg")
+
+    def _next_segment(self):
+        self.writer.close()
+        self.segment += 1
+        self.segments.append(self.segment)
+        self.writer = open(self._segment_path(self.segment), "ab")
+
+    def _key(self, url):
+        return int.from_bytes(get_urldigest(url)[:8], "big") or 1
+
+    def _read(self, segment, offset):
+        descriptor = self.readers.get(segment)
+        if descriptor is None:
+            descriptor = self.readers[segment] = os.open(
+                self._segment_path(segment), os.O_RDONLY)
+        header = os.pread(descriptor, _RECORD_SIZE, offset)
+        if len(header) < _RECORD_SIZE:
+            return None
+        magic, crc = _HEADER.unpack_from(header)
+        status, url_length, type_length, body_length = _FIELDS.unpack_from(header, _HEADER.size)
+        rest = os.pread(descriptor, url_length + type_length + body_length,
+                        offset + _RECORD_SIZE)
+        if magic != _RECORD_MAGIC or zlib.crc32(header[_HEADER.size:] + rest) != crc:
+            return None
+        return self._record(status, url_length, type_length, rest)
+
+    def _record(self, status, url_length, type_length, rest):
+        url = rest[:url_length].decode("utf-8")
+        content_type = rest[url_length:url_length + type_length].decode("utf-8")
+        body = rest[url_length + type_length:]
+        return StoredResponse(url, status or None, content_type,
+                              zlib.decompress(body) if body else b"")
+
+    def _scan(self, segment, repair=False):
+        # (offset, status, url length, content type length, rest of the
+        # record) of every valid record of a segment, read through mmap. With
+        # repair, a torn record at the end is cut off.
+        path = self._segment_path(segment)
+        size = os.path.getsize(path)
+        valid = 0
+        if size:
+            with open(path, "rb") as segment_file, mmap.mmap(
+                    segment_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                while valid + _RECORD_SIZE <= size:
+                    magic, crc = _HEADER.unpack_from(data, valid)
+                    status, url_length, type_length, body_length = _FIELDS.unpack_from(
+                        data, valid + _HEADER.size)
+                    end = valid + _RECORD_SIZE + url_length + type_length + body_length
+                    if (magic != _RECORD_MAGIC or end > size
+                            or zlib.crc32(data[valid + _HEADER.size:end]) != crc):
+                        break
+                    yield valid, status, url_length, type_length, data[valid + _RECORD_SIZE:end]
+                    valid = end
+        if repair and valid < size:
+            with open(path, "r+b") as segment_file:
+                segment_file.truncate(valid)
+
+    # Index.
+
+    def _open_index(self, index_path, capacity=None):
+        # Maps the index, creating it with `capacity` slots. False when an
+        # existing index was not closed cleanly.
+        if capacity is not None:
+            with open(index_path, "wb") as index_file:
+                index_file.write(_INDEX.pack(_INDEX_MAGIC, capacity, 0, 1))
+                index_file.truncate(_INDEX.size + capacity * _SLOT.size)
+        self.index_file = open(index_path, "r+b")
+        self.index = mmap.mmap(self.index_file.fileno(), 0)
+        magic, self.capacity, self.count, clean = _INDEX.unpack_from(self.index)
+        if magic != _INDEX_MAGIC or not clean:
+            self.index.close()
+            self.index_file.close()
+            return False
+        return True
+
+    def _set_clean(self, clean):
+        _INDEX.pack_into(self.index, 0, _INDEX_MAGIC, self.capacity, self.count, clean)
+
+    def _rebuild_index(self, capacity=1 << 16):
+        index_path = os.path.join(self.path, "index")
+        self._open_index(index_path, capacity)
+        for segment in self.segments:
+            for offset, _, url_length, _, rest in self._scan(
+                    segment, repair=segment == self.segment):
+                self._insert(self._key(rest[:url_length].decode("utf-8")),
+                             segment << _OFFSET_BITS | offset)
+        self.writer.seek(0, os.SEEK_END)
+
+    def _slots(self, key):
+        mask = self.capacity - 1
+        slot = key & mask
+        while True:
+            yield slot, _INDEX.size + slot * _SLOT.size
+            slot = (slot + 1) & mask
+
+    def _lookup(self, key):
+        for _, position in self._slots(key):
+            slot_key, location = _SLOT.unpack_from(self.index, position)
+            if slot_key == key:
+                return location
+            if not slot_key:
+                return None
+
+    def _insert(self, key, location):
+        for _, position in self._slots(key):
+            slot_key, _ = _SLOT.unpack_from(self.index, position)
+            if slot_key == key or not slot_key:
+                _SLOT.pack_into(self.index, position, key, location)
+                break
+        if not slot_key:
+            self.count += 1
+            _INDEX.pack_into(self.index, 0, _INDEX_MAGIC, self.capacity, self.count, 0)
+            if self.count * 2 > self.capacity:
+                self._grow()
+
+    def _grow(self):
+        # Rehashes into a table twice the size, kept at most half full so
+        # probes stay short.
+        entries = [_SLOT.unpack_from(self.index, _INDEX.size + slot * _SLOT.size)
+                   for slot in range(self.capacity)]
+        capacity = self.capacity * 2
+        self.index.close()
+        self.index_file.close()
+        index_path = os.path.join(self.path, "index")
+        self._open_index(index_path + ".tmp", capacity)
+        for key, location in entries:
+            if key:
+                self._insert(key, location)
+        self._set_clean(False)
+        self.index.flush()
+        os.replace(index_path + ".tmp", index_path)
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore
+
+from utils import canonical, get_logger
+from utils.metrics import metrics
+from utils.page import set_parser
+from utils.url_filter import UrlFilter
+import scraper
+
+
+def _init_process(parser, rules, canonical_rules):
+    # Runs once in every pool process: the crawler's parser, url rules and
+    # canonical form, none of its report state, which stays in the crawler
+    # process.
+    set_parser(parser)
+    scraper.url_filter = UrlFilter(*rules)
+    canonical.set_rules(canonical_rules)
+
+
+class ParsePool(object):
+    # Runs scraper.analyze (parsing, tokenizing, counting, link filtering) in
+    # `processes` worker processes, so page processing is no longer limited to
+    # one core by the GIL. Only the links and a small stats delta come back;
+    # the near duplicate check and the report merge run in the crawler.
+    # At most `backlog` pages are queued or being parsed at a time. Past that
+    # submit blocks, so download threads wait for the pool instead of piling
+    # up pages in memory.
+    def __init__(self, processes=0, parser="html.parser", rules=None, backlog=0):
+        self.processes = processes or os.cpu_count() or 1
+        self.logger = get_logger("POOL", "Worker")
+        # spawn, as forking a process that runs threads can copy held locks.
+        self.executor = ProcessPoolExecutor(
+            self.processes, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+            initargs=(parser, rules or scraper.url_filter.rules, canonical.rules()))
+        self.slots = BoundedSemaphore(backlog or 2 * self.processes)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.processes, config.parser, scraper.url_filter.rules)
+
+    def submit(self, url, resp, callback):
+        # Calls callback(url, links) once the page is processed, from a
+        # thread of the pool. links is what scraper.scraper would return.
+        if scraper.skip_response(url, resp):
+            scraper.forget(url)
+            callback(url, [])
+            return
+        self.slots.acquire()
+        with metrics.timer("pool_submit"):
+            # A memoryview cannot be pickled, the body is copied once here.
+            future = self.executor.submit(
+                scraper.analyze, url, resp.content.tobytes())
+        future.add_done_callback(lambda future: self._done(url, future, callback))
+
+    def _done(self, url, future, callback):
+        self.slots.release()
+        try:
+            links = scraper.record(url, future.result())
+        except Exception:
+            self.logger.exception(f"Scraper failed on {url}.")
+            metrics.count("scraper_errors")
+            links = []
+        try:
+            callback(url, links)
+        except Exception:
+            self.logger.exception(f"Could not finish {url}.")
+
+    def close(self):
+        # Waits for the pages still in the pool.
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,142 @@
+import time
+
+from threading import Lock
+
+from utils import get_logger
+from utils.metrics import metrics
+
+
+def is_failure(status):
+    # Cache errors (600-606 and up), server errors and "too many requests".
+    return status is None or status >= 500 or status == 429
+
+
+class _HostState(object):
+    __slots__ = ("delay", "latency", "fetched", "errors", "failures",
+                 "quarantines", "until", "finished")
+
+    def __init__(self, delay):
+        self.delay = delay       # seconds between the end of a download and the next request
+        self.latency = None      # moving average of download seconds
+        self.fetched = 0
+        self.errors = 0
+        self.failures = 0        # failures in a row
+        self.quarantines = 0     # quarantines in a row, without a success in between
+        self.until = 0.0         # time.monotonic() the quarantine ends
+        self.finished = None     # time.monotonic() the last download ended
+
+
+class HostRateController(object):
+    # Delay before each host's next request, adjusted with AIMD from what its
+    # downloads report. A success within target_latency adds `recovery`
+    # requests/s to the host's rate, down to the POLITENESS delay and never
+    # below it. A slow download, or a failure (is_failure) following another
+    # one, multiplies the delay by `backoff`, up to max_delay. A single
+    # failure is more often the page's than the host's and is let through. After quarantine_after failures in a row
+    # the host is not fetched for `quarantine` seconds, doubled for every
+    # quarantine in a row. Once quarantined give_up_after times in a row the
+    # host is dropped for the rest of the session (never with 0); its urls
+    # stay pending in the save file.
+    def __init__(self, delay, max_delay=60.0, target_latency=2.0, backoff=2.0,
+                 recovery=0.2, quarantine_after=5, quarantine=60.0, give_up_after=4):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.recovery = recovery
+        self.quarantine_after = quarantine_after
+        self.quarantine = quarantine
+        self.give_up_after = give_up_after
+        self.hosts = dict() # host -> _HostState
+        self.logger = get_logger("FRONTIER")
+        self.lock = Lock()
+
+    def observe(self, host, status, latency):
+        # Called by the worker as soon as a download from host is over.
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                state = self.hosts[host] = _HostState(self.delay)
+            state.finished = time.monotonic()
+            state.fetched += 1
+            state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+            if is_failure(status):
+                state.errors += 1
+                state.failures += 1
+                if state.failures > 1:
+                    self._back_off(state, latency)
+                if state.failures >= self.quarantine_after:
+                    period = self.quarantine * 2 ** state.quarantines
+                    state.until = state.finished + period
+                    state.quarantines += 1
+                    state.failures = 0
+                    metrics.count("host_quarantines")
+                    self.logger.warning(
+                        f"Quarantined {host} for {period:.0f}s after "
+                        f"{self.quarantine_after} failures in a row (last status {status}).")
+                return
+            state.failures = 0
+            state.quarantines = 0
+            if latency > self.target_latency:
+                self._back_off(state, latency)
+            elif state.delay > self.delay:
+                state.delay = max(self.delay, 1 / (1 / state.delay + self.recovery))
+
+    def _back_off(self, state, latency):
+        # From at least the download's own latency, so a host at POLITENESS 0
+        # backs off too.
+        state.delay = min(max(state.delay, latency) * self.backoff, self.max_delay)
+
+    def _given_up(self, state):
+        return bool(self.give_up_after) and state.quarantines >= self.give_up_after
+
+    def next_fetch(self, host, now):
+        # time.monotonic() host may be fetched again, counted from the end of
+        # its last download, or None once the host was given up on.
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                return now + self.delay
+            if self._given_up(state):
+                return None
+            start = now if state.finished is None else state.finished
+            state.finished = None
+            return max(start + state.delay, state.until)
+
+    def describe(self, host):
+        # State of one host, for inspection.
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                return None
+            return {
+                "delay_s": round(state.delay, 3),
+                "latency_s": round(state.latency, 3) if state.latency is not None else None,
+                "fetched": state.fetched,
+                "errors": state.errors,
+                "quarantined_s": round(max(0.0, state.until - time.monotonic()), 1),
+                "given_up": self._given_up(state)}
+
+    def snapshot(self, top=10):
+        # Counts over every host and the state of the `top` slowest ones.
+        now = time.monotonic()
+        with self.lock:
+            states = list(self.hosts.items())
+        slowest = sorted(states, key=lambda item: item[1].delay, reverse=True)[:top]
+        return {
+            "hosts": len(states),
+            "backed_off": sum(1 for _, state in states if state.delay > self.delay),
+            "quarantined": sum(1 for _, state in states if state.until > now),
+            "given_up": sum(1 for _, state in states if self._given_up(state)),
+            "slowest": {host: self.describe(host) for host, state in slowest
+                        if state.delay > self.delay or state.until > now}}
+
+
+def make_rate_controller(config):
+    # None keeps the fixed POLITENESS delay, counted from when a url is done.
+    if not config.rate_control:
+        return None
+    return HostRateController(
+        config.time_delay, config.rate_max_delay, config.rate_target_latency,
+        config.rate_backoff, config.rate_recovery, config.rate_quarantine_after,
+        config.rate_quarantine, config.rate_give_up_after)
@@ -0,0 +1,92 @@
+import pickle
+import time
+import zlib
+
+from collections import Counter
+from hashlib import blake2b
+
+from crawler.store import PageRecord
+from utils import get_urlhash
+from utils.metrics import metrics
+
+
+def content_hash(resp):
+    # Of the status and the body, so a page that starts failing changes too.
+    digest = blake2b(f"{resp.status}:".encode("utf-8"), digest_size=16)
+    digest.update(resp.content)
+    return digest.digest()
+
+
+class PageHistory(object):
+    # What every downloaded page looked like the last time: a hash of its
+    # content, its ETag and Last-Modified headers, when it was fetched, how
+    # many of its fetches found it changed, and its word counts. Kept in the
+    # save file (crawler/store.py).
+    # observe() tells the worker whether a page changed, so an unchanged one
+    # is neither parsed nor counted again. Each page has its own revisit
+    # interval, between min_interval and max_interval seconds: halved when
+    # the page is found changed, doubled when it is not. A recrawl queues the
+    # pages that are due, the likeliest to have changed first (due()).
+    # The cache server does not forward request headers, so ETag and
+    # Last-Modified are recorded but pages cannot be fetched conditionally.
+    # A page's new record is held until its url is marked complete, and
+    # written in the same transaction (done()): a crash in between leaves the
+    # former one, so the page is not taken for unchanged when fetched again.
+    # Only one thread works on a url at a time, so the dicts need no lock.
+    def __init__(self, store, min_interval=86400.0, max_interval=2592000.0):
+        self.store = store
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.previous = dict() # url being processed -> its former word counts, compressed
+        self.records = dict() # url being processed -> (urlhash, its new PageRecord)
+
+    def observe(self, url, resp):
+        # Records the download of url. False when its content is the same as
+        # last time.
+        urlhash = get_urlhash(url)
+        digest = content_hash(resp)
+        record = self.store.get_page(urlhash)
+        changed = record is None or record.content_hash != digest
+        if record is None:
+            record = PageRecord(digest, None, None, 0.0, 0, 0, self.min_interval, None)
+        elif changed:
+            record = record._replace(
+                content_hash=digest, changes=record.changes + 1,
+                interval=max(self.min_interval, record.interval / 2))
+            if record.words is not None:
+                self.previous[url] = record.words
+        else:
+            record = record._replace(interval=min(self.max_interval, record.interval * 2))
+        self.records[url] = urlhash, record._replace(
+            etag=resp.header("ETag"), last_modified=resp.header("Last-Modified"),
+            fetched=time.time(), checks=record.checks + 1)
+        metrics.count("pages_changed" if changed else "pages_unchanged")
+        return changed
+
+    def previous_words(self, url):
+        # Word counts url had when it was last counted, None if it never was.
+        words = self.previous.get(url)
+        return Counter(pickle.loads(zlib.decompress(words))) if words is not None else None
+
+    def set_words(self, url, words):
+        # Word counts the report now holds for url.
+        held = self.records.get(url)
+        if held is not None:
+            blob = zlib.compress(pickle.dumps(dict(words), pickle.HIGHEST_PROTOCOL), 1)
+            urlhash, record = held
+            self.records[url] = urlhash, record._replace(words=blob)
+
+    def done(self, url):
+        # Writes url's new record, called as url is marked complete.
+        self.previous.pop(url, None)
+        held = self.records.pop(url, None)
+        if held is not None:
+            self.store.set_page(*held)
+
+    def due(self, now):
+        # (url, score) of every page due at time.time() now. Lower scores go
+        # first: the estimated chance the page changed, grown by how overdue
+        # it is, negated.
+        for url, checks, changes, interval, due in self.store.due_pages(now):
+            chance = (changes + 0.5) / (checks + 1)
+            yield url, -chance * (1 + (now - due) / max(interval, 1.0))
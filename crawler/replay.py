@@ -0,0 +1,46 @@
+import os
+
+from crawler.page_store import PageStore
+from crawler.process_pool import ParsePool
+from utils import get_logger
+from utils.config import shard_path
+import scraper
+
+
+def replay(config, processes=None):
+    # Runs the scraper over every page kept in PAGESTORE, the page stores of
+    # all shards for a sharded crawl, and writes crawl_report.txt again. Uses
+    # no network, so report rules, the tokenizer or the filter can change
+    # without crawling again. Pages are parsed by `processes` processes (all
+    # cores by default, 0 for this process only).
+    logger = get_logger("REPLAY")
+    if config.shard_count > 1:
+        paths = [shard_path(config.page_store, index) for index in range(config.shard_count)]
+    else:
+        paths = [config.page_store]
+    # The report is built from scratch, the crawl's own stats are left alone.
+    config.stats_file = None
+    scraper.configure(config)
+    if processes is None:
+        processes = config.processes or os.cpu_count() or 1
+    pool = ParsePool(processes, config.parser, scraper.url_filter.rules) if processes else None
+
+    count = 0
+    for path in paths:
+        if not os.path.isdir(path):
+            logger.error(f"No page store at {path}.")
+            continue
+        pages = PageStore(path, config.segment_size)
+        logger.info(f"Replaying {len(pages)} pages from {path}.")
+        for resp in pages:
+            if pool is not None:
+                pool.submit(resp.url, resp, lambda url, links: None)
+            else:
+                scraper.scraper(resp.url, resp)
+            count += 1
+        pages.close()
+    if pool is not None:
+        pool.close()
+    scraper.write_report()
+    logger.info(f"Replayed {count} pages, report written.")
+    return count
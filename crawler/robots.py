@@ -0,0 +1,262 @@
+import gzip
+import json
+import re
+import time
+
+from collections import Counter
+from datetime import datetime, timezone
+from io import BytesIO
+from threading import Lock
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import iterparse, ParseError
+
+from crawler.scheduler import get_host
+from utils import get_logger
+from utils.metrics import metrics
+
+# Meta key of a host's rules in the save file.
+_META = "robots:"
+# Cache errors (6xx) and server errors say nothing about what a host allows,
+# so its robots.txt is fetched again this many seconds later.
+_ERROR_TTL = 600.0
+# Most sitemap files fetched per host and session, sitemap indexes included.
+_MAX_SITEMAPS = 50
+
+
+def _product_token(agent):
+    # The name robots.txt groups address a crawler by: the leading letters,
+    # "_" and "-" of its user agent (RFC 9309), "IR" for "IR F19 1234,5678".
+    token = re.match(r"[a-zA-Z_-]+", agent) or re.match(r"[^\s/]*", agent)
+    return token.group().lower()
+
+
+def _compile(pattern):
+    # Regex of a robots.txt path pattern: * matches anything, a trailing $
+    # anchors the end.
+    anchored = pattern.endswith("$")
+    if anchored:
+        pattern = pattern[:-1]
+    regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+    return re.compile(regex + ("\\Z" if anchored else ""))
+
+
+class RobotsRules(object):
+    # The Allow and Disallow rules robots.txt sets for our user agent,
+    # compiled once. The longest matching rule decides, Allow on a tie (RFC
+    # 9309). When every rule is a Disallow, as in most robots.txt, they are
+    # compiled into one regex and a path costs a single match.
+    def __init__(self, rules=(), crawl_delay=None, sitemaps=(), fetched=0.0, ttl=0.0):
+        self.rules = [(pattern, allow) for pattern, allow in rules if pattern]
+        self.crawl_delay = crawl_delay
+        self.sitemaps = list(sitemaps)
+        self.fetched = fetched  # time.time() robots.txt was fetched
+        self.ttl = ttl          # seconds until it is fetched again
+        ordered = sorted(self.rules, key=lambda rule: (-len(rule[0]), not rule[1]))
+        if any(allow for _, allow in ordered):
+            # (pattern, allow, regex), regex None for a plain prefix.
+            self.disallow = None
+            self.ordered = [
+                (pattern, allow, _compile(pattern) if "*" in pattern or pattern.endswith("$") else None)
+                for pattern, allow in ordered]
+        else:
+            self.ordered = None
+            self.disallow = re.compile(
+                "|".join(f"(?:{_compile(pattern).pattern})" for pattern, _ in ordered)) if ordered else None
+
+    @classmethod
+    def parse(cls, text, agent, fetched=0.0, ttl=0.0):
+        # Rules of the groups naming the product token of agent, compared
+        # case-insensitively, or of the * groups when none does.
+        token = _product_token(agent)
+        rules = {True: [], False: []}          # group names agent -> rules
+        crawl_delay = {True: None, False: None}
+        named_group = False
+        sitemaps = []
+        agents = []
+        in_rules = False
+        for line in text.splitlines():
+            field, _, value = line.partition("#")[0].partition(":")
+            field, value = field.strip().lower(), value.strip()
+            if field == "user-agent":
+                if in_rules:
+                    agents, in_rules = [], False
+                agents.append(value.lower())
+            elif field in ("allow", "disallow", "crawl-delay") and agents:
+                in_rules = True
+                named = token in agents
+                if not named and "*" not in agents:
+                    continue
+                named_group = named_group or named
+                if field != "crawl-delay":
+                    rules[named].append((value, field == "allow"))
+                else:
+                    try:
+                        crawl_delay[named] = float(value)
+                    except ValueError:
+                        pass
+            elif field == "sitemap" and value:
+                sitemaps.append(value)
+        return cls(rules[named_group], crawl_delay[named_group], sitemaps, fetched, ttl)
+
+    @classmethod
+    def loads(cls, value):
+        state = json.loads(value)
+        return cls(state["rules"], state["delay"], state["sitemaps"], state["fetched"], state["ttl"])
+
+    def dumps(self):
+        return json.dumps({"rules": self.rules, "delay": self.crawl_delay,
+                           "sitemaps": self.sitemaps, "fetched": self.fetched,
+                           "ttl": self.ttl})
+
+    def expired(self, now):
+        return now >= self.fetched + self.ttl
+
+    def allowed(self, path):
+        # path: the path and query of a url, "/" at least.
+        if self.ordered is None:
+            return self.disallow is None or self.disallow.match(path) is None
+        for pattern, allow, regex in self.ordered:
+            if path.startswith(pattern) if regex is None else regex.match(path):
+                return allow
+        return True
+
+
+def _path(url):
+    parsed = urlparse(url)
+    return (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+
+
+def _timestamp(value):
+    # time.time() of a W3C datetime (2024-05-01, 2024-05-01T10:00:00+02:00),
+    # None if it is not one.
+    for text in (value, value[:10]):
+        try:
+            moment = datetime.fromisoformat(text)
+        except ValueError:
+            continue
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+    return None
+
+
+class RobotsCache(object):
+    # robots.txt rules of every host, fetched through the cache server like
+    # any page and kept for `ttl` seconds, in memory and in the save file's
+    # meta table, so a resumed crawl does not fetch them again. The frontier
+    # asks next_fetch() before each url it hands out: while a host's rules
+    # are missing or expired, and then while its sitemaps are unread, that
+    # url's politeness slot is used to fetch them instead.
+    # Sitemaps (plain, gzipped and indexes) are parsed as a stream, so a
+    # 50 MB sitemap never sits in memory as a tree, and each host adds at most
+    # `sitemap_limit` urls from them per session (0 ignores sitemaps).
+    def __init__(self, agent, store, ttl=86400.0, sitemap_limit=50000):
+        self.agent = agent
+        self.store = store
+        self.ttl = ttl
+        self.sitemap_limit = sitemap_limit
+        self.hosts = dict()            # host -> RobotsRules
+        self.sitemaps = dict()         # host -> sitemap urls still to be fetched
+        self.sitemap_counts = Counter() # host -> sitemap files fetched this session
+        self.sitemap_urls = Counter()  # host -> urls read from its sitemaps this session
+        self.logger = get_logger("ROBOTS", "FRONTIER")
+        self.lock = Lock()
+        for key, value in store.meta_items(_META):
+            try:
+                self.hosts[key[len(_META):]] = RobotsRules.loads(value)
+            except (ValueError, KeyError):
+                self.logger.warning(f"Ignored unreadable {key} in the save file.")
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def allowed(self, url):
+        # False when the rules known for url's host disallow it, expired or
+        # not. Unknown hosts are allowed until their robots.txt is read.
+        rules = self.hosts.get(get_host(url))
+        return rules is None or rules.allowed(_path(url))
+
+    def crawl_delay(self, host):
+        rules = self.hosts.get(host)
+        return rules.crawl_delay if rules is not None else None
+
+    def next_fetch(self, url):
+        # The url to fetch from url's host before url itself: its robots.txt
+        # or one of its sitemaps. None when there is nothing to fetch first.
+        host = get_host(url)
+        with self.lock:
+            rules = self.hosts.get(host)
+            if rules is None or rules.expired(time.time()):
+                return f"{urlparse(url).scheme}://{host}/robots.txt"
+            pending = self.sitemaps.get(host)
+            if pending and self.sitemap_urls[host] < self.sitemap_limit:
+                self.sitemap_counts[host] += 1
+                sitemap = pending.pop()
+                if not pending or self.sitemap_counts[host] >= _MAX_SITEMAPS:
+                    del self.sitemaps[host]
+                return sitemap
+        return None
+
+    def update(self, fetched_url, resp):
+        # Reads what next_fetch asked for. Returns (url, lastmod) of the urls
+        # a sitemap lists, lastmod as a time.time() or None, as they are
+        # parsed.
+        host = get_host(fetched_url)
+        if urlparse(fetched_url).path == "/robots.txt":
+            self._update_rules(host, resp)
+            return ()
+        return self._read_sitemap(host, fetched_url, resp)
+
+    def _update_rules(self, host, resp):
+        metrics.count("robots_fetched")
+        now = time.time()
+        if resp.status == 200:
+            text = bytes(resp.content).decode("utf-8", errors="replace")
+            rules = RobotsRules.parse(text, self.agent, now, self.ttl)
+        else:
+            # 4xx: no robots.txt, every url is allowed. Anything else is
+            # allowed too but asked again soon; the cache server answers its
+            # own failures with 6xx, which say nothing about the host.
+            ttl = self.ttl if 400 <= resp.status < 500 else min(self.ttl, _ERROR_TTL)
+            rules = RobotsRules(fetched=now, ttl=ttl)
+        with self.lock:
+            self.hosts[host] = rules
+            if self.sitemap_limit and rules.sitemaps:
+                self.sitemaps[host] = list(reversed(rules.sitemaps))
+        self.store.set_meta(_META + host, rules.dumps())
+
+    def _read_sitemap(self, host, sitemap_url, resp):
+        metrics.count("sitemaps_fetched")
+        if resp.status != 200 or not resp.content:
+            return
+        stream = BytesIO(resp.content)
+        if bytes(resp.content[:2]) == b"\x1f\x8b":
+            stream = gzip.GzipFile(fileobj=stream)
+        loc = lastmod = root = None
+        try:
+            for event, element in iterparse(stream, ("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = element
+                    continue
+                tag = element.tag.rpartition("}")[2]
+                if tag == "loc":
+                    loc = (element.text or "").strip()
+                elif tag == "lastmod":
+                    lastmod = _timestamp((element.text or "").strip())
+                elif tag == "url" and loc:
+                    if self.sitemap_urls[host] >= self.sitemap_limit:
+                        return
+                    self.sitemap_urls[host] += 1
+                    metrics.count("sitemap_urls")
+                    yield loc if "://" in loc else urljoin(sitemap_url, loc), lastmod
+                    loc = lastmod = None
+                elif tag == "sitemap" and loc:
+                    with self.lock:
+                        if self.sitemap_counts[host] < _MAX_SITEMAPS:
+                            self.sitemaps.setdefault(host, []).append(urljoin(sitemap_url, loc))
+                    loc = lastmod = None
+                if tag in ("url", "sitemap"):
+                    root.clear() # Entries already read, so memory stays flat
+        except (ParseError, OSError, EOFError) as e:
+            self.logger.info(f"Stopped reading sitemap {sitemap_url}: {e}")
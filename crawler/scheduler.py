@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import time
+
+from threading import Condition
+from urllib.parse import urlparse
+
+from crawler.spill import SpillRuns
+
+
+def get_host(url):
+    return urlparse(url).netloc.lower()
+
+
+class HostScheduler(object):
+    # Urls to be downloaded, kept in one heap per host, lowest score first
+    # (ties first in, first out). Hosts with queued urls sit in a heap keyed
+    # by the earliest time they may be fetched again, so any number of
+    # threads can share it while each host is downloaded by at most one
+    # thread at a time, with the politeness delay in between. Of the hosts
+    # that may be fetched, the one whose best url scores lowest goes first.
+    # With a HostRateController (crawler/rate_control.py) the delay is its
+    # own for each host, and hosts it gives up on are dropped. set_delay
+    # raises one host's delay, for a robots.txt Crawl-delay.
+    # With a `window`, at most that many urls are kept in memory. Past it the
+    # worse half is spilled to a sorted run file in spill_dir
+    # (crawler/spill.py), and the runs are merged back, best first, whenever
+    # memory falls to a quarter of the window.
+    def __init__(self, delay, rates=None, window=0, spill_dir=None):
+        self.delay = delay
+        self.rates = rates
+        self.window = window
+        self.queues = dict()        # host -> heap of (score, sequence, url, depth)
+        self.ready = list()         # heap of (next allowed fetch, token, host)
+        self.eligible = list()      # heap of (best score, token, host) of hosts that may be fetched
+        self.tokens = dict()        # host -> token of its one live entry in ready or eligible
+        self.next_allowed = dict()  # host -> time.monotonic() it may be fetched
+        self.delays = dict()        # host -> least delay of its own
+        self.busy = set()           # hosts currently being downloaded
+        self.dropped = set()        # hosts given up on, their urls are not queued
+        self.taken = dict()         # url being downloaded -> (score, depth)
+        self.sequence = itertools.count()
+        self.size = 0               # urls queued, in memory and spilled
+        self.in_memory = 0
+        self.spilled = SpillRuns(spill_dir) if window else None
+        self.condition = Condition()
+
+    def __len__(self):
+        return self.size
+
+    def idle(self):
+        # True when nothing is queued or being downloaded.
+        with self.condition:
+            return not self.size and not self.busy
+
+    def add(self, url, score=0.0, depth=0):
+        with self.condition:
+            if self._push(url, score, depth):
+                self.size += 1
+                if self.window and self.in_memory > self.window:
+                    self._spill()
+
+    def get(self):
+        # Blocks until some host may be fetched and returns its best url.
+        # Returns None once nothing is queued and no download is in progress,
+        # since only a download in progress can add more urls.
+        with self.condition:
+            while True:
+                if self.spilled and self.in_memory <= self.window // 4:
+                    self._refill(self.window // 2)
+                now = time.monotonic()
+                while self.ready and self.ready[0][0] <= now:
+                    _, token, host = heapq.heappop(self.ready)
+                    if self._live(host, token):
+                        self._rank(host)
+                url = self._take(now)
+                if url is not None:
+                    return url
+                if self.eligible:
+                    continue # Better urls were merged back, rank them first
+                if self.ready:
+                    self.condition.wait(self.ready[0][0] - now)
+                elif not self.busy:
+                    self.condition.notify_all()
+                    return None
+                else:
+                    self.condition.wait()
+
+    def _take(self, now):
+        # Best url of the hosts that may be fetched, None if there is none or
+        # spilled urls scoring better had to be merged back first.
+        while self.eligible:
+            score, token, host = heapq.heappop(self.eligible)
+            if not self._live(host, token):
+                continue
+            queue = self.queues[host]
+            if queue[0][0] != score:
+                # Ranked by a url the host no longer starts with.
+                self._rank(host)
+                continue
+            if self.spilled and self.spilled.best() < score and self.in_memory < self.window:
+                self._rank(host)
+                self._refill(self.window, score)
+                return None
+            _, _, url, depth = heapq.heappop(queue)
+            if not queue:
+                del self.queues[host]
+            del self.tokens[host]
+            self.size -= 1
+            self.in_memory -= 1
+            self.busy.add(host)
+            self.taken[url] = (score, depth)
+            return url
+        return None
+
+    def depth(self, url):
+        # Depth of a url being downloaded, None for any other url.
+        taken = self.taken.get(url)
+        return taken[1] if taken is not None else None
+
+    def set_delay(self, host, delay):
+        with self.condition:
+            self.delays[host] = delay
+
+    def put_back(self, url):
+        # Queues a url returned by get again, with its score, after another
+        # request to its host was made in its place.
+        with self.condition:
+            taken = self.taken.get(url)
+            if taken is not None and self._push(url, *taken):
+                self.size += 1
+            self.done(url)
+
+    def done(self, url, fetched=True):
+        # Called once the download of url is finished and its links were
+        # added. fetched is False when url was given up without a request,
+        # which leaves its host's next allowed fetch as it was. Calling it
+        # again for the same url does nothing.
+        host = get_host(url)
+        with self.condition:
+            if url not in self.taken:
+                return
+            del self.taken[url]
+            self.busy.discard(host)
+            now = time.monotonic()
+            if fetched:
+                next_time = now + self.delay if self.rates is None else self.rates.next_fetch(host, now)
+                if next_time is None:
+                    self.dropped.add(host)
+                    dropped = len(self.queues.pop(host, ()))
+                    self.size -= dropped
+                    self.in_memory -= dropped
+                else:
+                    self.next_allowed[host] = max(next_time, now + self.delays.get(host, 0))
+            if host in self.queues:
+                self._schedule(host)
+            elif not self.busy:
+                # The crawl may be over, wake every thread waiting in get.
+                self.condition.notify_all()
+
+    def close(self):
+        if self.spilled is not None:
+            self.spilled.close()
+
+    def _push(self, url, score, depth):
+        # Queues url in memory. False for a host that was given up on.
+        host = get_host(url)
+        if host in self.dropped:
+            return False
+        queue = self.queues.get(host)
+        if queue is None:
+            queue = self.queues[host] = list()
+        entry = (score, next(self.sequence), url, depth)
+        heapq.heappush(queue, entry)
+        self.in_memory += 1
+        # Scheduled again when url is the host's new best, so the host is
+        # ranked by it.
+        if queue[0] is entry and host not in self.busy:
+            self._schedule(host)
+        return True
+
+    def _live(self, host, token):
+        # False for entries replaced by a newer one of their host, and for
+        # hosts emptied by a spill.
+        if self.tokens.get(host) != token:
+            return False
+        if host not in self.queues:
+            del self.tokens[host]
+            return False
+        return True
+
+    def _schedule(self, host):
+        # Waits for the host's next allowed fetch, replacing any entry it has.
+        token = self.tokens[host] = next(self.sequence)
+        heapq.heappush(
+            self.ready, (self.next_allowed.get(host, 0), token, host))
+        self.condition.notify()
+
+    def _rank(self, host):
+        # The host may be fetched, ranked by its best url.
+        token = self.tokens[host] = next(self.sequence)
+        heapq.heappush(self.eligible, (self.queues[host][0][0], token, host))
+
+    def _spill(self):
+        # Keeps the best half of the window in memory and writes the rest,
+        # sorted, as one run.
+        entries = sorted(entry for queue in self.queues.values() for entry in queue)
+        keep = self.window // 2
+        self.queues.clear()
+        self.in_memory = 0
+        for score, _, url, depth in entries[:keep]:
+            self._push(url, score, depth)
+        self.spilled.write((score, depth, url) for score, _, url, depth in entries[keep:])
+
+    def _refill(self, target, below=None):
+        # Moves the best spilled urls back until `target` urls are in memory,
+        # or, with `below`, until no spilled url scores below it.
+        while (self.spilled and self.in_memory < target
+               and (below is None or self.spilled.best() < below)):
+            score, depth, url = self.spilled.pop()
+            if not self._push(url, score, depth):
+                self.size -= 1
@@ -0,0 +1,60 @@
+import math
+
+
+class ExactSeenSet(object):
+    # Every url digest ever added to the frontier, kept as the integer value
+    # of its first 8 bytes. 64 bits keeps collisions out of reach for any crawl
+    # this size while costing far less than the 64 character hex urlhash.
+    def __init__(self):
+        self.digests = set()
+
+    def __len__(self):
+        return len(self.digests)
+
+    def __contains__(self, digest):
+        return int.from_bytes(digest[:8], "big") in self.digests
+
+    def add(self, digest):
+        self.digests.add(int.from_bytes(digest[:8], "big"))
+
+
+class BloomFilter(object):
+    # Bloom filter sized for `capacity` digests at the given false positive
+    # rate. A false positive makes the frontier skip a url it has not seen.
+    def __init__(self, capacity, error_rate):
+        self.bit_count = max(8, int(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(
+            self.bit_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, digest):
+        # Double hashing over two independent 64 bit halves of the sha256.
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.bit_count
+
+    def __contains__(self, digest):
+        bits = self.bits
+        for position in self._positions(digest):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, digest):
+        bits = self.bits
+        for position in self._positions(digest):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+
+def make_seen_filter(config):
+    if config.seen_filter == "bloom":
+        return BloomFilter(config.seen_capacity, config.seen_error_rate)
+    assert config.seen_filter == "exact", "SEENFILTER must be exact or bloom"
+    return ExactSeenSet()
@@ -0,0 +1,275 @@
+import os
+
+from hashlib import sha256
+from multiprocessing.connection import Client, Listener
+from threading import Event, Lock, Thread
+
+from crawler.frontier import Frontier
+from crawler.scheduler import get_host
+from crawler.store import OUTBOX, FORWARDED
+from utils import get_logger, get_urldigest, get_urlhash, normalize
+from utils.analytics import CrawlStats
+import scraper
+
+
+def shard_of(url, count):
+    # Shard owning the host of url. Unlike hash(), the same in every process
+    # and on every machine.
+    digest = sha256(get_host(url).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def parse_address(address):
+    host, _, port = address.strip().rpartition(":")
+    return host, int(port)
+
+
+class ShardedFrontier(Frontier):
+    # Frontier of one of [SHARDS] COUNT crawler processes. Each shard owns the
+    # hosts that hash into it, so every host is still fetched by a single
+    # HostScheduler and politeness holds across shards. Links to hosts of
+    # other shards are saved as OUTBOX and forwarded to their shard in
+    # batches; links received from other shards are added like discovered
+    # ones. Every shard has its own save file and can be resumed alone.
+    # Shards talk over multiprocessing.connection, authenticated with
+    # AUTHKEY. A batch is acknowledged once it is committed to the receiving
+    # shard's save file, and the crawl ends when the Coordinator finds every
+    # shard idle.
+    def __init__(self, config, restart):
+        self.shard = config.shard_index
+        self.shards = config.shard_count
+        self.addresses = [parse_address(address) for address in config.shard_addresses]
+        self.coordinator = parse_address(config.shard_coordinator)
+        self.authkey = config.shard_authkey.encode("utf-8")
+        self.outbox = {shard: [] for shard in range(self.shards) if shard != self.shard}
+        self.outbox_lock = Lock()
+        self.send_locks = {shard: Lock() for shard in self.outbox}
+        self.connections = dict()
+        self.counter_lock = Lock()
+        self.session = os.urandom(8).hex() # Tells the coordinator this process apart from earlier runs of the shard
+        self.sending = 0   # batches being sent, the shard is not idle meanwhile
+        self.sent = 0      # urls forwarded and acknowledged by their shard
+        self.received = 0  # urls received from other shards
+        self.stopped = Event()
+        # Bound before the save file is read, so other shards can connect
+        # while this one loads.
+        self.listener = Listener(self.addresses[self.shard], authkey=self.authkey)
+        super().__init__(config, restart)
+        self.logger = get_logger(f"FRONTIER-{self.shard}", "FRONTIER")
+
+        partition = f"{self.shard}/{self.shards}"
+        if self.save.get_meta("shard", partition) != partition:
+            raise RuntimeError(
+                f"{config.save_file} belongs to shard {self.save.get_meta('shard')}, "
+                f"not {partition}. Restart to change the shard count.")
+        self.save.set_meta("shard", partition)
+        # Batches that were not sent before the last session ended.
+        for url in self.save.urls_in_state(OUTBOX):
+            self._queue(url, shard_of(url, self.shards))
+
+        Thread(target=self._accept, daemon=True).start()
+        Thread(target=self._run, daemon=True).start()
+
+    def add_url(self, url, parent=None, lastmod=None):
+        url = normalize(url)
+        owner = shard_of(url, self.shards)
+        if owner == self.shard:
+            super().add_url(url, parent, lastmod)
+            return
+        urldigest = get_urldigest(url)
+        if urldigest in self.seen:
+            return
+        with self.lock:
+            if self._known(urldigest):
+                return
+            # Seen here too, so each url is forwarded once.
+            self.seen.add(urldigest)
+            self.save[urldigest.hex()] = (url, OUTBOX)
+        self._queue(url, owner)
+
+    def get_tbd_url(self):
+        # Once this shard runs dry, waits for urls from the other shards
+        # until the coordinator ends the crawl.
+        while True:
+            url = super().get_tbd_url()
+            if url is not None:
+                return url
+            if self.stopped.wait(0.2):
+                return None
+
+    def idle(self):
+        with self.outbox_lock:
+            if self.sending or any(self.outbox.values()):
+                return False
+        return self.to_be_downloaded.idle()
+
+    def _queue(self, url, owner):
+        with self.outbox_lock:
+            self.outbox[owner].append(url)
+            full = len(self.outbox[owner]) >= self.config.forward_batch
+        if full:
+            self._forward(owner)
+
+    def _forward(self, owner):
+        # Sends the outbox of owner as one batch. False if the shard could
+        # not be reached, the batch is then retried later.
+        with self.send_locks[owner]:
+            with self.outbox_lock:
+                urls, self.outbox[owner] = self.outbox[owner], []
+                if not urls:
+                    return True
+                self.sending += 1
+            try:
+                connection = self.connections.get(owner)
+                if connection is None:
+                    connection = self.connections[owner] = Client(
+                        self.addresses[owner], authkey=self.authkey)
+                connection.send(urls)
+                connection.recv() # Acknowledged once they are in its frontier
+            except (OSError, EOFError) as e:
+                self.connections.pop(owner, None)
+                with self.outbox_lock:
+                    self.outbox[owner][:0] = urls
+                self.logger.info(f"Shard {owner} unreachable ({e}), will retry.")
+                return False
+            finally:
+                with self.outbox_lock:
+                    self.sending -= 1
+        with self.lock:
+            for url in urls:
+                self.save[get_urlhash(url)] = (url, FORWARDED)
+        with self.counter_lock:
+            self.sent += len(urls)
+        return True
+
+    def _accept(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except Exception as e: # Failed handshake, wrong AUTHKEY, ...
+                self.logger.warning(f"Rejected a shard connection: {e}")
+                continue
+            Thread(target=self._receive, args=(connection,), daemon=True).start()
+
+    def _receive(self, connection):
+        with connection:
+            while True:
+                try:
+                    urls = connection.recv()
+                except (OSError, EOFError):
+                    return
+                for url in urls:
+                    # Owned by this shard, so not routed again.
+                    Frontier.add_url(self, url)
+                # Committed before the sender marks them FORWARDED.
+                self.save.flush()
+                with self.counter_lock:
+                    self.received += len(urls)
+                connection.send(len(urls))
+
+    def _run(self):
+        # Forwards every outbox each FORWARDINTERVAL and reports the state of
+        # the shard to the coordinator, until it says the crawl is over.
+        connection = None
+        while not self.stopped.wait(self.config.forward_interval):
+            for owner in self.outbox:
+                self._forward(owner)
+            with self.counter_lock:
+                status = ("status", self.shard, self.session, self.idle(),
+                          self.sent, self.received)
+            try:
+                if connection is None:
+                    connection = Client(self.coordinator, authkey=self.authkey)
+                connection.send(status)
+                if connection.recv() == "stop":
+                    self.logger.info("Every shard is done, stopping.")
+                    with scraper.analytics.merged() as stats:
+                        connection.send(("stats", self.shard, stats))
+                    connection.recv()
+                    self.stopped.set()
+            except (OSError, EOFError) as e:
+                connection = None
+                self.logger.info(f"Coordinator unreachable ({e}), will retry.")
+
+
+class Coordinator(object):
+    # Ends a sharded crawl and writes its report. Every shard reports whether
+    # it is idle along with the urls it forwarded and received. A shard that
+    # is sending a batch is not idle, and the receiver has the urls queued
+    # before it acknowledges them, so only a received batch can give an idle
+    # shard more work. The crawl is over once every shard has reported idle,
+    # then idle again with none of the counts changed: at the moment of the
+    # first of those, every shard was idle with nothing in flight. Each shard
+    # then sends its stats, which are merged into the report like the stats
+    # of worker threads.
+    def __init__(self, config):
+        self.count = config.shard_count
+        self.address = parse_address(config.shard_coordinator)
+        self.authkey = config.shard_authkey.encode("utf-8")
+        self.logger = get_logger("COORDINATOR")
+        self.lock = Lock()
+        self.status = dict()    # shard -> (idle, (session, sent, received))
+        self.candidate = None   # totals of a round where every shard was idle
+        self.confirmed = set()  # shards that reported idle again since
+        self.done = Event()
+        self.stats = dict()     # shard -> CrawlStats
+        self.finished = Event()
+
+    def run(self):
+        # Blocks until every shard sent its stats, then writes the report.
+        listener = Listener(self.address, authkey=self.authkey)
+        Thread(target=self._accept, args=(listener,), daemon=True).start()
+        self.logger.info(f"Waiting for {self.count} shards on {self.address}.")
+        self.finished.wait()
+        listener.close()
+        merged = CrawlStats()
+        for shard in sorted(self.stats):
+            merged.merge(self.stats[shard])
+        scraper.write_report(merged)
+        self.logger.info("Crawl finished, report written.")
+        return merged
+
+    def _accept(self, listener):
+        while not self.finished.is_set():
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                if not self.finished.is_set():
+                    self.logger.warning(f"Rejected a shard connection: {e}")
+                continue
+            Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    message = connection.recv()
+                except (OSError, EOFError):
+                    return
+                if message[0] == "status":
+                    _, shard, session, idle, sent, received = message
+                    with self.lock:
+                        self.status[shard] = (idle, (session, sent, received))
+                        self._check(shard)
+                    connection.send("stop" if self.done.is_set() else "continue")
+                elif message[0] == "stats":
+                    _, shard, stats = message
+                    with self.lock:
+                        self.stats[shard] = stats
+                        if len(self.stats) == self.count:
+                            self.finished.set()
+                    connection.send("ok")
+
+    def _check(self, shard):
+        if len(self.status) < self.count:
+            return
+        totals = {shard: counts for shard, (_, counts) in self.status.items()}
+        if not all(idle for idle, _ in self.status.values()):
+            self.candidate = None
+        elif totals != self.candidate:
+            self.candidate = totals
+            self.confirmed = {shard}
+        else:
+            self.confirmed.add(shard)
+            if len(self.confirmed) == self.count:
+                self.done.set()
@@ -0,0 +1,103 @@
+import heapq
+import os
+import re
+import struct
+
+# Record of a run file: score, depth, url length, then the url.
+_ENTRY = struct.Struct("<dII")
+# Runs are merged into one once there are this many, which bounds open files
+# and read buffers.
+_MAX_RUNS = 32
+# Names of the run files, the only files a SpillRuns deletes.
+_RUN_NAME = re.compile(r"\d{6,}\.run")
+
+
+class SpillRuns(object):
+    # Urls HostScheduler moved out of memory, as run files of (score, depth,
+    # url) sorted by score. The runs are merged lazily: only the head of each
+    # run is in memory, and pop() returns the best url over all of them. Run
+    # files left in the directory are deleted on start, as pending urls are
+    # reloaded from the save file anyway. Other files in it are left alone,
+    # and the directory is removed on close only if nothing else is in it.
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._remove_runs()
+        self.heads = list() # heap of (score, run, depth, url), the next entry of every run
+        self.files = dict() # run -> file being read
+        self.next_run = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def best(self):
+        # Score of the url pop() would return.
+        return self.heads[0][0]
+
+    def write(self, entries):
+        # entries: (score, depth, url) sorted by score.
+        self._write_run(entries)
+        if len(self.files) > _MAX_RUNS:
+            self._compact()
+
+    def pop(self):
+        # (score, depth, url) of the best spilled url.
+        score, run, depth, url = heapq.heappop(self.heads)
+        self.count -= 1
+        self._advance(run)
+        return score, depth, url
+
+    def close(self):
+        for run_file in self.files.values():
+            run_file.close()
+        self.files.clear()
+        if os.path.isdir(self.directory):
+            self._remove_runs()
+            try:
+                os.rmdir(self.directory)
+            except OSError: # Holds other files
+                pass
+
+    def _remove_runs(self):
+        for name in os.listdir(self.directory):
+            if _RUN_NAME.fullmatch(name):
+                os.remove(os.path.join(self.directory, name))
+
+    def _advance(self, run):
+        # Pushes the next entry of run, or removes the run once it is read.
+        run_file = self.files[run]
+        header = run_file.read(_ENTRY.size)
+        if len(header) < _ENTRY.size:
+            run_file.close()
+            os.remove(run_file.name)
+            del self.files[run]
+            return
+        score, depth, length = _ENTRY.unpack(header)
+        heapq.heappush(self.heads, (score, run, depth, run_file.read(length).decode("utf-8")))
+
+    def _write_run(self, entries):
+        run = self.next_run
+        self.next_run += 1
+        path = os.path.join(self.directory, f"{run:06d}.run")
+        with open(path, "wb") as run_file:
+            for score, depth, url in entries:
+                url = url.encode("utf-8")
+                run_file.write(_ENTRY.pack(score, depth, len(url)))
+                run_file.write(url)
+                self.count += 1
+        self.files[run] = open(path, "rb")
+        self._advance(run)
+
+    def _compact(self):
+        # Merges every run into one. The old runs are read to their end, and
+        # deleted, while the merged one is written.
+        count = self.count
+        self.count = 0
+        self._write_run(self._drain(count))
+
+    def _drain(self, count):
+        for _ in range(count):
+            score, run, depth, url = heapq.heappop(self.heads)
+            self._advance(run)
+            yield score, depth, url
@@ -0,0 +1,417 @@
+import atexit
+import os
+import pickle
+import shelve
+import sqlite3
+import time
+
+from collections import namedtuple
+from contextlib import contextmanager
+from threading import Event, RLock, Thread
+
+# Values of the completed column. Urls that were pending when the is_valid
+# rules changed and no longer pass them are kept as REJECTED, so they can be
+# picked up again if the rules are relaxed later. With shards, urls of hosts
+# owned by another shard are OUTBOX until sent to it, then FORWARDED. Pending
+# urls robots.txt turned out to disallow are DISALLOWED.
+PENDING, COMPLETE, REJECTED, OUTBOX, FORWARDED, DISALLOWED = 0, 1, 2, 3, 4, 5
+# When rehashing folds several urls into one, the state that wins: a url
+# downloaded (or handed to its shard) under any of its forms is not pending.
+_STATE_RANK = {COMPLETE: 5, FORWARDED: 4, OUTBOX: 3, DISALLOWED: 2, PENDING: 1, REJECTED: 0}
+
+# First bytes of every SQLite database file.
+_SQLITE_HEADER = b"SQLite format 3\x00"
+# Files of a shelve save file from before this store, besides the path
+# itself (dbm.dumb).
+_SHELVE_SUFFIXES = (".dat", ".dir", ".bak")
+
+# What a url's page looked like when it was last downloaded, see
+# crawler/recrawl.py. words is its compressed word counts, None until the
+# scraper recorded them.
+PageRecord = namedtuple(
+    "PageRecord",
+    "content_hash etag last_modified fetched checks changes interval words")
+
+
+class FrontierStore(object):
+    # Save file of the frontier, backed by SQLite in WAL mode. It is used like
+    # the shelve it replaces (urlhash -> (url, completed)), where completed is
+    # a bool or one of the states above, but writes are
+    # buffered and committed together once FLUSHBATCH writes are pending or
+    # FLUSHINTERVAL seconds have passed. Every flush is a single transaction,
+    # so a crash loses at most the writes of the last batch, and a page's
+    # links are never committed without the page being marked complete in the
+    # same batch (or a later one). A page's completion, its PageRecord and its
+    # report stats are written in one atomic() block, so they are committed
+    # together or not at all.
+    def __init__(self, path, batch_size=500, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = RLock()
+        self.pending = dict()
+        self.pending_pages = dict()
+        self.pending_stats = list()
+        self.pending_hosts = dict()
+        self.deferring = 0 # Nested atomic() blocks, no flush starts inside one
+        self.last_flush = time.monotonic()
+        self.flush_count = 0
+        self.write_count = 0
+
+        self._check_format(path)
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "urlhash TEXT PRIMARY KEY, url TEXT NOT NULL, "
+            "completed INTEGER NOT NULL) WITHOUT ROWID")
+        # Covering index of the pending urls, so resuming reads only those
+        # no matter how many urls are already complete.
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS pending_urls "
+            "ON urls (url) WHERE completed = 0")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # A rowid table, unlike urls: its rows hold word counts.
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "urlhash TEXT PRIMARY KEY, content_hash BLOB, etag TEXT, "
+            "last_modified TEXT, fetched REAL NOT NULL, checks INTEGER NOT NULL, "
+            "changes INTEGER NOT NULL, interval REAL NOT NULL, words BLOB, "
+            "due REAL NOT NULL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS pages_due ON pages (due)")
+        # New urls admitted per host, for [FILTER] HOSTBUDGET.
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS hosts ("
+            "host TEXT PRIMARY KEY, admitted INTEGER NOT NULL)")
+        # Report stats of the pages completed by each flush, until the stats
+        # file holds them (utils/analytics.py).
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS stats ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, deltas BLOB NOT NULL)")
+        # Id of the last row committed, never reused once rows are dropped.
+        self.stats_id = self.connection.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'stats'"
+        ).fetchone()[0]
+
+        self.closed = Event()
+        self.flusher = Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def remove(path):
+        # Deletes a save file along with its WAL files, or an older shelve
+        # save file.
+        for suffix in ("", "-wal", "-shm") + _SHELVE_SUFFIXES:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    @staticmethod
+    def exists(path):
+        return any(os.path.exists(path + suffix) for suffix in ("",) + _SHELVE_SUFFIXES)
+
+    @classmethod
+    def convert(cls, shelve_path, path):
+        # Copies the shelve save file of an older crawler (urlhash -> (url,
+        # completed)) into a new save file at path. Returns the urls copied.
+        if cls.exists(path):
+            raise RuntimeError(f"{path} exists already, set SAVE to a new file to convert into.")
+        count = 0
+        with shelve.open(shelve_path, "r") as old:
+            store = cls(path)
+            try:
+                for urlhash, (url, completed) in old.items():
+                    store[urlhash] = (url, bool(completed))
+                    count += 1
+            finally:
+                store.close()
+        return count
+
+    @staticmethod
+    def _check_format(path):
+        # SQLite would reject a shelve save file only on the first query,
+        # with "file is not a database".
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as save_file:
+                if save_file.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER:
+                    return
+        elif not any(os.path.exists(path + suffix) for suffix in _SHELVE_SUFFIXES):
+            return # A new save file
+        raise RuntimeError(
+            f"{path} is not an SQLite save file, it may be the shelve of an older "
+            f"version of the crawler. Start over with `python3 launch.py --restart`, "
+            f"or set SAVE to a new file and copy it there with "
+            f"`python3 launch.py --convert {path}`.")
+
+    def __contains__(self, urlhash):
+        with self.lock:
+            if urlhash in self.pending:
+                return True
+            return self.connection.execute(
+                "SELECT 1 FROM urls WHERE urlhash = ?",
+                (urlhash,)).fetchone() is not None
+
+    def __getitem__(self, urlhash):
+        with self.lock:
+            if urlhash in self.pending:
+                return self.pending[urlhash]
+            row = self.connection.execute(
+                "SELECT url, completed FROM urls WHERE urlhash = ?",
+                (urlhash,)).fetchone()
+        if row is None:
+            raise KeyError(urlhash)
+        return row[0], row[1] == COMPLETE
+
+    def __setitem__(self, urlhash, value):
+        with self.lock:
+            self.pending[urlhash] = value
+            if self.deferring:
+                return
+            if (len(self.pending) >= self.batch_size
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+
+    @contextmanager
+    def atomic(self):
+        # Writes made inside are committed in the same transaction: no other
+        # thread can flush meanwhile, and this one does not start a flush
+        # until the block is over.
+        with self.lock:
+            self.deferring += 1
+            try:
+                yield self
+            finally:
+                self.deferring -= 1
+            if not self.deferring and (
+                    len(self.pending) >= self.batch_size
+                    or len(self.pending_pages) >= self.batch_size
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+
+    def __len__(self):
+        with self.lock:
+            self.flush()
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def values(self):
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                "SELECT url, completed FROM urls").fetchall()
+        for url, completed in rows:
+            yield url, completed == COMPLETE
+
+    def urlhashes(self):
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                "SELECT urlhash FROM urls").fetchall()
+        return [urlhash for urlhash, in rows]
+
+    def pending_urls(self):
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                "SELECT url FROM urls INDEXED BY pending_urls "
+                "WHERE completed = 0").fetchall()
+        return [url for url, in rows]
+
+    def urls_in_state(self, state):
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                "SELECT url FROM urls WHERE completed = ?", (state,)).fetchall()
+        return [url for url, in rows]
+
+    def revalidate(self, is_valid):
+        # Checks every PENDING and REJECTED url against is_valid again, moving
+        # it between the two. Returns the number of pending urls.
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                "SELECT urlhash, url FROM urls WHERE completed IN (?, ?)",
+                (PENDING, REJECTED)).fetchall()
+            states = [(PENDING if is_valid(url) else REJECTED, urlhash)
+                      for urlhash, url in rows]
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.executemany(
+                    "UPDATE urls SET completed = ? WHERE urlhash = ?", states)
+        return sum(1 for state, _ in states if state == PENDING)
+
+    def rehash(self, canonicalize, get_urlhash):
+        # Rewrites every url in its canonical form, keyed by its new hash, in
+        # one transaction. Urls that fold into one keep the most advanced
+        # state, and their page record the latest download. Returns the
+        # number of urls before and after.
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                "SELECT urlhash, url, completed FROM urls").fetchall()
+            urls = dict()     # new urlhash -> (url, completed)
+            renamed = dict()  # old urlhash -> new urlhash
+            for urlhash, url, completed in rows:
+                url = canonicalize(url)
+                new = renamed[urlhash] = get_urlhash(url)
+                current = urls.get(new)
+                if current is None or _STATE_RANK.get(completed, 0) > _STATE_RANK.get(current[1], 0):
+                    urls[new] = (url, completed)
+            latest = dict()   # new urlhash -> (fetched, old urlhash) of the page kept
+            for urlhash, fetched in self.connection.execute(
+                    "SELECT urlhash, fetched FROM pages").fetchall():
+                new = renamed.get(urlhash, urlhash)
+                if new not in latest or fetched > latest[new][0]:
+                    latest[new] = (fetched, urlhash)
+            kept = {old: new for new, (_, old) in latest.items()}
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.execute("DELETE FROM urls")
+                self.connection.executemany(
+                    "INSERT INTO urls (urlhash, url, completed) VALUES (?, ?, ?)",
+                    ((urlhash, url, completed) for urlhash, (url, completed) in urls.items()))
+                self.connection.executemany(
+                    "DELETE FROM pages WHERE urlhash = ?",
+                    ((urlhash,) for urlhash in renamed if urlhash not in kept))
+                self.connection.executemany(
+                    "UPDATE OR REPLACE pages SET urlhash = ? WHERE urlhash = ?",
+                    ((new, old) for old, new in kept.items() if old != new))
+        return len(rows), len(urls)
+
+    def get_page(self, urlhash):
+        # PageRecord of urlhash, None if it was never downloaded.
+        with self.lock:
+            if urlhash in self.pending_pages:
+                return self.pending_pages[urlhash]
+            row = self.connection.execute(
+                "SELECT content_hash, etag, last_modified, fetched, checks, "
+                "changes, interval, words FROM pages WHERE urlhash = ?",
+                (urlhash,)).fetchone()
+        return PageRecord(*row) if row is not None else None
+
+    def set_page(self, urlhash, record):
+        # Buffered and committed along with the url writes.
+        with self.lock:
+            self.pending_pages[urlhash] = record
+            if not self.deferring and len(self.pending_pages) >= self.batch_size:
+                self.flush()
+
+    def set_admitted(self, host, count):
+        # Buffered and committed along with the url writes.
+        with self.lock:
+            self.pending_hosts[host] = count
+
+    def admitted(self):
+        # host -> new urls admitted, of every host.
+        with self.lock:
+            self.flush()
+            return dict(self.connection.execute("SELECT host, admitted FROM hosts"))
+
+    def add_stats(self, delta):
+        # Buffered and committed along with the url writes, as one row of
+        # every delta of the flush.
+        with self.lock:
+            self.pending_stats.append(delta)
+
+    def stats_after(self, stats_id):
+        # Every delta committed in a row after stats_id, oldest first.
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                "SELECT deltas FROM stats WHERE id > ? ORDER BY id",
+                (stats_id,)).fetchall()
+        return [delta for deltas, in rows for delta in pickle.loads(deltas)]
+
+    def drop_stats(self, stats_id):
+        # Deletes the rows up to stats_id, once the stats file holds them.
+        with self.lock:
+            if not self.closed.is_set():
+                self.connection.execute("DELETE FROM stats WHERE id <= ?", (stats_id,))
+
+    def due_pages(self, now):
+        # (url, checks, changes, interval, due) of every complete url whose
+        # page is due for another download at time.time() now.
+        with self.lock:
+            self.flush()
+            return self.connection.execute(
+                "SELECT urls.url, checks, changes, interval, due "
+                "FROM pages INDEXED BY pages_due JOIN urls USING (urlhash) "
+                "WHERE due <= ? AND urls.completed = ?", (now, COMPLETE)).fetchall()
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def meta_items(self, prefix):
+        # (key, value) of every meta key starting with prefix.
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT key, value FROM meta WHERE key >= ? AND key < ?",
+                (prefix, prefix + "\uffff")).fetchall()
+        return rows
+
+    def set_meta(self, key, value):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, str(value)))
+
+    def flush(self):
+        # Commits every buffered write as one transaction.
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if not (self.pending or self.pending_pages or self.pending_stats
+                    or self.pending_hosts):
+                return
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO urls (urlhash, url, completed) "
+                    "VALUES (?, ?, ?)",
+                    ((urlhash, url, int(completed)) # True and False are COMPLETE and PENDING
+                     for urlhash, (url, completed) in self.pending.items()))
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO pages (urlhash, content_hash, etag, "
+                    "last_modified, fetched, checks, changes, interval, words, due) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((urlhash, *record, record.fetched + record.interval)
+                     for urlhash, record in self.pending_pages.items()))
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO hosts (host, admitted) VALUES (?, ?)",
+                    self.pending_hosts.items())
+                if self.pending_stats:
+                    self.stats_id = self.connection.execute(
+                        "INSERT INTO stats (deltas) VALUES (?)",
+                        (pickle.dumps(self.pending_stats, pickle.HIGHEST_PROTOCOL),)
+                    ).lastrowid
+            self.write_count += len(self.pending) + len(self.pending_pages)
+            self.flush_count += 1
+            self.pending.clear()
+            self.pending_pages.clear()
+            self.pending_hosts.clear()
+            self.pending_stats = list()
+
+    # shelve compatibility for frontiers that still call sync().
+    sync = flush
+
+    def close(self):
+        with self.lock:
+            if self.closed.is_set():
+                return
+            self.closed.set()
+            self.flush()
+            self.connection.close()
+
+    def _flush_periodically(self):
+        # Makes sure a quiet frontier still commits within FLUSHINTERVAL.
+        while not self.closed.wait(self.flush_interval):
+            with self.lock:
+                if not self.closed.is_set():
+                    self.flush()
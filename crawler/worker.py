@@ -1,17 +1,21 @@
+import time
+
 from threading import Thread
 
 from inspect import getsource
 from utils.download import download
 from utils import get_logger
+from utils.metrics import metrics
 import scraper
-import time
 
 
 class Worker(Thread):
-    def __init__(self, worker_id, config, frontier):
+    def __init__(self, worker_id, config, frontier, pool=None, pages=None):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
+        self.pool = pool # ParsePool when PROCESSES is set, pages are then parsed there
+        self.pages = pages # PageStore when PAGESTORE is set
         # basic check for requests in scraper
         assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
         assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
@@ -19,16 +23,77 @@ class Worker(Thread):
         
     def run(self):
         while True:
-            tbd_url = self.frontier.get_tbd_url()
+            try:
+                with metrics.timer("frontier_get"):
+                    tbd_url = self.frontier.get_tbd_url()
+            except Exception:
+                # A robots.txt or sitemap download failed, its url was queued again.
+                self.logger.exception("Could not get a url from the frontier.")
+                metrics.count("worker_errors")
+                continue
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
+            try:
+                start = time.perf_counter()
+                with metrics.timer("download"):
+                    resp = download(tbd_url, self.config, self.logger)
+                self.frontier.record_download(tbd_url, resp.status, time.perf_counter() - start)
+                self.process(tbd_url, resp)
+            except Exception:
+                self.logger.exception(f"Failed on {tbd_url}.")
+                self.fail(tbd_url)
+
+    def process(self, tbd_url, resp):
+        # Everything done with a downloaded page, shared with AsyncWorker.
+        self.logger.info(
+            "Downloaded %s, status <%s>, using cache %s.",
+            tbd_url, resp.status, self.config.cache_server)
+        metrics.count("pages")
+        metrics.count(f"status_{resp.status}")
+        metrics.count("bytes", resp.content_length)
+        if self.frontier.unchanged(tbd_url, resp):
+            # Same content as last time: its links are known and its words
+            # counted already.
+            self.finish(tbd_url, [])
+            return
+        if self.pages is not None:
+            with metrics.timer("page_store"):
+                self.pages.add(tbd_url, resp)
+        if self.pool is not None:
+            # Returns as soon as the pool takes the page, finish runs later.
+            self.pool.submit(tbd_url, resp, self.finish)
+            return
+        try:
+            with metrics.timer("scraper"):
+                scraped_urls = scraper.scraper(tbd_url, resp)
+        except Exception:
+            # The frontier waits on this url's host, so keep the thread alive.
+            self.logger.exception(f"Scraper failed on {tbd_url}.")
+            metrics.count("scraper_errors")
+            scraped_urls = []
+        self.finish(tbd_url, scraped_urls)
+
+    def finish(self, tbd_url, scraped_urls):
+        try:
+            with metrics.timer("frontier_add"):
+                for scraped_url in scraped_urls:
+                    self.frontier.add_url(scraped_url, tbd_url)
+            # Politeness is enforced per host by the frontier, no sleep needed.
+            with metrics.timer("frontier_complete"):
+                self.frontier.mark_url_complete(tbd_url)
+        except Exception:
+            self.logger.exception(f"Could not finish {tbd_url}.")
+            self.fail(tbd_url)
+
+    def fail(self, tbd_url):
+        # Gives up on tbd_url after an error, so its host is released and no
+        # thread waits on it forever.
+        metrics.count("worker_errors")
+        try:
             self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+        except Exception:
+            self.logger.exception(f"Could not mark {tbd_url} complete.")
+        finally:
+            # Does nothing when mark_url_complete released it already.
+            self.frontier.to_be_downloaded.done(tbd_url)
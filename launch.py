@@ -3,24 +3,70 @@ from argparse import ArgumentParser
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
-from crawler import Crawler
+from crawler import Crawler, AsyncCrawler
+from crawler.frontier import Frontier
+from crawler.shards import ShardedFrontier, Coordinator
+from crawler.replay import replay
+from crawler.store import FrontierStore
 from scraper import write_report
 
-def main(config_file, restart):
+def main(config_file, restart, shard=None, recrawl=False):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
+    config.recrawl = recrawl
+    if shard is not None:
+        config.set_shard(shard)
     config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
+    frontier_factory = ShardedFrontier if shard is not None else Frontier
+    if config.engine == "async":
+        crawler = AsyncCrawler(config, restart, frontier_factory)
+    else:
+        crawler = Crawler(config, restart, frontier_factory)
     crawler.start()
 
 
+def coordinate(config_file):
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    Coordinator(Config(cparser)).run()
+
+
+def convert(config_file, shelve_path):
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    config = Config(cparser)
+    count = FrontierStore.convert(shelve_path, config.save_file)
+    print(f"Copied {count} urls from {shelve_path} into {config.save_file}.")
+
+
+def replay_pages(config_file, processes):
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    replay(Config(cparser), processes)
+
+
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--shard", type=int, default=None)
+    parser.add_argument("--coordinator", action="store_true", default=False)
+    parser.add_argument("--replay", action="store_true", default=False)
+    parser.add_argument("--recrawl", action="store_true", default=False)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--convert", type=str, default=None)
     args = parser.parse_args()
-    try: #Added to make sure that log is written even if crawler is interrupted
-        main(args.config_file, args.restart)
-    finally:
-        write_report()
+    if args.convert:
+        convert(args.config_file, args.convert) # Copies an older shelve save file into SAVE
+    elif args.replay:
+        replay_pages(args.config_file, args.processes) # Rebuilds the report from PAGESTORE, no crawling
+    elif args.coordinator:
+        coordinate(args.config_file) # Writes the report once every shard is done
+    elif args.shard is not None:
+        main(args.config_file, args.restart, args.shard, args.recrawl)
+    else:
+        try: #Added to make sure that log is written even if crawler is interrupted
+            main(args.config_file, args.restart, recrawl=args.recrawl) # --recrawl also downloads completed urls that are due again
+        finally:
+            write_report()
@@ -1,53 +1,162 @@
-import re 
 import os # Imported to write report in txt file
-import PartA # Used as a tokenizer
-from collections import Counter # Used to find top 50 common words
+from collections import Counter, OrderedDict # Filter rejections per page, recent page quality
 
-from bs4 import BeautifulSoup # Used to pull data out of HTML Files. 
-from urllib.parse import urlparse, urljoin, urlunparse
+from utils.page import ParsedPage, set_parser # Parses each page once for every step below
+from utils.simhash import SimHashIndex, simhash # Used to find near duplicate pages
+from utils.analytics import CrawlAnalytics, CrawlStats # Holds the data used for the report
+from utils.url_filter import UrlFilter # Compiled rules behind is_valid
+from utils.metrics import metrics # Per stage timings, see utils/metrics.py
+from utils import canonical, get_logger, normalize
 
 
 
-unique_urls = set() #Tracks Unique URLS with no duplicates
+logger = get_logger("SCRAPER", "Worker") # Level gated and rate limited, replaces print on the hot path
 
-# Data used for Report
-longest_page = {'url': None, 'word_count': 0}  # Track the longest page by word count
-word_frequencies = Counter() # To find the 50 most common words
-subdomain_counts = {}  # Count unique pages per subdomain in uci.edu
+
+
+# Data used for Report: unique urls, longest page, word frequencies and
+# subdomain counts (see utils/analytics.py). Replaced by a persistent one in configure.
+analytics = CrawlAnalytics()
+
+near_duplicates = SimHashIndex() # Fingerprints of pages already processed
+url_filter = UrlFilter() # Default rules until configure reads them from config.ini
+max_page_size = 10000000 # Pages above this many bytes are skipped, 0 for no limit
+content_types = frozenset({"text/html", "application/xhtml+xml", "text/plain"}) # Content types that are parsed
+page_quality = OrderedDict() # url -> (text ratio, word count) of recently recorded pages, read by the frontier to rank their links
+max_page_quality = 10000 # Oldest entries are dropped past this many, the frontier pops its own long before
+page_history = None # Former word counts of pages crawled before, set by the frontier with [RECRAWL] TRACK (crawler/recrawl.py)
 
 # Michael Armijo, Anthony Gutierrez
 
+def configure(config, restart=False):
+    # Applies the config.ini options used by the scraper. Called once by the Crawler.
+    global near_duplicates, analytics, url_filter, max_page_size, content_types
+    set_parser(config.parser)
+    canonical.configure(config) # Urls are canonicalized by utils.normalize from here on
+    max_page_size = config.max_page_size
+    content_types = frozenset(config.content_types)
+    url_filter = UrlFilter.from_config(config)
+    analytics = CrawlAnalytics(config.stats_file, config.checkpoint_interval, restart, config.word_sketch)
+    near_duplicates = SimHashIndex(config.near_dup_threshold, config.near_dup_capacity)
+
 def scraper(url, resp):
-    if resp.status != 200 or not resp.raw_response.content: #If resp is not 200 (OK) or not raw content 
-        print(f"Skipping {url} due to non-200 status or empty content.")
+    if skip_response(url, resp): #If resp is not 200 (OK) or not raw content 
+        forget(url) # In case it was counted when it last had content
         return [] #Skip and return empty list 
+    return record(url, analyze(url, resp.content)) # Same two steps a pool process and the worker split with PROCESSES set
+
+def skip_response(url, resp):
+    # True for responses that are not parsed at all. Only reads status, length and
+    # content type, so the response is never unpickled for these (utils/response.py)
+    if resp.status != 200 or not resp.content_length:
+        logger.debug("Skipping %s due to non-200 status or empty content.", url)
+        metrics.count("skipped_status")
+        return True
+    if max_page_size and resp.content_length > max_page_size: # Huge files are mostly data dumps, not pages
+        logger.debug("Skipping %s due to its size: %s bytes", url, resp.content_length)
+        metrics.count("skipped_size")
+        return True
+    if resp.content_type and resp.content_type not in content_types: # Pages without one are parsed
+        logger.debug("Skipping %s due to its content type: %s", url, resp.content_type)
+        metrics.count("skipped_content_type")
+        return True
+    return False
 
-    text_ratio = get_text_html_ratio(resp.raw_response.content) # Check the text-to-HTML ratio for content filtering
+def analyze(url, content):
+    # Everything done with a page that reads no shared state, so it can run in a
+    # pool process (crawler/process_pool.py). Returns None when the page is skipped,
+    # otherwise (fingerprint, stats delta, valid links, rejections, quality), which is
+    # small to send back compared to the page.
+    with metrics.timer("parse"):
+        page = ParsedPage(url, content) # Parse once, every step below reads from page
+    text_ratio = get_text_html_ratio(page) # Check the text-to-HTML ratio for content filtering
 
     if text_ratio < 0.05:  # Lowering the threshold temporarily for testing (discussed through peers and testing)
-        print(f"Skipping {url} due to low text-to-HTML ratio: {text_ratio}")
-        return [] #Returns an empty list if content ratio is too low 
+        logger.debug("Skipping %s due to low text-to-HTML ratio: %s", url, text_ratio)
+        return None #Returns no result if content ratio is too low 
 
-    links = extract_next_links(url, resp)# Extract and filter links using extract_next_links(). 
-    if is_valid(url): #Calls is_valid to make sure url is valid for report tracking
+    with metrics.timer("tokenize"):
+        word_counts = page.word_counts
+    fingerprint = simhash(word_counts) if word_counts else None # Checked against near_duplicates by record
+
+    links = extract_next_links(url, None, page)# Extract and filter links using extract_next_links(). 
+    delta = None
+    if url_filter.reject_reason(url) is None: # Same check as is_valid, for report tracking
 
         #Report tracking: words, longest page, unique URLS
-        current_word_count = count_words_and_update_frequencies(resp.raw_response.content)
-        update_longest_page(url, current_word_count)
-        track_unique_urls(url) # add this function to include the subdomain counter function
+        with metrics.timer("analytics"):
+            delta = CrawlStats() # Only this page, merged into analytics by record
+            current_word_count = count_words_and_update_frequencies(delta, page)
+            update_longest_page(delta, url, current_word_count)
+            track_unique_urls(delta, url) # Subdomains are counted when stats are merged
 
     valid_links = [] # Gather valid links
-    for link in links:
-        if is_valid(link): # Calls is_valid for link to append to valid_links
-            valid_links.append(link)
-        else:
-            print(f"Invalid link filtered out: {link}")
-
-    print(f"Valid links to return for {url}: {valid_links}")  # Log valid links
+    rejections = Counter() # Why the others were filtered out, added to url_filter.rejections by record
+    with metrics.timer("filter"):
+        for link in links:
+            reason = url_filter.reject_reason(link) # The rule is_valid would reject link for, None if it is valid
+            if reason is None:
+                valid_links.append(link)
+            else:
+                rejections[reason] += 1
+                logger.debug("Invalid link filtered out: %s", link)
+    quality = (text_ratio, sum(word_counts.values())) # Ranks this page's links in the frontier
+    return fingerprint, delta, valid_links, rejections, quality
+
+def record(url, result):
+    # The part of scraper that touches shared state: near duplicate check and report
+    # tracking. Always runs in the crawler process.
+    if result is None:
+        metrics.count("skipped_text_ratio")
+        forget(url)
+        return []
+    fingerprint, delta, valid_links, rejections, quality = result
+    if delta is None:
+        forget(url) # Counted before the report rules changed, if ever
+    previous = page_history.previous_words(url) if page_history is not None else None # Set when the page was counted before and changed since
+
+    with metrics.timer("near_duplicate"):
+        duplicate = fingerprint is not None and previous is None and near_duplicates.add(fingerprint) # A changed page is not a duplicate of its former self
+    if duplicate: # Calendar pages, mirrors, etc. with near identical content
+        logger.debug("Skipping %s as a near duplicate of a page already crawled.", url)
+        metrics.count("skipped_near_duplicate")
+        return [] #Drops its links and leaves it out of the report
+
+    if delta is not None:
+        if page_history is not None:
+            page_history.set_words(url, delta.word_frequencies)
+            if previous is not None:
+                delta.word_frequencies.subtract(previous) # Only what changed is added to the report, no rebuild
+        analytics.record(url, delta) # Counted when url is marked complete, committed with it
+    url_filter.count_rejections(rejections)
+    page_quality[url] = quality
+    if len(page_quality) > max_page_quality:
+        try:
+            page_quality.popitem(last=False)
+        except KeyError: # Emptied by another thread meanwhile
+            pass
+    metrics.count("links_discovered", len(valid_links) + sum(rejections.values()))
+    metrics.count("links_valid", len(valid_links))
+
+    logger.debug("Valid links to return for %s: %s", url, valid_links)  # Log valid links
     return valid_links
 
-
-def extract_next_links(url, resp):
+def forget(url):
+    # url's page changed into one the report leaves out (an error, too large, too little
+    # text). If it was counted before, it comes out of the report (its words, unique
+    # page, subdomain and longest page) and its history keeps no words, so the report
+    # matches a fresh crawl. Kept empty rather than unset, a later version is counted
+    # whole and not taken for a near duplicate of the former one.
+    previous = page_history.previous_words(url) if page_history is not None else None
+    if previous is None:
+        return
+    page_history.set_words(url, Counter())
+    delta = CrawlStats()
+    delta.word_frequencies.subtract(previous)
+    delta.removed_urls.add(normalize(url).partition("#")[0]) # As track_unique_urls keeps it
+    analytics.record(url, delta) # Counted when url is marked complete, committed with it
+
+def extract_next_links(url, resp, page=None):
     # Implementation required.
     # url: the URL that was used to get the page
     # resp.url: the actual url of the page
@@ -60,167 +169,91 @@ def extract_next_links(url, resp):
 
 
     links = [] # Gather links 
-    if resp.raw_response and resp.raw_response.content: 
-        soup = BeautifulSoup(resp.raw_response.content, "html.parser")
-        for link in soup.find_all('a', href=True): # Finding all links in page 
-            full_url = urljoin(url, link['href'])  # Use urljoin to handle relative URLs
+    if page is None and resp.content_length: # Only parse here when the caller has not already
+        page = ParsedPage(url, resp.content)
+    if page is not None:
+        for full_url in page.links: # Links are already joined with urljoin to handle relative URLs
             links.append(full_url) # Store links
-            print("Discovered URL:", full_url)
+            logger.debug("Discovered URL: %s", full_url)
     return links # Returns the links found
 
-def count_words_and_update_frequencies(content):
+def count_words_and_update_frequencies(stats, page):
     #Counts words on the page for determining the longest page and simultaneously
     #updates the word frequencies for reporting.
-    soup = BeautifulSoup(content, 'html.parser')
-    text = soup.get_text()
-
-    tokens = PartA.tokenize(text) # Uses tokenizer from A1 to look for words.
-
-    #List of stop words (could have been global, but kept it to avoid scrolling)
-    stop_words = {
-         "a", "about", "above", "after", "again", "against", "all", "am", "an", "and", "any", "are",
-         "aren't", "as", "at",
-         "be", "because", "been", "before", "being", "below", "between", "both", "but", "by",
-         "can't", "cannot", "could",
-         "couldn't", "did", "didn't", "do", "does", "doesn't", "doing", "don't", "down", "during",
-         "each", "few", "for",
-         "from", "further", "had", "hadn't", "has", "hasn't", "have", "haven't", "having", "he",
-         "he'd", "he'll", "he's",
-         "her", "here", "here's", "hers", "herself", "him", "himself", "his", "how", "how's", "i",
-         "i'd", "i'll", "i'm",
-         "i've", "if", "in", "into", "is", "isn't", "it", "it's", "its", "itself", "let's", "me",
-         "more", "most", "mustn't",
-         "my", "myself", "no", "nor", "not", "of", "off", "on", "once", "only", "or", "other",
-         "ought", "our", "ours",
-         "ourselves", "out", "over", "own", "same", "shan't", "she", "she'd", "she'll", "she's",
-         "should", "shouldn't", "so",
-         "some", "such", "than", "that", "that's", "the", "their", "theirs", "them", "themselves",
-         "then", "there", "there's",
-         "these", "they", "they'd", "they'll", "they're", "they've", "this", "those", "through",
-         "to", "too", "under",
-         "until", "up", "very", "was", "wasn't", "we", "we'd", "we'll", "we're", "we've", "were",
-         "weren't", "what", "what's",
-         "when", "when's", "where", "where's", "which", "while", "who", "who's", "whom", "why",
-         "why's", "with", "won't",
-         "would", "wouldn't", "you", "you'd", "you'll", "you're", "you've", "your", "yours",
-         "yourself", "yourselves"
-     }  
-
-
-    filtered_words = [word for word in tokens if word not in stop_words] # Makes list of words that are not stop words
-
-    word_frequencies.update(filtered_words) # Update the word frequencies counter
-
-    return len(filtered_words) # Return the total word count for the page
-
-def track_unique_urls(url):
+    word_counts = page.word_counts # Tokenizes, drops stop words and counts in one pass (utils/tokenizer.py)
+
+    stats.word_frequencies.update(word_counts) # Update the word frequencies counter
+
+    return sum(word_counts.values()) # Return the total word count for the page
+
+def track_unique_urls(stats, url):
     #Looks for unique urls based on the assignment definition of unique
 
-    parsed_url = urlparse(url) # Parse the URL to remove the fragment
-    url_without_fragment = urlunparse(parsed_url._replace(fragment="")) #removes fragments
+    canonical_url = normalize(url).partition("#")[0] # Same canonical form the frontier keys urls by (utils/canonical.py), fragment removed even with [CANONICAL] off
 
-    if url_without_fragment not in unique_urls: # Check if the URL without fragment is already tracked
-        unique_urls.add(url_without_fragment)
-        track_subdomain(parsed_url.netloc)
+    if canonical_url not in stats.unique_urls: # Check if the canonical URL is already tracked
+        stats.unique_urls.add(canonical_url) # Subdomain is counted by CrawlStats.merge
         return True  # Indicates that this was a new unique URL
     else:
         return False  # Indicates it was already in the set
 
-
-def track_subdomain(domain):
-    # Checks if subdomain is tracked or not 
-
-    if domain.endswith(".uci.edu"): # Checks if it's in UCI domain and tracks new and old suddomains
-        if domain in subdomain_counts:
-            subdomain_counts[domain] += 1
-        else:
-            subdomain_counts[domain] = 1
-
-def update_longest_page(url, word_count):
+def update_longest_page(stats, url, word_count):
     #Updates Longest Page for records 
 
-    if word_count > longest_page['word_count']: # Tracks the page with the longest word count 
-        longest_page['url'] = url
-        longest_page['word_count'] = word_count
+    if word_count > stats.longest_page['word_count']: # Tracks the page with the longest word count 
+        stats.longest_page['url'] = url
+        stats.longest_page['word_count'] = word_count
 
-def get_text_html_ratio(content):
+def get_text_html_ratio(page):
     # Gets text to HTML ration of a page 
 
-    soup = BeautifulSoup(content, 'html.parser')
-    text = soup.get_text()
-    return len(text) / len(content) if len(content) > 0 else 0 #Returns ratio if above 0. 
+    return page.text_ratio #Returns ratio if above 0. 
 
 def is_valid(url):
     # Decide whether to crawl this url or not. 
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
-
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in set(["http", "https"]): #filters schemes to match http/https 
-            print(f"Excluded {url} due to invalid scheme.")
-            return False
-
-        if "www" not in parsed.netloc: # Filters domains for "www"
-            print(f"Excluded {url} because it does not conatain 'www'.")
-            return False
-        
-        # Restrict to specified domains and paths
-        valid_domains = (".ics.uci.edu", ".cs.uci.edu", ".informatics.uci.edu", ".stat.uci.edu", "today.uci.edu")
-        
-        
-        if not any(parsed.netloc.endswith(domain) for domain in valid_domains): # Checks to see if url is in a valid domain
-            
-            if not(parsed.netloc == "today.uci.edu" and parsed.path.startswith("/department/information_computer_sciences")): #Checks if it's part of today.uci.edu/department/information_computer_sciences
-                print(f"Excluded {url} due to invalid domain.")
-                return False
-
-         # Exclude unwanted file types
-        if re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            r"|png|tiff?|mid|mp2|mp3|mp4"
-            r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            r"|epub|dll|cnf|tgz|sha1"
-            r"|thmx|mso|arff|rtf|jar|csv"
-            r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
-            print(f"Excluded {url} due to file type")
-            return False
-        
-        #Trap catcher for urls
-        trap_patterns = [r'/sort=', r'/search']
-        for pattern in trap_patterns: # Excludes URLs that may be traps 
-            if re.search(pattern, parsed.path):
-                print(f"Excluded {url} due to trap pattern: {pattern}")
-                return False
+    # The rules are declared in the [FILTER] section of config.ini and compiled
+    # once by utils/url_filter.py (domains, file types, trap patterns and trap
+    # heuristics such as repeated path segments or too many query parameters).
 
-        return True
+    return url_filter.is_valid(url)
+
+def filter_version():
+    # Changes whenever the is_valid rules change, so the frontier only re-checks
+    # pending urls on resume when it has to.
+    return url_filter.version
 
-    except TypeError:
-        print("TypeError for ", parsed)
-        raise
+def write_report(stats=None):
+    #Writes report for crawler. Safe to call at any time, workers keep running.
+    #stats: CrawlStats to report on, the merged stats of every shard for a sharded crawl.
+    if stats is None: # This crawler's own stats
+        with analytics.merged() as stats:
+            return write_report(stats)
 
-def write_report():
-    #Writes report for crawler
-    
     report_filename = "crawl_report.txt"
     with open(report_filename, "w") as report_file:
         # Unique pages found
-        report_file.write(f"Total unique pages: {len(unique_urls)}\n\n")
+        report_file.write(f"Total unique pages: {len(stats.unique_urls)}\n\n")
 
         # Longest page information
         report_file.write("Longest page:\n")
-        report_file.write(f"URL: {longest_page['url']}\n")
-        report_file.write(f"Word Count: {longest_page['word_count']}\n\n")
+        report_file.write(f"URL: {stats.longest_page['url']}\n")
+        report_file.write(f"Word Count: {stats.longest_page['word_count']}\n\n")
 
         # Most common words
         report_file.write("50 Most Common Words:\n")
-        for word, frequency in word_frequencies.most_common(50):
-            report_file.write(f"{word}: {frequency}\n")
+        words = stats.word_frequencies
+        sketched = not isinstance(words, Counter) # A SpaceSaving sketch with WORDSKETCH set, counts are estimates
+        if sketched:
+            report_file.write(f"(Estimated, {words.guaranteed(50)} of them certain to be among the 50 most common)\n")
+        for word, frequency in words.most_common(50):
+            if sketched:
+                report_file.write(f"{word}: {frequency} (at least {words.bounds(word)[0]})\n")
+            else:
+                report_file.write(f"{word}: {frequency}\n")
         report_file.write("\n")
 
         # Subdomain information
         report_file.write("Subdomains in uci.edu:\n")
-        for subdomain_info in sorted(subdomain_counts.items()):
+        for subdomain_info in sorted(stats.subdomain_counts.items()):
             report_file.write(f"{subdomain_info[0]}, {subdomain_info[1]}\n")
\ No newline at end of file
@@ -0,0 +1,37 @@
+# Shared fixtures: a synthetic site (benchmarks.site) served by the local
+# stand-in for the cache server, and crawl configs reading config.ini with a
+# save file, stats file and logs of their own in a temporary directory.
+import pytest
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.site import Site, make_config
+
+
+@pytest.fixture
+def crawl_dir(tmp_path, monkeypatch):
+    # Logs/ and crawl_report.txt are written to the working directory.
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def site():
+    return Site(2, 30, fanout=4, size=1, duplicates=0, traps=0, errors=0, binary=0)
+
+
+@pytest.fixture
+def server(site):
+    server = CacheServer(site).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def config_for(crawl_dir, server, site):
+    # config_for(**{section: {key: value}}) -> Config of a crawl of site.
+    def config_for(**options):
+        sections = {"LOGGING": {"LEVEL": "WARNING"}, "ROBOTS": {"OBEY": "False"}}
+        for section, values in options.items():
+            sections.setdefault(section, {}).update(values)
+        return make_config(str(crawl_dir), server.address, site.seeds(), 0.0, options=sections)
+    return config_for
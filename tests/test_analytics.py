@@ -0,0 +1,75 @@
+from collections import Counter
+
+from crawler.store import FrontierStore
+from utils import get_urlhash
+from utils.analytics import CrawlAnalytics, CrawlStats
+
+
+def page(url, **words):
+    delta = CrawlStats()
+    delta.unique_urls.add(url)
+    delta.word_frequencies.update(words)
+    delta.longest_page = {"url": url, "word_count": sum(words.values())}
+    return delta
+
+
+def complete(analytics, store, url, **words):
+    analytics.record(url, page(url, **words))
+    with store.atomic():
+        store[get_urlhash(url)] = (url, True)
+        analytics.complete(url)
+
+
+def reopen(tmp_path):
+    # What a crawl resumed after a crash finds: only committed writes.
+    store = FrontierStore(str(tmp_path / "frontier.db"), batch_size=1000, flush_interval=600)
+    analytics = CrawlAnalytics(str(tmp_path / "stats.pickle"), interval=600)
+    analytics.attach(store)
+    return analytics, store
+
+
+def test_stats_are_committed_with_their_completions(tmp_path):
+    analytics, store = reopen(tmp_path)
+    complete(analytics, store, "https://www.ics.uci.edu/a", crawler=2)
+    analytics.checkpoint()
+    complete(analytics, store, "https://www.ics.uci.edu/b", crawler=1, report=1)
+    store.flush()
+    # Recorded, but the crash comes before it is complete.
+    analytics.record("https://www.ics.uci.edu/c", page("https://www.ics.uci.edu/c", lost=1))
+    complete(analytics, store, "https://www.ics.uci.edu/d", uncommitted=1)
+
+    resumed, resumed_store = reopen(tmp_path)
+    with resumed.merged() as stats:
+        assert stats.unique_urls == {"https://www.ics.uci.edu/a", "https://www.ics.uci.edu/b"}
+        assert stats.word_frequencies == Counter(crawler=3, report=1)
+    assert resumed_store[get_urlhash("https://www.ics.uci.edu/b")][1]
+    assert get_urlhash("https://www.ics.uci.edu/d") not in resumed_store
+    # Saved again, the journal rows it holds are dropped and not merged twice.
+    resumed.checkpoint()
+    assert resumed_store.stats_after(0) == []
+    again, _ = reopen(tmp_path)
+    with again.merged() as stats:
+        assert stats.word_frequencies == Counter(crawler=3, report=1)
+
+
+def test_removed_pages_leave_the_report_and_its_replay(tmp_path):
+    analytics, store = reopen(tmp_path)
+    a, b = "https://www.ics.uci.edu/a", "https://www.ics.uci.edu/b"
+    complete(analytics, store, a, crawler=2, report=1)
+    complete(analytics, store, b, crawler=1)
+    # a turned into a 404 before its stats were merged into the snapshot.
+    removal = CrawlStats()
+    removal.word_frequencies.update(crawler=-2, report=-1)
+    removal.removed_urls.add(a)
+    analytics.record(a, removal)
+    with store.atomic():
+        store[get_urlhash(a)] = (a, True)
+        analytics.complete(a)
+    store.flush()
+
+    for stats_of in (analytics, reopen(tmp_path)[0]): # Live, and replayed from the journal
+        with stats_of.merged() as stats:
+            assert stats.unique_urls == {b}
+            assert stats.subdomain_counts == {"www.ics.uci.edu": 1}
+            assert stats.word_frequencies == Counter(crawler=1)
+            assert stats.longest_page == {"url": None, "word_count": 0}
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+from benchmarks.cache_server import CacheServer
+from crawler import AsyncCrawler
+from crawler.page_store import PageStore
+from crawler.worker import Worker
+from utils import get_urlhash
+from utils.async_download import AsyncCacheClient
+
+from tests.test_worker import crawl
+
+
+async def serve(handler):
+    # Stand-in cache server answering every connection with handler.
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[:2]
+
+
+async def never_answers(reader, writer):
+    await reader.read() # Until the client gives up
+    writer.close()
+
+
+async def hangs_up(reader, writer):
+    await reader.readuntil(b"\r\n\r\n")
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\ncut short")
+    await writer.drain()
+    writer.close()
+
+
+async def garbled(reader, writer):
+    await reader.readuntil(b"\r\n\r\n")
+    writer.write(b"HTTP/1.1 OK\r\n\r\n")
+    await writer.drain()
+    writer.close()
+
+
+def test_transport_errors_give_error_responses(config_for, server, site, crawl_dir):
+    config = config_for()
+
+    async def download(address):
+        config.cache_server = address
+        client = AsyncCacheClient(config, timeout=0.5)
+        try:
+            return await client.download(site.seeds()[0])
+        finally:
+            await client.close()
+
+    async def main():
+        responses = dict()
+        for handler in (never_answers, hangs_up, garbled):
+            stand_in, address = await serve(handler)
+            start = time.monotonic()
+            responses[handler.__name__] = await download(address), time.monotonic() - start
+            stand_in.close()
+        stand_in, address = await serve(hangs_up)
+        stand_in.close()
+        await stand_in.wait_closed()
+        responses["refused"] = await download(address), 0.0
+        responses["working"] = await download(server.address), 0.0
+        return responses
+
+    responses = asyncio.run(main())
+    for name in ("never_answers", "hangs_up", "garbled", "refused"):
+        response, elapsed = responses[name]
+        assert response.status is None and response.error, name
+        assert elapsed < 5, name
+    assert responses["working"][0].status == 200
+
+    # Stored with PAGESTORE, as Worker.process does, and read back as such.
+    store = PageStore(str(crawl_dir / "pages"))
+    for name, (response, _) in responses.items():
+        store.add(f"https://www.ics.uci.edu/{name}", response)
+    for name, (response, _) in responses.items():
+        assert store.get(f"https://www.ics.uci.edu/{name}").status == response.status
+    store.close()
+
+
+def test_async_crawl_survives_a_timeout_and_parses_off_the_loop(config_for, site, monkeypatch):
+    slow = f"https://{site.hosts[0]}/3"
+
+    def pages(url):
+        if url == slow:
+            time.sleep(2)
+        return site(url)
+
+    stand_in = CacheServer(pages).start()
+    loop_threads, parse_threads = set(), set()
+    process = Worker.process
+
+    def recording(self, tbd_url, resp):
+        parse_threads.add(threading.get_ident())
+        return process(self, tbd_url, resp)
+
+    def start(self):
+        loop_threads.add(threading.get_ident())
+        return asyncio.run(self._crawl())
+
+    monkeypatch.setattr(Worker, "process", recording)
+    monkeypatch.setattr(AsyncCrawler, "start", start)
+    try:
+        config = config_for(CONNECTION={"ENGINE": "async", "TIMEOUT": "0.5"},
+                            **{"LOCAL PROPERTIES": {"PROCESSES": "0"}})
+        config.cache_server = stand_in.address
+        crawler = AsyncCrawler(config, True)
+        assert crawl(crawler), "crawl hung after the timed out download"
+    finally:
+        stand_in.stop()
+    save = crawler.frontier.save
+    assert save[get_urlhash(slow)] == (slow, True)
+    assert all(completed for _, completed in save.values())
+    assert len(save) >= len(site.hosts) * site.pages - site.pages
+    assert parse_threads and not parse_threads & loop_threads
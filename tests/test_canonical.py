@@ -0,0 +1,26 @@
+import pytest
+
+from utils.canonical import UrlCanonicalizer
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://WWW.ICS.UCI.EDU:443/a/#top", "https://www.ics.uci.edu/a"),
+    ("https://www.ics.uci.edu/%7ejoe/a%2fb", "https://www.ics.uci.edu/~joe/a%2Fb"),
+    ("https://www.ics.uci.edu/a?utm_source=feed&b=2&a=1", "https://www.ics.uci.edu/a?a=1&b=2"),
+    ("https://www.ics.uci.edu/a;jsessionid=12/b", "https://www.ics.uci.edu/a/b"),
+    ("https://www.ics.uci.edu/a/index.html", "https://www.ics.uci.edu/a"),
+    # An index page with a query is a page of its own.
+    ("https://www.ics.uci.edu/a/index.php?page=2", "https://www.ics.uci.edu/a/index.php?page=2"),
+    ("https://www.ics.uci.edu/a/index.php?utm_medium=rss", "https://www.ics.uci.edu/a"),
+    # sid picks content on some sites, it is only dropped where listed.
+    ("https://www.ics.uci.edu/show?sid=42", "https://www.ics.uci.edu/show?sid=42"),
+])
+def test_canonical_form(url, expected):
+    assert UrlCanonicalizer().canonicalize(url) == expected
+
+
+def test_host_params_apply_to_the_host_and_its_subdomains():
+    canonicalizer = UrlCanonicalizer(host_params={"ics.uci.edu": ["sid"]})
+    assert canonicalizer.canonicalize("https://ics.uci.edu/a?sid=1") == "https://ics.uci.edu/a"
+    assert canonicalizer.canonicalize("https://wiki.ics.uci.edu/a?sid=1") == "https://wiki.ics.uci.edu/a"
+    assert canonicalizer.canonicalize("https://cs.uci.edu/a?sid=1") == "https://cs.uci.edu/a?sid=1"
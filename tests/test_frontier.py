@@ -0,0 +1,29 @@
+from crawler import Crawler
+from crawler.frontier import Frontier
+from crawler.store import FrontierStore
+
+from tests.test_worker import crawl
+
+
+def test_resumed_frontier_learns_known_urls_lazily(config_for, site, monkeypatch):
+    crawler = Crawler(config_for(), True)
+    assert crawl(crawler)
+    known = len(crawler.frontier.save)
+
+    def urlhashes(self):
+        raise AssertionError("the save file was read whole on startup")
+
+    monkeypatch.setattr(FrontierStore, "urlhashes", urlhashes)
+    frontier = Frontier(config_for(), False)
+    try:
+        assert len(frontier.seen) == 0 and frontier.to_be_downloaded.size == 0
+        frontier.add_url(f"https://{site.hosts[0]}/3")
+        assert len(frontier.seen) == 1 and frontier.to_be_downloaded.size == 0
+        frontier.add_url(f"https://{site.hosts[0]}/3")
+        assert len(frontier.seen) == 1
+        frontier.add_url(f"https://{site.hosts[0]}/new")
+        assert frontier.to_be_downloaded.size == 1
+        assert len(frontier.save) == known + 1
+    finally:
+        frontier.save.close()
+        frontier.close()
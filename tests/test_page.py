@@ -0,0 +1,55 @@
+from urllib.parse import urljoin
+
+import pytest
+
+import scraper
+import utils.page
+from benchmarks.site import Site, old_counts, old_pipeline
+from utils.page import PARSERS, ParsedPage
+
+PAGE = (b"<html><head><title>Crawler report</title><style>p {color: red}</style>"
+        b"<script>var crawler = 'skipped';</script></head><body>"
+        b"<!-- a comment, not text --><p>Words &amp; more words, caf\xc3\xa9 l'\xc3\xa9t\xc3\xa9</p>"
+        b"<a href=\"../up\">up</a> <a href=\"/root#frag\">root</a> <a>no href</a>"
+        b"<a href=\"https://www.ics.uci.edu/abs\">abs</a><a href=\"\">self</a></body></html>")
+URL = "https://www.ics.uci.edu/a/b/page"
+
+
+def pages():
+    # No aliases: their bare "&lang=" in link text reads as the entity &lang;
+    # to html.parser only.
+    site = Site(1, 10, fanout=6, size=2, duplicates=0, traps=2, errors=0, binary=0)
+    result = [(URL, PAGE)]
+    for number in range(site.pages):
+        url = f"https://{site.hosts[0]}/{number}"
+        status, content, _ = site(url)
+        if status == 200:
+            result.append((url, content))
+    return result
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_parsers_agree_with_the_old_pipeline(parser):
+    for url, content in pages():
+        _, hrefs, tokens = old_pipeline(url, content)
+        page = ParsedPage(url, memoryview(content), parser)
+        assert page.links == [urljoin(url, href) for href in hrefs]
+        assert page.word_counts == old_counts(" ".join(tokens))
+        assert page.content_length == len(content)
+
+
+def test_analyze_parses_each_page_once(monkeypatch):
+    parses = []
+
+    class CountingSoup(utils.page.BeautifulSoup):
+        def __init__(self, *args, **kwargs):
+            parses.append(args[0])
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(utils.page, "BeautifulSoup", CountingSoup)
+    monkeypatch.setattr(utils.page, "parser_backend", "html.parser")
+    fingerprint, delta, links, rejections, quality = scraper.analyze(URL, PAGE)
+    assert len(parses) == 1
+    assert len(links) == 4
+    assert delta.word_frequencies["crawler"] == 1 # The script's is not text
+    assert quality[1] == sum(delta.word_frequencies.values())
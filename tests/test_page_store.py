@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from crawler.page_store import PageStore
+
+
+def response(status, content, content_type="text/html"):
+    return SimpleNamespace(status=status, content=content, content_length=len(content),
+                           content_type=content_type)
+
+
+def test_pages_survive_a_reopen_and_the_latest_wins(tmp_path):
+    path = str(tmp_path / "pages")
+    store = PageStore(path, segment_size=300)
+    for number in range(20):
+        store.add(f"https://www.ics.uci.edu/{number}", response(200, b"page %d " % number * 20))
+    store.add("https://www.ics.uci.edu/3", response(404, b"gone", "text/plain"))
+    store.add("https://www.ics.uci.edu/big", response(70000, b""))
+    store.close()
+
+    store = PageStore(path, segment_size=300)
+    assert len(store) == 21 and len(store.segments) > 1
+    page = store.get("https://www.ics.uci.edu/7")
+    assert page.status == 200 and page.content.tobytes() == b"page 7 " * 20
+    page = store.get("https://www.ics.uci.edu/3")
+    assert (page.status, page.content.tobytes(), page.content_type) == (404, b"gone", "text/plain")
+    assert store.get("https://www.ics.uci.edu/20") is None
+    assert store.get("https://www.ics.uci.edu/big").status is None # Does not fit the field
+    store.close()
+
+
+def test_remove_keeps_files_that_are_not_the_stores(tmp_path):
+    store = PageStore(str(tmp_path), segment_size=300)
+    for number in range(20):
+        store.add(f"https://www.ics.uci.edu/{number}", response(200, b"x" * 200))
+    store.close()
+    (tmp_path / "notes.txt").write_text("keep me")
+    (tmp_path / "backup.seg").write_text("keep me too")
+    PageStore.remove(str(tmp_path))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["backup.seg", "notes.txt"]
+
+    own = tmp_path / "pages"
+    PageStore(str(own)).close()
+    PageStore.remove(str(own))
+    assert not own.exists()
@@ -0,0 +1,169 @@
+import heapq
+
+import pytest
+
+from crawler import rate_control
+from crawler.rate_control import HostRateController, is_failure
+from crawler.scheduler import HostScheduler, get_host
+
+HOST = "www.ics.uci.edu"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # time.monotonic() of the controller, moved by hand.
+    now = [1000.0]
+    monkeypatch.setattr(rate_control.time, "monotonic", lambda: now[0])
+    return now
+
+
+def controller(**options):
+    settings = dict(max_delay=60.0, target_latency=2.0, backoff=2.0, recovery=0.5,
+                    quarantine_after=3, quarantine=10.0, give_up_after=2)
+    settings.update(options)
+    return HostRateController(1.0, **settings)
+
+
+def test_backoff_and_recovery(clock):
+    rates = controller()
+    rates.observe(HOST, 200, 0.1)
+    assert rates.next_fetch(HOST, clock[0]) == clock[0] + 1.0
+    rates.observe(HOST, 200, 3.0) # Slower than target_latency
+    assert rates.describe(HOST)["delay_s"] == 6.0
+    rates.observe(HOST, 503, 0.1) # A single failure is let through
+    assert rates.describe(HOST)["delay_s"] == 6.0
+    rates.observe(HOST, 503, 0.1)
+    assert rates.describe(HOST)["delay_s"] == 12.0
+    rates.observe(HOST, 200, 0.1) # 1 / 12 + 0.5 requests/s
+    assert rates.describe(HOST)["delay_s"] == pytest.approx(1 / (1 / 12 + 0.5), abs=1e-3)
+    for _ in range(5):
+        rates.observe(HOST, 200, 0.1)
+    assert rates.describe(HOST)["delay_s"] == 1.0 # Never below POLITENESS
+    rates = controller(quarantine_after=100)
+    for _ in range(10):
+        rates.observe(HOST, 503, 0.1)
+    assert rates.describe(HOST)["delay_s"] == 60.0 # max_delay
+
+
+def test_quarantine_then_give_up(clock):
+    rates = controller()
+    for _ in range(3):
+        rates.observe(HOST, 600, 0.1)
+    assert rates.describe(HOST)["quarantined_s"] == 10.0
+    assert rates.next_fetch(HOST, clock[0]) == clock[0] + 10.0
+    assert not rates.describe(HOST)["given_up"]
+
+    clock[0] += 10.0
+    for _ in range(3):
+        rates.observe(HOST, 429, 0.1)
+    # The second quarantine in a row, give_up_after: dropped at once.
+    assert rates.describe(HOST)["given_up"]
+    assert rates.next_fetch(HOST, clock[0]) is None
+    assert rates.snapshot()["given_up"] == 1
+
+
+def test_success_ends_a_run_of_quarantines(clock):
+    rates = controller()
+    for _ in range(3):
+        rates.observe(HOST, 500, 0.1)
+    clock[0] += 10.0
+    rates.observe(HOST, 200, 0.1)
+    for _ in range(3):
+        rates.observe(HOST, 500, 0.1)
+    assert not rates.describe(HOST)["given_up"]
+    assert rates.next_fetch(HOST, clock[0]) == clock[0] + 10.0 # Not doubled
+
+
+def test_zero_never_gives_up(clock):
+    rates = controller(give_up_after=0)
+    for _ in range(30):
+        rates.observe(HOST, 500, 0.1)
+    assert rates.next_fetch(HOST, clock[0]) is not None
+
+
+class Simulation(object):
+    # A crawl of simulated hosts on the clock fixture, in one thread: `workers`
+    # downloads at a time, taken from a HostScheduler and reported to its
+    # controller as they end. Waiting in the scheduler moves the clock to the
+    # next download to end, or to when a host may be fetched.
+    # kind -> (hosts, latency, status); fragile hosts fail past 5 requests/s.
+    KINDS = {"fast": (6, 0.005, 200), "slow": (2, 0.15, 200),
+             "fragile": (3, 0.02, 200), "dead": (3, 0.3, 603)}
+
+    def __init__(self, clock, scheduler, workers):
+        self.clock = clock
+        self.scheduler = scheduler
+        self.workers = workers
+        self.downloads = list() # heap of (end, url, status, latency)
+        self.requests = dict() # host -> start of every request
+        self.ok = 0
+        scheduler.condition = self
+        for kind, (count, _, _) in self.KINDS.items():
+            for number in range(count):
+                for page in range(500):
+                    scheduler.add(f"https://www{number}.{kind}.uci.edu/{page}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def notify(self, n=1):
+        pass
+
+    def notify_all(self):
+        pass
+
+    def wait(self, timeout=None):
+        if self.downloads and (timeout is None or self.downloads[0][0] <= self.clock[0] + timeout):
+            self._finish()
+        else:
+            self.clock[0] += timeout
+
+    def run(self, seconds):
+        end = self.clock[0] + seconds
+        while self.clock[0] < end:
+            if len(self.downloads) == self.workers:
+                self._finish()
+                continue
+            url = self.scheduler.get()
+            if url is None:
+                break
+            host = get_host(url)
+            kind = host.split(".")[1]
+            _, latency, status = self.KINDS[kind]
+            starts = self.requests.setdefault(host, [])
+            starts.append(self.clock[0])
+            if kind == "fragile" and sum(1 for start in starts[-6:] if self.clock[0] - start < 1) > 5:
+                status = 503
+            heapq.heappush(self.downloads, (self.clock[0] + latency, url, status, latency))
+        return self.ok / seconds
+
+    def _finish(self):
+        end, url, status, latency = heapq.heappop(self.downloads)
+        self.clock[0] = max(self.clock[0], end)
+        if self.scheduler.rates is not None:
+            self.scheduler.rates.observe(get_host(url), status, latency)
+        self.ok += not is_failure(status)
+        self.scheduler.done(url)
+
+    def least_gap(self):
+        return min(after - before for starts in self.requests.values()
+                   for before, after in zip(starts, starts[1:]))
+
+
+def test_adaptive_rates_crawl_faster_and_stay_polite(clock):
+    politeness = 0.05
+    fixed = Simulation(clock, HostScheduler(politeness), workers=4)
+    fixed_rate = fixed.run(20)
+    rates = HostRateController(politeness, max_delay=2.0, target_latency=0.1, recovery=2.0,
+                               quarantine=1.0)
+    adaptive = Simulation(clock, HostScheduler(politeness, rates), workers=4)
+    adaptive_rate = adaptive.run(20)
+    assert adaptive_rate > 1.2 * fixed_rate
+    assert fixed.least_gap() >= politeness and adaptive.least_gap() >= politeness
+    # Workers are not held up by hosts that only fail.
+    dead = [host for host in fixed.requests if ".dead." in host]
+    assert (sum(len(adaptive.requests[host]) for host in dead)
+            < sum(len(fixed.requests[host]) for host in dead) / 2)
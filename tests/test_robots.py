@@ -0,0 +1,31 @@
+import pytest
+
+from crawler.robots import RobotsRules
+
+AGENT = "IR F19 69889948,14002250"
+ROBOTS = ("User-agent: bot\nDisallow: /bot/\n\n"
+          "User-agent: {name}\nUser-agent: other\nDisallow: /ours/\nCrawl-delay: 2\n\n"
+          "User-agent: *\nDisallow: /all/\n")
+
+
+@pytest.mark.parametrize("name", ["IR", "ir", "iR"])
+def test_group_naming_our_product_token_applies(name):
+    rules = RobotsRules.parse(ROBOTS.format(name=name), AGENT)
+    assert not rules.allowed("/ours/page")
+    assert rules.allowed("/all/page") and rules.allowed("/bot/page")
+    assert rules.crawl_delay == 2.0
+
+
+@pytest.mark.parametrize("name", ["IR F19", "I", "IRbot", "F19", "69889948"])
+def test_other_groups_fall_back_to_the_star_group(name):
+    # Names holding, or held in, our user agent do not name it.
+    rules = RobotsRules.parse(ROBOTS.format(name=name), AGENT)
+    assert not rules.allowed("/all/page")
+    assert rules.allowed("/ours/page") and rules.allowed("/bot/page")
+    assert rules.crawl_delay is None
+
+
+def test_product_token_ends_at_the_version():
+    rules = RobotsRules.parse(ROBOTS.format(name="IRbot"), "IRbot/1.0 (+https://www.ics.uci.edu)")
+    assert not rules.allowed("/ours/page")
+    assert rules.allowed("/bot/page") # "bot" is in the agent, but does not name it
@@ -0,0 +1,63 @@
+import pickle
+import zlib
+from collections import Counter
+
+import cbor
+import pytest
+
+import scraper
+from benchmarks.cache_server import encode_response
+from crawler.recrawl import PageHistory
+from crawler.store import FrontierStore
+from utils import get_urlhash
+from utils.analytics import CrawlAnalytics
+from utils.response import Response
+from utils.simhash import SimHashIndex
+
+URL = "https://www.ics.uci.edu/page"
+PAGE = b"<html><body><p>crawler report crawler</p></body></html>"
+
+
+@pytest.fixture
+def crawl(tmp_path, monkeypatch):
+    # fetch(status, content) -> the report (word counts, unique pages,
+    # subdomains, longest page) once URL is fetched and marked complete
+    # again, as the worker and frontier do on a recrawl.
+    store = FrontierStore(str(tmp_path / "frontier.db"))
+    history = PageHistory(store, min_interval=0.0)
+    analytics = CrawlAnalytics(str(tmp_path / "stats.pickle"))
+    analytics.attach(store)
+    monkeypatch.setattr(scraper, "page_history", history)
+    monkeypatch.setattr(scraper, "analytics", analytics)
+    monkeypatch.setattr(scraper, "near_duplicates", SimHashIndex())
+
+    def fetch(status, content):
+        resp = Response(cbor.loads(encode_response(URL, status, content)))
+        if history.observe(URL, resp):
+            scraper.scraper(URL, resp)
+        with store.atomic():
+            store[get_urlhash(URL)] = (URL, True)
+            history.done(URL)
+            analytics.complete(URL)
+        with analytics.merged() as stats:
+            return (+Counter(dict(stats.word_frequencies.items())), set(stats.unique_urls),
+                    dict(stats.subdomain_counts), dict(stats.longest_page))
+    fetch.store = store
+    yield fetch
+    store.close()
+
+
+@pytest.mark.parametrize("status, content", [
+    (404, b"gone"),
+    (200, b"<html>" + b"<div></div>" * 1000 + b"<p>crawler</p></html>"), # Too little text
+], ids=["404", "text ratio"])
+def test_page_no_longer_counted_leaves_the_report(crawl, status, content):
+    counted = (Counter(crawler=2, report=1), {URL}, {"www.ics.uci.edu": 1},
+               {"url": URL, "word_count": 3})
+    assert crawl(200, PAGE) == counted
+    # As a fresh crawl would report it: no pages at all.
+    assert crawl(status, content) == (Counter(), set(), {}, {"url": None, "word_count": 0})
+    words = crawl.store.get_page(get_urlhash(URL)).words
+    assert pickle.loads(zlib.decompress(words)) == {} # Its history holds none either
+    # Back with content, it is counted once, like a new page.
+    assert crawl(200, PAGE) == counted
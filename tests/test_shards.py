@@ -0,0 +1,70 @@
+import pickle
+from multiprocessing import active_children, get_context
+from threading import Thread
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.site import Site, politeness_violations, run_single, sharded_crawl
+from crawler.shards import shard_of
+
+POLITENESS = 0.05
+
+
+def run(target, *args, timeout=180):
+    # target(*args) on a thread, with its spawned processes killed if it is
+    # still running after timeout seconds, so a stuck shard fails the test.
+    result = []
+    thread = Thread(target=lambda: result.append(target(*args)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        for process in active_children():
+            process.kill()
+        raise AssertionError(f"{target.__name__} still running after {timeout} s")
+    return result[0] if result else None
+
+
+def single_crawl(context, directory, server, site):
+    process = context.Process(target=run_single, args=(
+        str(directory), server.address, site.seeds(), POLITENESS))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    with open(directory / "merged_stats.pickle", "rb") as stats_file:
+        return pickle.load(stats_file)
+
+
+def test_hosts_have_one_shard():
+    urls = [f"https://www{host}.ics.uci.edu/{page}" for host in range(20) for page in range(5)]
+    owners = {}
+    for url in urls:
+        host = url.split("/")[2]
+        assert owners.setdefault(host, shard_of(url, 3)) == shard_of(url, 3)
+    assert set(owners.values()) == {0, 1, 2}
+
+
+def test_sharded_crawl_matches_one_process(tmp_path):
+    # No duplicates or traps: which copy is kept would depend on the order
+    # the shards fetch them in.
+    site = Site(4, 80, fanout=4, size=1, duplicates=0, traps=0)
+    server = CacheServer(site, latency=0.005).start()
+    context = get_context("spawn")
+    try:
+        (tmp_path / "single").mkdir()
+        single = run(single_crawl, context, tmp_path / "single", server, site)
+        for stop_shard in (None, 0):
+            directory = tmp_path / f"shards-{stop_shard}"
+            directory.mkdir()
+            server.requests.clear()
+            sharded = run(sharded_crawl, context, str(directory), server, site,
+                          POLITENESS, 2, stop_shard)
+            # The killed shard resumes from its save file, with the stats of
+            # every page it completed.
+            assert sharded.unique_urls == single.unique_urls, stop_shard
+            assert sharded.word_frequencies == single.word_frequencies, stop_shard
+            assert politeness_violations(server.requests, POLITENESS) == 0, stop_shard
+            if stop_shard is None:
+                # Every page fetched once, by the shard owning its host.
+                urls = [url for _, url in server.requests]
+                assert len(urls) == len(set(urls))
+    finally:
+        server.stop()
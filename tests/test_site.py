@@ -0,0 +1,62 @@
+import re
+from multiprocessing import get_context
+from urllib.parse import quote
+from urllib.request import urlopen
+
+import cbor
+
+from benchmarks import run_crawl
+from benchmarks.site import Site
+from utils.response import Response
+
+_HREF = re.compile(rb'href="([^"]+)"')
+
+
+def test_site_is_deterministic_and_reachable_from_its_seeds():
+    site = Site(2, 40, fanout=4, size=1, duplicates=0.2, traps=0, errors=0, binary=0)
+    again = Site(2, 40, fanout=4, size=1, duplicates=0.2, traps=0, errors=0, binary=0)
+    seen, queue = set(), list(site.seeds())
+    while queue:
+        url = queue.pop()
+        if url in seen:
+            continue
+        seen.add(url)
+        status, content, content_type = site(url)
+        assert (status, content, content_type) == again(url)
+        if status == 200:
+            queue.extend(link.decode("utf-8") for link in _HREF.findall(content))
+    pages = {f"https://{host}/{number}" for host in site.hosts for number in range(site.pages)}
+    assert pages <= seen
+    assert all(site(url)[0] == 404 for url in seen - pages)
+
+
+def test_site_serves_its_shares_of_errors_and_binaries():
+    site = Site(1, 2000, errors=0.1, binary=0.05)
+    responses = [site(f"https://{site.hosts[0]}/{number}") for number in range(site.pages)]
+    errors = sum(status != 200 for status, _, _ in responses)
+    binaries = sum(content_type != "text/html" for status, _, content_type in responses
+                   if status == 200)
+    assert 150 < errors < 250
+    assert 60 < binaries < 140
+
+
+def test_cache_server_serves_the_site(server, site):
+    url = site.seeds()[0]
+    host, port = server.address
+    with urlopen(f"http://{host}:{port}/?q={quote(url)}") as answer:
+        resp = Response(cbor.loads(answer.read()))
+    status, content, content_type = site(url)
+    assert (resp.status, bytes(resp.content), resp.content_type) == (status, content, content_type)
+    assert [requested for _, requested in server.requests] == [url]
+
+
+def test_run_crawl_fetches_every_page_once(server, site):
+    result = run_crawl.run(get_context("spawn"), server, site, 0.0, "threads", 4, 0)
+    pages = len(site.hosts) * site.pages
+    assert result["unique_pages"] == pages
+    # robots.txt once per host, then every page once. The last page of each
+    # host links to one past it, a 404.
+    fetched = [url for _, url in server.requests if not url.endswith("/robots.txt")]
+    assert len(server.requests) - len(fetched) == len(site.hosts)
+    assert result["pages"] == len(fetched) == len(set(fetched)) == pages + len(site.hosts)
+    assert result["frontier_writes"] > 0 and result["cpu_s"] > 0
@@ -0,0 +1,93 @@
+import pickle
+from collections import Counter
+from threading import Thread
+
+from benchmarks.site import word_corpus
+from utils.analytics import CrawlAnalytics, CrawlStats
+from utils.sketch import SpaceSaving
+
+
+def counted(pages, capacity, workers=4, checkpoint=1000):
+    # Snapshot of pages counted as in a crawl: exact per worker accumulators
+    # merged into a sketch of capacity words, pickled at every checkpoint.
+    snapshot = CrawlStats(capacity)
+    accumulators = [CrawlStats() for _ in range(workers)]
+    for number, words in enumerate(pages, 1):
+        accumulators[number % workers].word_frequencies.update(words)
+        if number % checkpoint == 0 or number == len(pages):
+            for index, accumulator in enumerate(accumulators):
+                snapshot.merge(accumulator)
+                accumulators[index] = CrawlStats()
+            snapshot = pickle.loads(pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL))
+    return snapshot
+
+
+def test_sketch_finds_the_top_words_within_its_bounds():
+    pages = word_corpus(3000)
+    exact = Counter()
+    for words in pages:
+        exact.update(words)
+    sketch = counted(pages, 500).word_frequencies
+    assert len(sketch) <= 2 * 500
+
+    top = sketch.most_common(50)
+    assert {word for word, _ in top} == {word for word, _ in exact.most_common(50)}
+    for word, count in top:
+        assert abs(count - exact[word]) <= 0.02 * exact[word]
+    assert sketch.guaranteed(50) >= 40
+    for word, count in exact.items():
+        lowest, highest = sketch.bounds(word)
+        assert lowest <= count <= highest, word
+
+
+def test_bounds_hold_when_pages_lose_words():
+    pages = word_corpus(600)
+    exact = Counter()
+    sketch = SpaceSaving(50)
+    for words in pages:
+        exact.update(words)
+        sketch.update(words)
+    # Recrawled pages that lost their words, as scraper.record subtracts them.
+    for words in pages[::3]:
+        removed = Counter({word: -count for word, count in words.items()})
+        exact.update(removed)
+        sketch.update(removed)
+    for word, count in exact.items():
+        lowest, highest = sketch.bounds(word)
+        assert lowest <= count <= highest, word
+
+
+def count_on_threads(analytics, *batches):
+    # Records each (pages, sign) batch on a thread of its own, so on an
+    # accumulator of its own, as a page recrawled by another worker would be.
+    # Returns the exact counts.
+    exact = Counter()
+
+    def count(pages, sign):
+        for words in pages:
+            delta = CrawlStats()
+            delta.word_frequencies.update({word: sign * n for word, n in words.items()})
+            exact.update(delta.word_frequencies)
+            analytics.record(None, delta)
+
+    for pages, sign in batches:
+        thread = Thread(target=count, args=(pages, sign))
+        thread.start()
+        thread.join()
+    return exact
+
+
+def test_analytics_sketch_takes_subtractions_from_other_threads():
+    analytics = CrawlAnalytics(word_capacity=50)
+    count_on_threads(analytics, ([Counter(x=10)], 1), ([Counter(x=5)], -1))
+    with analytics.merged() as stats:
+        assert stats.word_frequencies["x"] == 5
+        assert stats.word_frequencies.bounds("x") == (5, 5)
+
+    analytics = CrawlAnalytics(word_capacity=50)
+    pages = word_corpus(300)
+    exact = count_on_threads(analytics, (pages, 1), (pages[::3], -1))
+    with analytics.merged() as stats:
+        for word, true in exact.items():
+            lowest, highest = stats.word_frequencies.bounds(word)
+            assert lowest <= true <= highest, word
@@ -0,0 +1,29 @@
+import random
+
+from crawler.spill import SpillRuns
+
+
+def test_runs_merge_best_first(tmp_path):
+    rng = random.Random(0)
+    runs = SpillRuns(str(tmp_path / "spill"))
+    entries = []
+    for run in range(40): # More than _MAX_RUNS, so runs get compacted
+        batch = sorted((rng.random(), run, f"https://www.ics.uci.edu/{run}/{index}")
+                       for index in range(25))
+        runs.write(batch)
+        entries.extend(batch)
+    assert len(runs) == len(entries)
+    popped = [runs.pop() for _ in range(len(entries))]
+    assert popped == sorted(entries)
+    runs.close()
+    assert not (tmp_path / "spill").exists()
+
+
+def test_only_run_files_are_deleted(tmp_path):
+    (tmp_path / "notes.txt").write_text("keep me")
+    (tmp_path / "000007.run").write_bytes(b"left by a crash")
+    runs = SpillRuns(str(tmp_path))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["notes.txt"]
+    runs.write([(1.0, 0, "https://www.ics.uci.edu/a")])
+    runs.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["notes.txt"]
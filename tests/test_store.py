@@ -0,0 +1,118 @@
+import os
+import shelve
+import signal
+import sqlite3
+import sys
+import time
+from multiprocessing import get_context
+
+import pytest
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.site import Site, make_config
+from crawler.store import FrontierStore, COMPLETE, PENDING
+
+# One batch takes many pages to fill and never times out, so a kill always
+# lands in the middle of one.
+OPTIONS = {"LOGGING": {"LEVEL": "WARNING"}, "ROBOTS": {"OBEY": "False"},
+           "LOCAL PROPERTIES": {"FLUSHBATCH": "40", "FLUSHINTERVAL": "600"}}
+
+
+def crawl(directory, cache_server, seeds, restart):
+    os.chdir(directory)
+    sys.stdout = open(os.devnull, "w")
+    from crawler import Crawler
+    config = make_config(directory, cache_server, seeds, 0.0, options=OPTIONS)
+    Crawler(config, restart).start()
+
+
+def committed(path):
+    # urlhash -> (url, state) as committed, read like a crash would leave it.
+    connection = sqlite3.connect(path)
+    try:
+        return {urlhash: (url, state) for urlhash, url, state in connection.execute(
+            "SELECT urlhash, url, completed FROM urls")}
+    except sqlite3.OperationalError: # Tables not created yet
+        return {}
+    finally:
+        connection.close()
+
+
+def run(context, target, args):
+    process = context.Process(target=target, args=args)
+    process.start()
+    return process
+
+
+def test_killed_crawl_resumes_from_its_last_batch(tmp_path, monkeypatch):
+    site = Site(2, 120, fanout=4, size=1, duplicates=0, traps=0, errors=0, binary=0)
+    server = CacheServer(site, latency=0.003).start()
+    context = get_context("spawn")
+    killed, fresh = tmp_path / "killed", tmp_path / "fresh"
+    killed.mkdir()
+    fresh.mkdir()
+    try:
+        process = run(context, crawl, (str(killed), server.address, site.seeds(), True))
+        path = str(killed / "frontier.db")
+        deadline = time.monotonic() + 60
+        while sum(state == COMPLETE for _, state in committed(path).values()) < 80:
+            assert process.is_alive() and time.monotonic() < deadline, "crawl ended before the kill"
+            time.sleep(0.01)
+        os.kill(process.pid, signal.SIGKILL)
+        process.join()
+        before = committed(path)
+        pending = {url for url, state in before.values() if state == PENDING}
+        assert 0 < len(pending) and len(pending) < len(before)
+
+        # Resumed, the frontier queues exactly what was committed as pending.
+        monkeypatch.chdir(killed)
+        from crawler.frontier import Frontier
+        frontier = Frontier(make_config(str(killed), server.address, site.seeds(), 0.0,
+                                        options=OPTIONS), False)
+        queued = set()
+        while frontier.to_be_downloaded.size:
+            url = frontier.to_be_downloaded.get()
+            queued.add(url)
+            frontier.to_be_downloaded.done(url, fetched=False)
+        frontier.save.close()
+        frontier.close()
+        assert queued == pending
+
+        # And completes the same urls as a crawl that was never killed.
+        for directory, restart in ((killed, False), (fresh, True)):
+            process = run(context, crawl, (str(directory), server.address, site.seeds(), restart))
+            process.join(120)
+            assert process.exitcode == 0
+    finally:
+        server.stop()
+    resumed, uninterrupted = committed(path), committed(str(fresh / "frontier.db"))
+    assert not any(state == PENDING for _, state in resumed.values())
+    assert ({url for url, state in resumed.values() if state == COMPLETE}
+            == {url for url, state in uninterrupted.values() if state == COMPLETE})
+
+
+def test_shelve_save_file_is_refused_with_a_hint(tmp_path):
+    path = str(tmp_path / "frontier.shelve")
+    with shelve.open(path) as old:
+        old["a" * 64] = ("https://www.ics.uci.edu/a", True)
+    with pytest.raises(RuntimeError, match="--restart"):
+        FrontierStore(path)
+    with open(tmp_path / "frontier.db", "wb") as save_file:
+        save_file.write(b"not a database at all")
+    with pytest.raises(RuntimeError, match="--convert"):
+        FrontierStore(str(tmp_path / "frontier.db"))
+
+
+def test_shelve_save_file_converts(tmp_path):
+    path = str(tmp_path / "frontier.shelve")
+    with shelve.open(path) as old:
+        old["a" * 64] = ("https://www.ics.uci.edu/a", True)
+        old["b" * 64] = ("https://www.ics.uci.edu/b", False)
+    target = str(tmp_path / "frontier.db")
+    assert FrontierStore.convert(path, target) == 2
+    store = FrontierStore(target)
+    assert store["a" * 64] == ("https://www.ics.uci.edu/a", True)
+    assert store.pending_urls() == ["https://www.ics.uci.edu/b"]
+    store.close()
+    FrontierStore.remove(path)
+    assert not FrontierStore.exists(path)
@@ -0,0 +1,25 @@
+import random
+
+import PartA
+from benchmarks.site import EDGE_CASES, old_counts, random_text
+from utils.tokenizer import WordCounter, count_words, tokenize
+
+
+def test_tokens_match_part_a():
+    for text in (EDGE_CASES, random_text(20000)):
+        assert tokenize(text) == PartA.tokenize(text)
+        assert count_words(text) == old_counts(text)
+
+
+def test_any_chunking_counts_the_same_words():
+    text = EDGE_CASES * 20
+    expected = old_counts(text)
+    rng = random.Random(0)
+    for _ in range(20):
+        counter = WordCounter()
+        position = 0
+        while position < len(text):
+            step = rng.randint(1, 16)
+            counter.feed(text[position:position + step])
+            position += step
+        assert counter.close() == expected
@@ -0,0 +1,55 @@
+from threading import Thread
+
+import scraper
+from crawler.frontier import Frontier
+from utils.url_filter import UrlFilter
+
+
+def open_frontier(config, restart):
+    scraper.configure(config, restart)
+    return Frontier(config, restart)
+
+
+def close(frontier):
+    frontier.save.close()
+    frontier.close()
+
+
+def test_host_budget_carries_over_and_rejects_once(config_for, site):
+    config = config_for(FILTER={"HOSTBUDGET": "5"})
+    host = site.hosts[0]
+    frontier = open_frontier(config, True)
+    for number in range(1, 10):
+        frontier.add_url(f"https://{host}/{number}")
+    frontier.add_url(f"https://{host}/9")
+    assert scraper.url_filter.admitted[host] == 5 # The seed and 4 more
+    # Urls over the budget are seen, so each is rejected once.
+    assert scraper.url_filter.rejections["host budget"] == 5
+    queued = frontier.to_be_downloaded.size
+    close(frontier)
+
+    frontier = open_frontier(config, False)
+    try:
+        assert scraper.url_filter.admitted[host] == 5
+        frontier.add_url(f"https://{host}/10")
+        assert frontier.to_be_downloaded.size == queued
+        frontier.add_url(f"https://{site.hosts[1]}/10")
+        assert frontier.to_be_downloaded.size == queued + 1
+    finally:
+        close(frontier)
+
+
+def test_rejections_from_many_threads_are_all_counted():
+    url_filter = UrlFilter()
+    invalid = "https://www.example.com/page"
+
+    def reject():
+        for _ in range(20000):
+            url_filter.is_valid(invalid)
+
+    threads = [Thread(target=reject) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert url_filter.rejection_counts() == {"domain": 8 * 20000}
@@ -0,0 +1,49 @@
+from threading import Thread
+
+import requests
+
+from crawler import Crawler
+from crawler import worker
+from utils import get_urlhash
+
+
+def crawl(crawler, timeout=60):
+    # Runs the crawl, False if it is still running after timeout seconds.
+    thread = Thread(target=crawler.start, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_download_error_releases_its_host(config_for, site, monkeypatch):
+    failing = f"https://{site.hosts[0]}/3"
+    download = worker.download
+
+    def dropped_connection(url, config, logger=None):
+        if url == failing:
+            raise requests.ConnectionError("Connection dropped")
+        return download(url, config, logger)
+
+    monkeypatch.setattr(worker, "download", dropped_connection)
+    crawler = Crawler(config_for(), True)
+    assert crawl(crawler), "crawl hung on the host of the failed download"
+    save = crawler.frontier.save
+    assert save[get_urlhash(failing)] == (failing, True)
+    assert all(completed for _, completed in save.values())
+    assert len(save) >= len(site.hosts) * site.pages
+    assert crawler.frontier.to_be_downloaded.idle()
+
+
+def test_scheduler_done_is_idempotent():
+    from crawler.scheduler import HostScheduler
+    scheduler = HostScheduler(0.0)
+    scheduler.add("https://www.ics.uci.edu/a")
+    scheduler.add("https://www.ics.uci.edu/b")
+    first = scheduler.get()
+    scheduler.done(first)
+    second = scheduler.get()
+    # A second release of the first url must not free the host of the second.
+    scheduler.done(first)
+    assert scheduler.busy == {"www.ics.uci.edu"}
+    scheduler.done(second)
+    assert scheduler.idle()
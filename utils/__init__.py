@@ -1,35 +1,103 @@
 import os
+import time
+import atexit
 import logging
 from hashlib import sha256
+from queue import Queue
+from threading import Lock
 from urllib.parse import urlparse
+from logging.handlers import QueueHandler, QueueListener
+
+from utils import canonical
+
+log_level = logging.INFO
+log_rate = 50 # Records per second each logger may emit, warnings and errors always pass
+_loggers = list()
+_queue_handlers = dict() # log file -> handler queueing records for its listener
+_console = None
+
+
+class _RateLimit(logging.Filter):
+    # Token bucket per logger, so a hot loop cannot flood the log.
+    def __init__(self):
+        super().__init__()
+        self.tokens = log_rate
+        self.last = time.monotonic()
+        self.dropped = 0
+        self.lock = Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not log_rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(log_rate, self.tokens + (now - self.last) * log_rate)
+            self.last = now
+            if self.tokens < 1:
+                self.dropped += 1
+                return False
+            self.tokens -= 1
+            if self.dropped:
+                record.msg = f"({self.dropped} messages suppressed) {record.msg}"
+                self.dropped = 0
+        return True
+
+
+def set_log_level(level, rate=None):
+    # Applies the [LOGGING] options of config.ini to every logger.
+    global log_level, log_rate
+    log_level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+    if rate is not None:
+        log_rate = rate
+    for logger in _loggers:
+        logger.setLevel(log_level)
+
 
 def get_logger(name, filename=None):
+    # Loggers are set up once per name. Records are handed to a background
+    # listener per log file, so workers never wait on file or console writes.
+    global _console
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    if not os.path.exists("Logs"):
-        os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
+    if logger.handlers:
+        return logger
+    logger.setLevel(log_level)
+    logger.propagate = False
+    logfile = filename if filename else name
+    handler = _queue_handlers.get(logfile)
+    if handler is None:
+        # Shards and the coordinator may share a directory and race here.
+        os.makedirs("Logs", exist_ok=True)
+        fh = logging.FileHandler(f"Logs/{logfile}.log")
+        fh.setLevel(logging.DEBUG)
+        if _console is None:
+            _console = logging.StreamHandler()
+            _console.setLevel(logging.INFO)
+        formatter = logging.Formatter(
+           "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        fh.setFormatter(formatter)
+        _console.setFormatter(formatter)
+        queue = Queue()
+        listener = QueueListener(queue, fh, _console, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        handler = _queue_handlers[logfile] = QueueHandler(queue)
     # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    logger.addHandler(handler)
+    logger.addFilter(_RateLimit())
+    _loggers.append(logger)
     return logger
 
 
-def get_urlhash(url):
+def get_urldigest(url):
     parsed = urlparse(url)
     # everything other than scheme.
     return sha256(
         f"{parsed.netloc}/{parsed.path}/{parsed.params}/"
-        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
+        f"{parsed.query}/{parsed.fragment}".encode("utf-8")).digest()
+
+def get_urlhash(url):
+    return get_urldigest(url).hex()
 
 def normalize(url):
-    if url.endswith("/"):
-        return url.rstrip("/")
-    return url
+    # Canonical form of url, see utils/canonical.py.
+    return canonical.canonicalize(url)
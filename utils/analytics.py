@@ -0,0 +1,245 @@
+import atexit
+import os
+import pickle
+
+from collections import Counter
+from contextlib import contextmanager
+from threading import Event, Lock, Thread, local
+from urllib.parse import urlparse
+
+from utils.sketch import SpaceSaving
+
+
+class CrawlStats(object):
+    # Everything the crawl report is built from. With a word_capacity, word
+    # frequencies are a SpaceSaving sketch of that many words (utils/sketch.py)
+    # rather than a Counter of every word.
+    def __init__(self, word_capacity=0):
+        self.unique_urls = set() # Unique urls, fragments removed
+        self.longest_page = {'url': None, 'word_count': 0}
+        self.word_frequencies = SpaceSaving(word_capacity) if word_capacity else Counter()
+        self.subdomain_counts = {} # Unique pages per subdomain of uci.edu
+        self.removed_urls = set() # Pages no longer counted, taken out by merge
+
+    def merge(self, other):
+        # Adds the stats of other. Subdomains are counted here, against the
+        # merged unique urls, so a page seen by two workers counts once.
+        # Word counts of other may be negative: a recrawled page that changed
+        # adds its new counts minus its former ones. Its removed urls leave
+        # the unique urls, their subdomains and the longest page.
+        for url in getattr(other, "removed_urls", ()): # Not in deltas journaled before
+            self._remove(url)
+        for url in other.unique_urls - self.unique_urls:
+            self.unique_urls.add(url)
+            domain = urlparse(url).netloc
+            if domain.endswith(".uci.edu"):
+                self.subdomain_counts[domain] = self.subdomain_counts.get(domain, 0) + 1
+        words = other.word_frequencies
+        if isinstance(words, SpaceSaving) and isinstance(self.word_frequencies, Counter):
+            # Exact counts merged with a sketch are only as good as the sketch.
+            self.word_frequencies = SpaceSaving(words.capacity, self.word_frequencies)
+        self.word_frequencies.update(words)
+        if isinstance(self.word_frequencies, Counter):
+            for word, count in words.items():
+                if count < 0 and not self.word_frequencies[word]:
+                    del self.word_frequencies[word]
+        # The longest page is replaced by its own new version even when that
+        # is shorter. Other pages are not known here, so one of them may then
+        # be longer until it is counted again.
+        if (other.longest_page['word_count'] > self.longest_page['word_count']
+                or (other.longest_page['url'] is not None
+                    and other.longest_page['url'] == self.longest_page['url'])):
+            self.longest_page = dict(other.longest_page)
+
+    def _remove(self, url):
+        # Takes out a page counted before. When it was the longest page, no
+        # page is until a longer one is counted: the others are not known.
+        if url in self.unique_urls:
+            self.unique_urls.discard(url)
+            domain = urlparse(url).netloc
+            if self.subdomain_counts.get(domain, 0) > 1:
+                self.subdomain_counts[domain] -= 1
+            else:
+                self.subdomain_counts.pop(domain, None)
+        if self.longest_page['url'] is not None and self.longest_page['url'].partition("#")[0] == url:
+            self.longest_page = {'url': None, 'word_count': 0}
+
+    def canonicalize(self, canonicalize):
+        # Rewrites the unique urls in their canonical form and counts the
+        # subdomains again. Word counts of pages that were counted under two
+        # forms stay as they were.
+        self.unique_urls = {canonicalize(url) for url in self.unique_urls}
+        self.subdomain_counts = {}
+        for url in self.unique_urls:
+            domain = urlparse(url).netloc
+            if domain.endswith(".uci.edu"):
+                self.subdomain_counts[domain] = self.subdomain_counts.get(domain, 0) + 1
+        if self.longest_page['url'] is not None:
+            self.longest_page['url'] = canonicalize(self.longest_page['url'])
+
+
+class _Accumulator(object):
+    # Exact counts, even with a sketch: a page's former words are subtracted
+    # on whichever thread recrawls it, and a sketch that never held a word
+    # would drop its negative count. They are only as large as the pages
+    # counted between two merges.
+    def __init__(self):
+        self.lock = Lock()
+        self.stats = CrawlStats()
+
+
+class CrawlAnalytics(object):
+    # Report state shared by all workers. Each worker thread updates its own
+    # accumulator, which is merged into the snapshot whenever the report is
+    # written or a checkpoint is taken. With a path, the snapshot is loaded on
+    # startup and saved every `interval` seconds (and on exit), so totals
+    # carry over across restarts. With a word_capacity, the snapshot counts
+    # words in a sketch of that many (see CrawlStats), which the accumulators'
+    # exact counts are merged into.
+    # Once attached to the frontier's save file (the journal), a page's stats
+    # are held until its url is marked complete, then committed in the same
+    # transaction (FrontierStore.add_stats). The stats file records the last
+    # journal row it holds, and the rows after it are merged back on startup,
+    # so after a crash the report covers exactly the completed pages.
+    def __init__(self, path=None, interval=30.0, restart=False, word_capacity=0):
+        self.path = path
+        self.word_capacity = word_capacity
+        self.lock = Lock()
+        self.local = local()
+        self.accumulators = list()
+        self.snapshot = CrawlStats(word_capacity)
+        self.closed = Event()
+        self.journal = None
+        self.journal_id = 0 # Last journal row merged into the snapshot
+        self.held = dict() # url -> stats of its page, until it is complete
+        if path and restart and os.path.exists(path):
+            os.remove(path)
+        elif path and os.path.exists(path):
+            with open(path, "rb") as stats_file:
+                self.snapshot = pickle.load(stats_file)
+                try:
+                    self.journal_id = pickle.load(stats_file)
+                except EOFError: # Saved before the journal
+                    pass
+            if word_capacity and isinstance(self.snapshot.word_frequencies, Counter):
+                # Saved with exact counts, kept in a sketch from now on.
+                self.snapshot.word_frequencies = SpaceSaving(
+                    word_capacity, self.snapshot.word_frequencies)
+        if path:
+            Thread(target=self._checkpoint_periodically, args=(interval,),
+                   daemon=True).start()
+            atexit.register(self.close)
+
+    def attach(self, journal):
+        # Journals stats in journal, the frontier's FrontierStore, and merges
+        # the stats it committed after the stats file was last saved.
+        if not self.path:
+            return
+        journal.drop_stats(self.journal_id)
+        deltas = journal.stats_after(self.journal_id)
+        with self.lock:
+            for delta in deltas:
+                self.snapshot.merge(delta)
+            self.journal_id = journal.stats_id
+            self.journal = journal
+
+    def record(self, url, delta):
+        # Stats of url's page: counted now without a journal, otherwise once
+        # url is complete.
+        if self.journal is None:
+            self._count(delta)
+        else:
+            self.held[url] = delta
+
+    def complete(self, url):
+        # Counts the stats held for url. Called in the journal's atomic()
+        # block that marks url complete, so they are committed with it.
+        delta = self.held.pop(url, None)
+        if delta is None:
+            return
+        self.journal.add_stats(delta)
+        self._count(delta)
+
+    def _count(self, delta):
+        if delta.removed_urls:
+            # Straight into the snapshot, once every accumulator is, so the
+            # page's earlier stats are there to be taken out.
+            with self.lock:
+                self._merge()
+                self.snapshot.merge(delta)
+            return
+        with self.updating() as stats:
+            stats.merge(delta)
+
+    @contextmanager
+    def updating(self):
+        # The calling thread's accumulator, locked only against merges.
+        accumulator = getattr(self.local, "accumulator", None)
+        if accumulator is None:
+            accumulator = self.local.accumulator = _Accumulator()
+            with self.lock:
+                self.accumulators.append(accumulator)
+        with accumulator.lock:
+            yield accumulator.stats
+
+    @contextmanager
+    def merged(self):
+        # The snapshot with every accumulator merged in, held still while the
+        # caller reads it. Workers keep running meanwhile. The journal is
+        # flushed and held while merging, so the snapshot holds exactly the
+        # stats of the rows up to journal_id.
+        journal = self.journal
+        if journal is not None:
+            journal.lock.acquire()
+        try:
+            self.lock.acquire()
+            try:
+                if journal is not None and not journal.closed.is_set():
+                    journal.flush()
+                self._merge()
+                if journal is not None:
+                    self.journal_id = journal.stats_id
+            except BaseException:
+                self.lock.release()
+                raise
+        finally:
+            if journal is not None:
+                journal.lock.release()
+        try:
+            yield self.snapshot
+        finally:
+            self.lock.release()
+
+    def canonicalize(self, canonicalize):
+        # Applies CrawlStats.canonicalize to the snapshot, after a change of
+        # the canonical form.
+        with self.merged() as snapshot:
+            snapshot.canonicalize(canonicalize)
+
+    def checkpoint(self):
+        if not self.path:
+            return
+        with self.merged() as snapshot:
+            journal_id = self.journal_id
+            # Written aside and renamed, so a crash never leaves half a file.
+            with open(self.path + ".tmp", "wb") as stats_file:
+                pickle.dump(snapshot, stats_file, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(journal_id, stats_file, pickle.HIGHEST_PROTOCOL)
+            os.replace(self.path + ".tmp", self.path)
+        if self.journal is not None:
+            self.journal.drop_stats(journal_id)
+
+    def close(self):
+        if not self.closed.is_set():
+            self.closed.set()
+            self.checkpoint()
+
+    def _merge(self):
+        for accumulator in self.accumulators:
+            with accumulator.lock:
+                delta, accumulator.stats = accumulator.stats, CrawlStats()
+            self.snapshot.merge(delta)
+
+    def _checkpoint_periodically(self, interval):
+        while not self.closed.wait(interval):
+            self.checkpoint()
@@ -0,0 +1,122 @@
+import asyncio
+import cbor
+
+from urllib.parse import urlencode
+
+from utils.response import Response
+
+
+class AsyncCacheClient(object):
+    # Downloads urls through the cache server on an asyncio event loop.
+    # Connections are kept alive and reused, and at most max_in_flight
+    # requests are outstanding at any time. A request the cache server does
+    # not answer within timeout seconds, or whose connection fails, gives an
+    # error Response with status None instead of raising.
+    def __init__(self, config, max_in_flight=None, timeout=None):
+        self.config = config
+        self.host, self.port = config.cache_server
+        self.max_in_flight = max_in_flight or config.max_in_flight
+        self.timeout = timeout or config.download_timeout
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+        self.idle = list()  # (reader, writer) pairs ready for reuse
+        self.opened = 0
+
+    async def download(self, url, logger=None):
+        path = "/?" + urlencode([("q", f"{url}"), ("u", f"{self.config.user_agent}")])
+        try:
+            async with self.slots:
+                status, body = await asyncio.wait_for(self._get(path), self.timeout)
+        except asyncio.TimeoutError:
+            return self._failed(url, f"no answer in {self.timeout} seconds", logger)
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ValueError) as e:
+            # OSError covers refused and reset connections, ValueError a
+            # malformed status line or chunk size.
+            return self._failed(url, repr(e), logger)
+        try:
+            if 200 <= status < 400 and body:
+                return Response(cbor.loads(body))
+        except (EOFError, ValueError) as e:
+            pass
+        if logger:
+            logger.error(f"Spacetime Response error <{status}> with url {url}.")
+        return Response({
+            "error": f"Spacetime Response error <{status}> with url {url}.",
+            "status": status,
+            "url": url})
+
+    def _failed(self, url, reason, logger):
+        if logger:
+            logger.error(f"Cache server request failed ({reason}) with url {url}.")
+        return Response({
+            "error": f"Cache server request failed ({reason}) with url {url}.",
+            "status": None,
+            "url": url})
+
+    async def close(self):
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+
+    async def _get(self, path):
+        # A reused connection may have been closed by the server while idle,
+        # so a failure on one is retried once on a fresh connection.
+        for attempt in range(2):
+            reused = bool(self.idle)
+            reader, writer = await self._connect()
+            try:
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\n"
+                    f"Host: {self.host}:{self.port}\r\n"
+                    f"Connection: keep-alive\r\n\r\n".encode("latin-1"))
+                await writer.drain()
+                status, headers, body = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                # Timed out (cancelled) or malformed: the rest of the
+                # response may still arrive, so the connection is not reused.
+                writer.close()
+                raise
+            if headers.get("connection", "").lower() == "close":
+                writer.close()
+            else:
+                self.idle.append((reader, writer))
+            return status, body
+
+    async def _connect(self):
+        if self.idle:
+            return self.idle.pop()
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def _read_response(self, reader):
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = dict()
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = list()
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass  # trailers
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        else:
+            body = await reader.read()
+            headers["connection"] = "close"
+        return status, headers, body
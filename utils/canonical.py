@@ -0,0 +1,153 @@
+import re
+
+from fnmatch import translate
+from hashlib import sha256
+from inspect import getsource
+
+from utils.url_filter import _URL
+
+# Query (and ;path) parameters that only track a visit or a session.
+DEFAULT_IGNORED_PARAMS = (
+    "utm_*", "fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "sessionid",
+    "session_id", "phpsessid", "jsessionid", "cfid", "cftoken")
+DEFAULT_INDEX_PAGES = ("index.html", "index.htm", "index.php")
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_PATH_PARAM = re.compile(r";([^/;=]*)(?:=[^/;]*)?")
+_UNRESERVED = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def _matcher(patterns):
+    # Case insensitive match of a parameter name against glob patterns, None
+    # when there are none.
+    if not patterns:
+        return None
+    return re.compile("|".join(translate(pattern.lower()) for pattern in patterns)).match
+
+
+def _unescape(match):
+    # %7e -> ~, %2f -> %2F: unreserved characters decoded, the rest upper case.
+    char = chr(int(match.group(1), 16))
+    return char if char in _UNRESERVED else "%" + match.group(1).upper()
+
+
+class UrlCanonicalizer(object):
+    # Rewrites the urls a crawl would fetch twice for one page into a single
+    # form, so they get one frontier entry, one download and one line in the
+    # report. Always: scheme and host lower case, default port and fragment
+    # dropped, percent escapes normalized, trailing slashes dropped. Then:
+    #   ignored_params  query and ;path parameters dropped on every host
+    #                   (glob patterns, any case: utm_*, jsessionid)
+    #   host_params     host -> more parameters dropped on that host and its
+    #                   subdomains
+    #   index_pages     last path segments that serve the directory itself,
+    #                   dropped only without a query (index.php?page=2 is a
+    #                   page of its own)
+    #   sort_query      query parameters ordered by name (values of a
+    #                   repeated name keep their order)
+    # Host decisions are memoized, like the url filter's.
+    def __init__(self, ignored_params=DEFAULT_IGNORED_PARAMS, host_params=None,
+                 index_pages=DEFAULT_INDEX_PAGES, sort_query=True):
+        host_params = dict(host_params or {})
+        self.rules = (tuple(ignored_params), tuple(sorted(host_params.items())),
+                      tuple(index_pages), sort_query)
+        self.ignored_params = tuple(ignored_params)
+        self.host_params = {host.strip(".").lower(): tuple(params)
+                            for host, params in host_params.items()}
+        self.index_pages = frozenset(page.lower() for page in index_pages)
+        self.sort_query = sort_query
+        self.hosts = dict() # (scheme, netloc) -> (canonical netloc, parameter matcher)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.canonical_ignored_params, config.canonical_host_params,
+                   config.canonical_index_pages, config.canonical_sort_query)
+
+    @property
+    def version(self):
+        # Changes whenever the rules or this code change, so save files
+        # keyed by an older canonical form are rehashed (FrontierStore.rehash).
+        return sha256(
+            (repr(self.rules) + getsource(UrlCanonicalizer)).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def canonicalize(self, url):
+        scheme, netloc, path, query = _URL.match(url.strip()).groups()
+        if not scheme or netloc is None:
+            return url.partition("#")[0].rstrip("/")
+        scheme = scheme.lower()
+        host = self.hosts.get((scheme, netloc))
+        if host is None:
+            host = self.hosts[(scheme, netloc)] = self._host(scheme, netloc)
+        netloc, ignored = host
+
+        if "%" in path:
+            path = _ESCAPE.sub(_unescape, path)
+        if ";" in path and ignored is not None:
+            path = _PATH_PARAM.sub(
+                lambda match: "" if ignored(match.group(1).lower()) else match.group(0), path)
+        if query:
+            if "%" in query:
+                query = _ESCAPE.sub(_unescape, query)
+            params = [param for param in query.split("&") if param and (
+                ignored is None or not ignored(param.partition("=")[0].lower()))]
+            if self.sort_query:
+                params.sort(key=lambda param: param.partition("=")[0])
+            query = "&".join(params)
+
+        if self.index_pages and not query: # Once ignored parameters are gone
+            directory, _, last = path.rpartition("/")
+            if last.lower() in self.index_pages:
+                path = directory
+        path = path.rstrip("/")
+        return f"{scheme}://{netloc}{path}?{query}" if query else f"{scheme}://{netloc}{path}"
+
+    def _host(self, scheme, netloc):
+        # (netloc without case, trailing dot or default port, matcher of the
+        # parameters ignored on it).
+        userinfo, at, hostport = netloc.rpartition("@")
+        hostname, colon, port = hostport.lower().rpartition(":")
+        if not colon or "]" in port: # No port, or a bare IPv6 address
+            hostname, port = hostport.lower(), ""
+        hostname = hostname.rstrip(".")
+        if port and port != _DEFAULT_PORTS.get(scheme):
+            hostname = f"{hostname}:{port}"
+        params = list(self.ignored_params)
+        labels = hostname.partition(":")[0].split(".")
+        for start in range(len(labels)):
+            params.extend(self.host_params.get(".".join(labels[start:]), ()))
+        return userinfo + at + hostname, _matcher(params)
+
+
+# Used by utils.normalize, replaced by configure.
+canonicalizer = UrlCanonicalizer()
+
+
+def configure(config):
+    # Applies the [CANONICAL] options of config.ini. Without ENABLED urls
+    # only lose their trailing slashes, as before canonicalization existed.
+    global canonicalizer
+    canonicalizer = UrlCanonicalizer.from_config(config) if config.canonical else None
+
+
+def set_rules(rules):
+    # Same canonicalizer from UrlCanonicalizer.rules, None to disable, for
+    # pool processes.
+    global canonicalizer
+    canonicalizer = UrlCanonicalizer(rules[0], dict(rules[1]), *rules[2:]) if rules else None
+
+
+def canonicalize(url):
+    if canonicalizer is None:
+        return url.rstrip("/") if url.endswith("/") else url
+    return canonicalizer.canonicalize(url)
+
+
+def rules():
+    return canonicalizer.rules if canonicalizer is not None else None
+
+
+def version():
+    return canonicalizer.version if canonicalizer is not None else "off"
@@ -1,5 +1,8 @@
+import os
 import re
 
+from utils import canonical, url_filter
+
 
 class Config(object):
     def __init__(self, config):
@@ -9,11 +12,152 @@ class Config(object):
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.stats_file = config["LOCAL PROPERTIES"].get("STATS", "crawl_stats.pickle").strip()
+        self.checkpoint_interval = float(config["LOCAL PROPERTIES"].get("CHECKPOINTINTERVAL", "30"))
+        self.word_sketch = int(config["LOCAL PROPERTIES"].get("WORDSKETCH", "0"))
+        self.flush_batch = int(config["LOCAL PROPERTIES"].get("FLUSHBATCH", "500"))
+        self.flush_interval = float(config["LOCAL PROPERTIES"].get("FLUSHINTERVAL", "1.0"))
+        self.seen_filter = config["LOCAL PROPERTIES"].get("SEENFILTER", "exact").strip()
+        self.seen_capacity = int(config["LOCAL PROPERTIES"].get("SEENCAPACITY", "1000000"))
+        self.seen_error_rate = float(config["LOCAL PROPERTIES"].get("SEENERRORRATE", "0.0001"))
+        self.page_store = config["LOCAL PROPERTIES"].get("PAGESTORE", "").strip()
+        self.segment_size = int(config["LOCAL PROPERTIES"].get("SEGMENTSIZE", "256")) * 1024 * 1024
+        self.hot_window = int(config["LOCAL PROPERTIES"].get("HOTWINDOW", "200000"))
+        self.spill_dir = config["LOCAL PROPERTIES"].get("SPILLDIR", "").strip()
+        self.processes = int(config["LOCAL PROPERTIES"].get("PROCESSES", "0"))
+        assert self.processes >= 0, "PROCESSES must be 0 (parse in the worker threads) or more"
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        self.engine = config["CONNECTION"].get("ENGINE", "threads").strip()
+        assert self.engine in ("threads", "async"), "ENGINE must be threads or async"
+        self.max_in_flight = int(config["CONNECTION"].get("MAXINFLIGHT", "8"))
+        self.download_timeout = float(config["CONNECTION"].get("TIMEOUT", "60"))
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.parser = config["CRAWLER"].get("PARSER", "html.parser").strip()
+        self.priority = _weights(
+            config["CRAWLER"].get("PRIORITY"),
+            {"depth": 1.0, "host": 0.5, "quality": 1.0, "lastmod": 1.0})
+        self.near_dup_threshold = int(config["CRAWLER"].get("NEARDUPTHRESHOLD", "3"))
+        self.near_dup_capacity = int(config["CRAWLER"].get("NEARDUPCAPACITY", "500000"))
+        self.max_page_size = int(config["CRAWLER"].get("MAXPAGESIZE", "10000000"))
+        self.content_types = _split(
+            config["CRAWLER"].get("CONTENTTYPES"),
+            ("text/html", "application/xhtml+xml", "text/plain"))
+
+        logging_options = config["LOGGING"] if config.has_section("LOGGING") else {}
+        self.log_level = logging_options.get("LEVEL", "INFO").strip()
+        self.log_rate = float(logging_options.get("RATELIMIT", "50"))
+        metrics_options = config["METRICS"] if config.has_section("METRICS") else {}
+        self.metrics_file = metrics_options.get("SNAPSHOT", "").strip()
+        self.metrics_interval = float(metrics_options.get("INTERVAL", "10"))
+        self.metrics_port = int(metrics_options.get("PORT", "0"))
+
+        # Rules behind scraper.is_valid, see utils/url_filter.py.
+        filters = config["FILTER"] if config.has_section("FILTER") else {}
+        self.filter_domains = _split(filters.get("DOMAINS"), url_filter.DEFAULT_DOMAINS)
+        self.filter_paths = _split(filters.get("PATHS"), url_filter.DEFAULT_PATHS)
+        self.filter_require_www = filters.get("REQUIREWWW", "True").strip().lower() == "true"
+        self.filter_extensions = _split(filters.get("EXTENSIONS"), url_filter.DEFAULT_EXTENSIONS)
+        self.filter_trap_patterns = _split(filters.get("TRAPPATTERNS"), url_filter.DEFAULT_TRAP_PATTERNS)
+        self.filter_max_depth = int(filters.get("MAXDEPTH", "12"))
+        self.filter_max_repeats = int(filters.get("MAXREPEATS", "2"))
+        self.filter_max_query_params = int(filters.get("MAXQUERYPARAMS", "8"))
+        self.filter_host_budget = int(filters.get("HOSTBUDGET", "0"))
+
+        # Canonical form of every url, see utils/canonical.py.
+        canonical_options = config["CANONICAL"] if config.has_section("CANONICAL") else {}
+        self.canonical = canonical_options.get("ENABLED", "True").strip().lower() == "true"
+        self.canonical_ignored_params = _split(
+            canonical_options.get("IGNOREPARAMS"), canonical.DEFAULT_IGNORED_PARAMS)
+        self.canonical_host_params = _host_lists(canonical_options.get("HOSTPARAMS"))
+        self.canonical_index_pages = _split(
+            canonical_options.get("INDEXPAGES"), canonical.DEFAULT_INDEX_PAGES)
+        self.canonical_sort_query = canonical_options.get("SORTQUERY", "True").strip().lower() == "true"
+
+        # Per host delays adjusted from latency and errors, see crawler/rate_control.py.
+        rates = config["RATECONTROL"] if config.has_section("RATECONTROL") else {}
+        self.rate_control = rates.get("ADAPTIVE", "True").strip().lower() == "true"
+        self.rate_max_delay = float(rates.get("MAXDELAY", "60"))
+        self.rate_target_latency = float(rates.get("TARGETLATENCY", "2.0"))
+        self.rate_backoff = float(rates.get("BACKOFF", "2.0"))
+        self.rate_recovery = float(rates.get("RECOVERY", "0.2"))
+        self.rate_quarantine_after = int(rates.get("QUARANTINEAFTER", "5"))
+        self.rate_quarantine = float(rates.get("QUARANTINE", "60"))
+        self.rate_give_up_after = int(rates.get("GIVEUPAFTER", "4"))
+        assert self.rate_backoff >= 1, "RATECONTROL BACKOFF must be 1 or more"
+
+        # robots.txt and sitemaps of every host, see crawler/robots.py.
+        robots = config["ROBOTS"] if config.has_section("ROBOTS") else {}
+        self.robots = robots.get("OBEY", "True").strip().lower() == "true"
+        self.robots_ttl = float(robots.get("TTL", "86400"))
+        self.sitemap_limit = int(robots.get("SITEMAPLIMIT", "50000"))
+
+        # Page changes tracked for recrawls, see crawler/recrawl.py.
+        recrawl = config["RECRAWL"] if config.has_section("RECRAWL") else {}
+        self.recrawl_track = recrawl.get("TRACK", "True").strip().lower() == "true"
+        self.recrawl_min_interval = float(recrawl.get("MININTERVAL", "86400"))
+        self.recrawl_max_interval = float(recrawl.get("MAXINTERVAL", "2592000"))
+        self.recrawl = False # Set by launch.py --recrawl
+
+        # Host partitioned crawl over several processes, see crawler/shards.py.
+        shards = config["SHARDS"] if config.has_section("SHARDS") else {}
+        self.shard_count = int(shards.get("COUNT", "1"))
+        self.shard_index = 0
+        self.shard_addresses = _split(shards.get("ADDRESSES"), ())
+        self.shard_coordinator = shards.get("COORDINATOR", "127.0.0.1:7100").strip()
+        self.shard_authkey = shards.get("AUTHKEY", "crawler").strip()
+        self.forward_batch = int(shards.get("FORWARDBATCH", "200"))
+        self.forward_interval = float(shards.get("FORWARDINTERVAL", "1.0"))
+        assert self.shard_count == 1 or len(self.shard_addresses) == self.shard_count, \
+            "SHARDS ADDRESSES must list one host:port per shard"
+
+        self.cache_server = None
+
+    def set_shard(self, index):
+        # This process crawls shard `index`, which keeps save, stats, metrics
+        # and page store files of its own.
+        assert 0 <= index < self.shard_count, f"Shard must be between 0 and {self.shard_count - 1}"
+        self.shard_index = index
+        self.save_file = shard_path(self.save_file, index)
+        self.stats_file = shard_path(self.stats_file, index)
+        if self.metrics_file:
+            self.metrics_file = shard_path(self.metrics_file, index)
+        if self.page_store:
+            self.page_store = shard_path(self.page_store, index)
+        if self.spill_dir:
+            self.spill_dir = shard_path(self.spill_dir, index)
+        if self.metrics_port:
+            self.metrics_port += index
+
+
+def _split(value, default):
+    # Comma separated option, or default when it is not set.
+    if value is None:
+        return default
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+def _weights(value, default):
+    # "name:weight,..." option over default, which lists every allowed name.
+    weights = dict(default)
+    for item in _split(value, ()):
+        name, _, weight = item.partition(":")
+        assert name.strip() in weights, f"Unknown weight {name}, use {', '.join(default)}"
+        weights[name.strip()] = float(weight)
+    return weights
+
+def _host_lists(value):
+    # "host: item item,..." option -> {host: (item, ...)}.
+    lists = dict()
+    for entry in _split(value, ()):
+        host, _, items = entry.partition(":")
+        assert host.strip() and items.strip(), f"Expected host: item item..., got {entry}"
+        lists[host.strip()] = lists.get(host.strip(), ()) + tuple(items.split())
+    return lists
 
-        self.cache_server = None
\ No newline at end of file
+def shard_path(path, index):
+    # frontier.db -> frontier.shard0.db
+    root, extension = os.path.splitext(path)
+    return f"{root}.shard{index}{extension}"
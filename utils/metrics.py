@@ -0,0 +1,133 @@
+import json
+import os
+import time
+
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+           1000, 2500, 5000, 10000, float("inf"))
+
+
+class Histogram(object):
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, milliseconds):
+        self.counts[bisect_left(BUCKETS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the given fraction of samples.
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return BUCKETS[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {str(bound): count
+                        for bound, count in zip(BUCKETS, self.counts) if count}}
+
+
+class Metrics(object):
+    # Counters, per stage latency histograms and gauges for the running crawl.
+    # Updates take one short lock, so they are cheap enough for the hot path.
+    def __init__(self):
+        self.lock = Lock()
+        self.started = time.monotonic()
+        self.counters = Counter()
+        self.histograms = dict()
+        self.gauges = dict()
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def gauge(self, name, function):
+        # function is called for its current value on every snapshot.
+        self.gauges[name] = function
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        with self.lock:
+            counters = dict(self.counters)
+            stages = {stage: histogram.snapshot()
+                      for stage, histogram in self.histograms.items()}
+        gauges = dict()
+        for name, function in list(self.gauges.items()):
+            try:
+                gauges[name] = function()
+            except Exception as e:
+                gauges[name] = f"unavailable: {e}"
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "pages_per_s": round(counters.get("pages", 0) / elapsed, 3) if elapsed else 0,
+            "bytes_per_s": round(counters.get("bytes", 0) / elapsed, 1) if elapsed else 0,
+            "counters": counters,
+            "gauges": gauges,
+            "stages": stages}
+
+
+# Shared by the workers, the frontier and the scraper.
+metrics = Metrics()
+
+
+def start_exporters(config, registry=metrics):
+    # Writes a JSON snapshot to METRICS SNAPSHOT every INTERVAL seconds and
+    # serves it on http://127.0.0.1:PORT/ when PORT is set.
+    stop = Event()
+    if config.metrics_file:
+        def write_periodically():
+            while not stop.wait(config.metrics_interval):
+                with open(config.metrics_file + ".tmp", "w") as metrics_file:
+                    json.dump(registry.snapshot(), metrics_file, indent=1)
+                os.replace(config.metrics_file + ".tmp", config.metrics_file)
+        Thread(target=write_periodically, daemon=True).start()
+    if config.metrics_port:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(registry.snapshot(), indent=1).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", config.metrics_port), Handler)
+        server.daemon_threads = True
+        Thread(target=server.serve_forever, daemon=True).start()
+    return stop
@@ -0,0 +1,113 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+
+from utils.tokenizer import tokenize, count_words, WordCounter
+
+# Backends that ParsedPage knows how to use. "html.parser" and "lxml" go
+# through BeautifulSoup, "stream" uses the stdlib tokenizer without building
+# a tree at all.
+PARSERS = ("html.parser", "lxml", "stream")
+
+parser_backend = "html.parser"
+
+
+def set_parser(name):
+    # Selects the backend used by every ParsedPage created afterwards.
+    global parser_backend
+    assert name in PARSERS, f"PARSER must be one of {', '.join(PARSERS)}"
+    parser_backend = name
+
+
+class ParsedPage(object):
+    # The result of parsing a page exactly once. Every analysis step in
+    # scraper.py reads from this object instead of parsing the content again.
+    # content may be bytes, str or a memoryview such as Response.content.
+    def __init__(self, url, content, parser=None):
+        self.url = url
+        self.content_length = len(content)
+        backend = parser or parser_backend
+        self._tokens = None
+        self._word_counts = None
+        if backend == "stream":
+            # Words are counted chunk by chunk while the page is tokenized.
+            self.text, hrefs, self._word_counts = _stream_parse(content)
+        else:
+            if isinstance(content, memoryview):
+                content = content.tobytes() # BeautifulSoup only takes bytes or str
+            soup = BeautifulSoup(content, backend)
+            self.text = soup.get_text()
+            hrefs = [link['href'] for link in soup.find_all('a', href=True)]
+        self.links = [urljoin(url, href) for href in hrefs]
+
+    @property
+    def text_ratio(self):
+        # Text to HTML ratio of the page.
+        if self.content_length > 0:
+            return len(self.text) / self.content_length
+        return 0
+
+    @property
+    def tokens(self):
+        # Tokenized only when a step actually needs the words.
+        if self._tokens is None:
+            self._tokens = tokenize(self.text)
+        return self._tokens
+
+    @property
+    def word_counts(self):
+        # Counter of the words that are not stop words.
+        if self._word_counts is None:
+            self._word_counts = count_words(self.text)
+        return self._word_counts
+
+
+class _StreamParser(HTMLParser):
+    # Collects text and anchor hrefs while tokenizing, keeping the same rules
+    # as BeautifulSoup.get_text (no script/style contents, no comments).
+    SKIPPED = {"script", "style"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self.hrefs = []
+        self.words = WordCounter()
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self.skip_depth += 1
+        elif tag == "a":
+            for name, value in attrs:
+                if name == "href":
+                    self.hrefs.append(value or "")
+                    break
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.chunks.append(data)
+            self.words.feed(data)
+
+    def unknown_decl(self, data):
+        if data.startswith("CDATA["):
+            self.chunks.append(data[len("CDATA["):])
+            self.words.feed(data[len("CDATA["):])
+
+
+def _stream_parse(content):
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        try:
+            # Decoded straight from the buffer, a memoryview is not copied first.
+            content = str(content, "utf-8")
+        except UnicodeDecodeError:
+            content = UnicodeDammit(bytes(content)).unicode_markup or ""
+    parser = _StreamParser()
+    parser.feed(content)
+    parser.close()
+    return "".join(parser.chunks), parser.hrefs, parser.words.close()
@@ -1,14 +1,135 @@
 import pickle
+import struct
+
+# The cache server pickles a requests.Response, whose state starts with the
+# body: SHORT_BINUNICODE "_content", MEMOIZE, then the bytes. Finding it there
+# gives the body without unpickling the response or copying the body.
+_CONTENT_KEY = b"\x8c\x08_content\x94"
+# Opcodes of a bytes object: SHORT_BINBYTES, BINBYTES and BINBYTES8 with the
+# format of their length.
+_BYTES_LENGTHS = {0x43: "<B", 0x42: "<I", 0x8e: "<Q"}
+# Opcodes of a str: SHORT_BINUNICODE, BINUNICODE.
+_STR_LENGTHS = {0x8c: "<B", 0x58: "<I"}
+_MEMOIZE = 0x94
+
+_UNSET = object()
+
 
 class Response(object):
+    # A response of the cache server. The pickled requests.Response is only
+    # unpickled when raw_response is read; status, content, content_type and
+    # content_length are read straight from the pickled bytes, so pages the
+    # scraper rejects early are never decoded. So are other headers, with
+    # header(). content is a memoryview of the
+    # body inside the payload, shared by every consumer without a copy.
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        self.payload = resp_dict.get("response")
+        self._raw_response = _UNSET
+        self._content = _UNSET
+        self._content_end = 0
+        self._content_type = _UNSET
+        self._headers = dict()
+
+    @property
+    def raw_response(self):
+        if self._raw_response is _UNSET:
+            try:
+                self._raw_response = (
+                    pickle.loads(self.payload)
+                    if self.payload is not None else
+                    None)
+            except TypeError:
+                self._raw_response = None
+        return self._raw_response
+
+    @property
+    def content(self):
+        # Body of the page as a memoryview, empty when there is none.
+        if self._content is _UNSET:
+            self._content = self._find_content()
+        return self._content
+
+    @property
+    def content_length(self):
+        return len(self.content)
+
+    @property
+    def content_type(self):
+        # Content-Type header, without parameters and lowercase. None when
+        # the server did not send one.
+        if self._content_type is _UNSET:
+            value = self.header("Content-Type")
+            self._content_type = _media_type(value) if value else None
+        return self._content_type
+
+    def header(self, name):
+        # Value of a response header, None when the server did not send it.
+        key = name.lower()
+        if key not in self._headers:
+            self._headers[key] = self._find_header(key)
+        return self._headers[key]
+
+    def _find_content(self):
+        if not isinstance(self.payload, (bytes, bytearray)):
+            return self._decoded_content()
+        start = self.payload.find(_CONTENT_KEY)
+        if start == -1:
+            return self._decoded_content()
+        start += len(_CONTENT_KEY)
+        length_format = _BYTES_LENGTHS.get(self.payload[start])
+        if length_format is None:
+            # Not bytes: the content was never read (None) or another pickler
+            # wrote it. Left to pickle.
+            return self._decoded_content()
+        start += 1
+        length = struct.unpack_from(length_format, self.payload, start)[0]
+        start += struct.calcsize(length_format)
+        self._content_end = start + length
+        return memoryview(self.payload)[start:self._content_end]
+
+    def _decoded_content(self):
+        raw_response = self.raw_response
+        content = getattr(raw_response, "content", None) if raw_response is not None else None
+        return memoryview(content or b"")
+
+    def _find_header(self, key):
+        if isinstance(self.payload, (bytes, bytearray)):
+            self.content # Headers come after the body
+            # The headers' lowercase key, as SHORT_BINUNICODE then MEMOIZE.
+            encoded = key.encode("utf-8")
+            marker = bytes((0x8c, len(encoded))) + encoded + bytes((_MEMOIZE,))
+            start = self.payload.find(marker, self._content_end)
+            if start != -1:
+                # (original key, value), as in ("ETag", value).
+                position = start + len(marker)
+                value = None
+                for _ in range(2):
+                    length_format = _STR_LENGTHS.get(self.payload[position])
+                    if length_format is None:
+                        break
+                    position += 1
+                    length = struct.unpack_from(length_format, self.payload, position)[0]
+                    position += struct.calcsize(length_format)
+                    value = self.payload[position:position + length]
+                    position += length
+                    if self.payload[position] == _MEMOIZE:
+                        position += 1
+                else:
+                    return value.decode("utf-8", "replace")
+            elif self._content_end:
+                # The body was where requests pickles it, so the headers
+                # are laid out as expected too and this one is not there.
+                return None
+        raw_response = self.raw_response
+        headers = getattr(raw_response, "headers", None)
+        if not headers:
+            return None
+        return headers.get(key)
+
+
+def _media_type(value):
+    # "text/html; charset=utf-8" -> "text/html"
+    return value.partition(";")[0].strip().lower()
@@ -0,0 +1,90 @@
+from collections import deque
+from hashlib import blake2b
+from threading import Lock
+
+BITS = 64
+
+
+def _token_hash(token):
+    return int.from_bytes(
+        blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(word_counts):
+    # 64 bit SimHash of a page from its word -> count mapping, each word
+    # weighted by its count. Pages with almost the same words end up a few
+    # bits apart.
+    weights = [0] * BITS
+    for token, count in word_counts.items():
+        value = _token_hash(token)
+        for bit in range(BITS):
+            if value >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    fingerprint = 0
+    for bit in range(BITS):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def distance(first, second):
+    return bin(first ^ second).count("1")
+
+
+class SimHashIndex(object):
+    # Finds fingerprints within `threshold` bits of one another. Fingerprints
+    # are split into threshold + 1 bands, and by pigeonhole two fingerprints
+    # that close share at least one band exactly, so only fingerprints in the
+    # same band buckets are compared. At most `capacity` fingerprints are
+    # kept; the oldest are forgotten first.
+    def __init__(self, threshold=3, capacity=500000):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.band_count = threshold + 1
+        self.band_width = BITS // self.band_count
+        self.band_mask = (1 << self.band_width) - 1
+        self.bands = [dict() for _ in range(self.band_count)]
+        self.order = deque()
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.order)
+
+    def _keys(self, fingerprint):
+        return [(fingerprint >> (band * self.band_width)) & self.band_mask
+                for band in range(self.band_count)]
+
+    def find(self, fingerprint):
+        # Returns a stored fingerprint within threshold bits, or None.
+        with self.lock:
+            for table, key in zip(self.bands, self._keys(fingerprint)):
+                for candidate in table.get(key, ()):
+                    if distance(candidate, fingerprint) <= self.threshold:
+                        return candidate
+        return None
+
+    def add(self, fingerprint):
+        # Adds fingerprint unless a near duplicate is already stored.
+        # Returns True when it was a near duplicate.
+        keys = self._keys(fingerprint)
+        with self.lock:
+            for table, key in zip(self.bands, keys):
+                for candidate in table.get(key, ()):
+                    if distance(candidate, fingerprint) <= self.threshold:
+                        return True
+            for table, key in zip(self.bands, keys):
+                table.setdefault(key, []).append(fingerprint)
+            self.order.append(fingerprint)
+            if len(self.order) > self.capacity:
+                self._forget(self.order.popleft())
+        return False
+
+    def _forget(self, fingerprint):
+        for table, key in zip(self.bands, self._keys(fingerprint)):
+            bucket = table.get(key)
+            if bucket is not None and fingerprint in bucket:
+                bucket.remove(fingerprint)
+                if not bucket:
+                    del table[key]
@@ -0,0 +1,102 @@
+import heapq
+
+
+class SpaceSaving(object):
+    # Counts of the most frequent words in bounded memory (Space-Saving,
+    # Metwally et al., merged as in Agarwal et al., "Mergeable Summaries").
+    # At most 2 * capacity words are kept; past that the `capacity` highest
+    # counts stay and `floor` becomes the highest count dropped, an upper
+    # bound on the true count of every word not kept. A word added later
+    # starts from floor, so each count is an overestimate by at most its
+    # error(): the true count lies in bounds(word). Any word whose true count
+    # is above floor is kept, so the words of most_common whose bounds clear
+    # floor are surely the most frequent (guaranteed()).
+    # Updates take a Counter (one page's words, exact) or another
+    # SpaceSaving (another worker's, a shard's, a checkpoint's), so sketches
+    # merge like the Counters they replace. Negative counts (a recrawled page
+    # that lost words) lower kept words and leave the bounds valid; one for a
+    # word not kept is dropped, so they must come in a Counter applied to the
+    # sketch that counted the word (CrawlAnalytics' accumulators are exact).
+    def __init__(self, capacity, counts=None):
+        assert capacity > 0, "SpaceSaving needs a capacity"
+        self.capacity = capacity
+        self.counts = dict()  # word -> estimated count
+        self.errors = dict()  # word -> most its count may be over, only when above 0
+        self.floor = 0
+        if counts:
+            self.update(counts)
+
+    def update(self, other):
+        counts = self.counts
+        errors = self.errors
+        floor = self.floor
+        if isinstance(other, SpaceSaving):
+            # A word kept by one sketch only may be in the other's floor.
+            if other.floor:
+                for word in counts.keys() - other.counts.keys():
+                    counts[word] += other.floor
+                    errors[word] = errors.get(word, 0) + other.floor
+            for word, count in other.counts.items():
+                error = other.errors.get(word, 0)
+                if word in counts:
+                    counts[word] += count
+                else:
+                    counts[word] = count + floor
+                    error += floor
+                if error:
+                    errors[word] = errors.get(word, 0) + error
+            self.floor += other.floor
+        else:
+            for word, count in other.items():
+                if word in counts:
+                    counts[word] += count
+                    if counts[word] <= 0:
+                        del counts[word]
+                        errors.pop(word, None)
+                elif count > 0:
+                    counts[word] = count + floor
+                    if floor:
+                        errors[word] = floor
+        if len(counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        kept = heapq.nlargest(self.capacity + 1, self.counts.items(), key=lambda item: item[1])
+        self.floor = max(self.floor, kept.pop()[1]) # The highest count dropped
+        self.counts = dict(kept)
+        self.errors = {word: error for word, error in self.errors.items() if word in self.counts}
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __getitem__(self, word):
+        return self.counts.get(word, 0)
+
+    def keys(self):
+        return self.counts.keys()
+
+    def items(self):
+        return self.counts.items()
+
+    def error(self, word):
+        # Most the count of word may be above its true count.
+        return self.errors.get(word, 0) if word in self.counts else self.floor
+
+    def bounds(self, word):
+        # (lowest, highest) true count of word.
+        if word not in self.counts:
+            return 0, self.floor
+        count = self.counts[word]
+        return max(0, count - self.errors.get(word, 0)), count
+
+    def most_common(self, n):
+        return heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+
+    def guaranteed(self, n):
+        # How many of most_common(n) are surely among the n most frequent
+        # words: their lowest true count is above the highest of every word
+        # outside them.
+        top = heapq.nlargest(n + 1, self.counts.items(), key=lambda item: item[1])
+        outside = max(top[n][1] if len(top) > n else 0, self.floor)
+        return sum(1 for word, count in top[:n]
+                   if count - self.errors.get(word, 0) > outside)
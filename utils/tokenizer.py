@@ -0,0 +1,102 @@
+import re
+import sys
+
+from collections import Counter
+
+# Same token rules as PartA.tokenize: runs of lowercase ASCII letters and of
+# any character for which str.isdigit() is true. \d covers the decimal digits,
+# the few other isdigit() characters (superscripts, circled digits, ...) are
+# listed explicitly.
+_OTHER_DIGITS = "".join(
+    chr(code) for code in range(sys.maxunicode + 1)
+    if chr(code).isdigit() and not chr(code).isdecimal())
+TOKEN = re.compile(f"[a-z\\d{re.escape(_OTHER_DIGITS)}]+")
+# Most pages are plain ASCII once lowercased. For those, translating every
+# separator to a space and splitting in C is several times faster than the
+# regex, with the same tokens. What is left is making a str per token and
+# counting it, which split and Counter already do in C: counting takes about
+# a fifth of PartA's time, not the tenth that was aimed for
+# (benchmarks/bench_tokenize.py prints that floor).
+_ASCII_SEPARATORS = {
+    code: " " for code in range(128)
+    if not ("a" <= chr(code) <= "z" or chr(code).isdigit())}
+
+STOP_WORDS = frozenset({
+    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and", "any", "are",
+    "aren't", "as", "at",
+    "be", "because", "been", "before", "being", "below", "between", "both", "but", "by",
+    "can't", "cannot", "could",
+    "couldn't", "did", "didn't", "do", "does", "doesn't", "doing", "don't", "down", "during",
+    "each", "few", "for",
+    "from", "further", "had", "hadn't", "has", "hasn't", "have", "haven't", "having", "he",
+    "he'd", "he'll", "he's",
+    "her", "here", "here's", "hers", "herself", "him", "himself", "his", "how", "how's", "i",
+    "i'd", "i'll", "i'm",
+    "i've", "if", "in", "into", "is", "isn't", "it", "it's", "its", "itself", "let's", "me",
+    "more", "most", "mustn't",
+    "my", "myself", "no", "nor", "not", "of", "off", "on", "once", "only", "or", "other",
+    "ought", "our", "ours",
+    "ourselves", "out", "over", "own", "same", "shan't", "she", "she'd", "she'll", "she's",
+    "should", "shouldn't", "so",
+    "some", "such", "than", "that", "that's", "the", "their", "theirs", "them", "themselves",
+    "then", "there", "there's",
+    "these", "they", "they'd", "they'll", "they're", "they've", "this", "those", "through",
+    "to", "too", "under",
+    "until", "up", "very", "was", "wasn't", "we", "we'd", "we'll", "we're", "we've", "were",
+    "weren't", "what", "what's",
+    "when", "when's", "where", "where's", "which", "while", "who", "who's", "whom", "why",
+    "why's", "with", "won't",
+    "would", "wouldn't", "you", "you'd", "you'll", "you're", "you've", "your", "yours",
+    "yourself", "yourselves"
+})
+
+
+def _is_token_char(char):
+    return "a" <= char <= "z" or char.isdigit()
+
+
+def _split_tokens(text):
+    # text must already be lowercase.
+    if text.isascii():
+        return text.translate(_ASCII_SEPARATORS).split()
+    return TOKEN.findall(text)
+
+
+def tokenize(text):
+    # Drop-in replacement for PartA.tokenize.
+    return _split_tokens(text.lower())
+
+
+class WordCounter(object):
+    # Tokenizes text fed in any number of chunks and counts the words that
+    # are not stop words. A token split across two chunks is counted once,
+    # as if the text had been fed in one piece.
+    def __init__(self, stop_words=STOP_WORDS):
+        self.stop_words = stop_words
+        self.counts = Counter()
+        self.tail = ""
+
+    def feed(self, chunk):
+        text = self.tail + chunk.lower()
+        # The token at the very end may continue in the next chunk.
+        start = len(text)
+        while start and _is_token_char(text[start - 1]):
+            start -= 1
+        self.tail = text[start:]
+        self.counts.update(_split_tokens(text[:start]))
+        return self
+
+    def close(self):
+        if self.tail:
+            self.counts[self.tail] += 1
+            self.tail = ""
+        # Stop words are counted like any word above and dropped once here,
+        # which is cheaper than checking every token.
+        for word in self.stop_words:
+            self.counts.pop(word, None)
+        return self.counts
+
+
+def count_words(text):
+    # Counter of the words of text that are not stop words.
+    return WordCounter().feed(text).close()
@@ -0,0 +1,162 @@
+import re
+
+from collections import Counter
+from hashlib import sha256
+from inspect import getsource
+from threading import Lock
+from urllib.parse import urlparse
+
+DEFAULT_DOMAINS = ("ics.uci.edu", "cs.uci.edu", "informatics.uci.edu",
+                   "stat.uci.edu", "today.uci.edu")
+DEFAULT_PATHS = ("today.uci.edu/department/information_computer_sciences",)
+DEFAULT_EXTENSIONS = (
+    "css", "js", "bmp", "gif", "jpg", "jpeg", "ico",
+    "png", "tif", "tiff", "mid", "mp2", "mp3", "mp4",
+    "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv", "ogg", "ogv", "pdf",
+    "ps", "eps", "tex", "ppt", "pptx", "doc", "docx", "xls", "xlsx", "names",
+    "data", "dat", "exe", "bz2", "tar", "msi", "bin", "7z", "psd", "dmg", "iso",
+    "epub", "dll", "cnf", "tgz", "sha1",
+    "thmx", "mso", "arff", "rtf", "jar", "csv",
+    "rm", "smil", "wmv", "swf", "wma", "zip", "rar", "gz")
+DEFAULT_TRAP_PATTERNS = (r"/sort=", r"/search")
+
+# Decisions cached per host.
+_DENY, _ALLOW = False, True
+
+# scheme, netloc, path, query of a url (RFC 3986, appendix B). One match of a
+# compiled regex is several times cheaper than urllib.parse.urlparse.
+_URL = re.compile(r"^(?:([^:/?#]+):)?(?://([^/?#]*))?([^?#]*)(?:\?([^#]*))?")
+
+
+class UrlFilter(object):
+    # The rules behind scraper.is_valid, compiled once. Host decisions are
+    # memoized, so most urls cost a dict lookup plus the path checks.
+    #   domains          hosts allowed along with all their subdomains
+    #   paths            "host/path" prefixes allowed outside those domains
+    #   require_www      only hosts with "www" in them are crawled
+    #   extensions       file types that are not crawled
+    #   trap_patterns    regexes searched for in the path
+    #   max_depth        most path segments a url may have
+    #   max_repeats      most times one path segment may appear (/a/b/a/b/...)
+    #   max_query_params most query parameters a url may have
+    #   host_budget      most new urls admitted per host (0 for no limit),
+    #                    counted across sessions (load_admitted)
+    def __init__(self, domains=DEFAULT_DOMAINS, paths=DEFAULT_PATHS,
+                 require_www=True, extensions=DEFAULT_EXTENSIONS,
+                 trap_patterns=DEFAULT_TRAP_PATTERNS, max_depth=12,
+                 max_repeats=2, max_query_params=8, host_budget=0):
+        self.rules = (tuple(domains), tuple(paths), require_www,
+                      tuple(extensions), tuple(trap_patterns), max_depth,
+                      max_repeats, max_query_params, host_budget)
+        self.domains = frozenset(domain.strip(".").lower() for domain in domains)
+        self.paths = dict()
+        for prefix in paths:
+            host, _, path = prefix.lower().partition("/")
+            self.paths.setdefault(host, []).append("/" + path)
+        self.require_www = require_www
+        self.extensions = frozenset(extension.lower() for extension in extensions)
+        self.trap = (re.compile("|".join(f"(?:{pattern})" for pattern in trap_patterns))
+                     if trap_patterns else None)
+        self.max_depth = max_depth
+        self.max_repeats = max_repeats
+        self.max_query_params = max_query_params
+        self.host_budget = host_budget
+        self.hosts = dict()          # netloc -> _ALLOW, _DENY or path prefixes
+        self.admitted = Counter()    # host -> new urls admitted
+        self.rejections = Counter()  # reason -> urls rejected
+        self.lock = Lock()           # Guards admitted and rejections
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.filter_domains, config.filter_paths,
+                   config.filter_require_www, config.filter_extensions,
+                   config.filter_trap_patterns, config.filter_max_depth,
+                   config.filter_max_repeats, config.filter_max_query_params,
+                   config.filter_host_budget)
+
+    @property
+    def version(self):
+        # Changes whenever the rules or this code change.
+        return sha256(
+            (repr(self.rules) + getsource(UrlFilter)).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def is_valid(self, url):
+        reason = self.reject_reason(url)
+        if reason is None:
+            return True
+        with self.lock:
+            self.rejections[reason] += 1
+        return False
+
+    def count_rejections(self, rejections):
+        # Adds a Counter of reason -> urls rejected, made by a pool process.
+        with self.lock:
+            self.rejections.update(rejections)
+
+    def rejection_counts(self):
+        with self.lock:
+            return dict(self.rejections)
+
+    def reject_reason(self, url):
+        # None when url should be crawled, otherwise why it should not.
+        scheme, netloc, path, query = _URL.match(url.strip()).groups()
+        if not scheme or scheme.lower() not in ("http", "https"):
+            return "scheme"
+
+        host = self.hosts.get(netloc)
+        if host is None:
+            host = self.hosts[netloc] = self._host_decision(netloc)
+        if host is _DENY:
+            return "domain"
+        if host is not _ALLOW and not any(path.startswith(prefix) for prefix in host):
+            return "domain"
+
+        if path.lower().rpartition(".")[2] in self.extensions:
+            return "file type"
+        if self.trap and self.trap.search(path):
+            return "trap pattern"
+
+        segments = [segment for segment in path.split("/") if segment]
+        if len(segments) > self.max_depth:
+            return "path depth"
+        if len(segments) > self.max_repeats and (
+                Counter(segments).most_common(1)[0][1] > self.max_repeats):
+            return "repeated path segment"
+        if query and query.count("&") + 1 > self.max_query_params:
+            return "query parameters"
+        return None
+
+    def admit(self, url):
+        # Charges a new url against its host's budget. False once the host
+        # has used it up.
+        if not self.host_budget:
+            return True
+        host = budget_host(url)
+        with self.lock:
+            if self.admitted[host] >= self.host_budget:
+                self.rejections["host budget"] += 1
+                return False
+            self.admitted[host] += 1
+        return True
+
+    def load_admitted(self, admitted):
+        # host -> urls admitted in earlier sessions, kept in the save file.
+        with self.lock:
+            self.admitted = Counter(admitted)
+
+    def _host_decision(self, netloc):
+        if self.require_www and "www" not in netloc.lower():
+            return _DENY
+        hostname = urlparse("//" + netloc).hostname or ""
+        # Walk the suffixes of the host name: www.ics.uci.edu, ics.uci.edu, ...
+        labels = hostname.split(".")
+        for start in range(len(labels)):
+            if ".".join(labels[start:]) in self.domains:
+                return _ALLOW
+        return self.paths.get(hostname, _DENY)
+
+
+def budget_host(url):
+    # The host a url is charged to by UrlFilter.admit.
+    return urlparse(url).netloc.lower()